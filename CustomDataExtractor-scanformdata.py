@@ -1,6 +1,9 @@
 import json
 import boto3
 
+# Packaged next to this handler from upcoming-features/kyc-backend-app/textract_forms.py
+from textract_forms import extract_key_values, index_blocks
+
 s3_client = boto3.client('s3')
 textract_client = boto3.client('textract', region_name='us-west-2')
 
@@ -45,12 +48,16 @@ def lambda_handler(event, context):
             )
 
             # Extract form data from Textract response
-            for block in response['Blocks']:
+            blocks = response['Blocks']
+            for block in blocks:
                 if block['BlockType'] == 'LINE':
                     if 'Text' in block:
                         extracted_data[block['Id']] = block['Text']
                     elif 'SelectionStatus' in block:
                         extracted_data[block['Id']] = block['SelectionStatus']
+
+            # Form key/value pairs alongside the lines (key, value, confidence, page)
+            extracted_data['key_values'] = extract_key_values(blocks, index_blocks(blocks))
         
 
         elif processing_method == "AnalyzeId":
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Chatbot Lambda latency benchmark against a local fake Bedrock.
+Runs chatbot_lambda.txt with a fake bedrock-runtime client that produces tokens at a fixed
+pace and compares time to first token of the buffered (API Gateway REST) and streamed
+(WebSocket) paths. Also times creating a bedrock-runtime client per invocation, which the
+Lambda now does once per execution environment, and replays typical chat traffic through
+the answer cache to report its hit rate and the model time saved.
+
+Usage:
+    python benchmark_chatbot_lambda.py [--runs 5] [--first-token-ms 400] [--token-ms 30] [--tokens 120]
+    python benchmark_chatbot_lambda.py --threshold 0.8     # similarity tier threshold
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+import types
+
+LAMBDA_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatbot_lambda.txt")
+
+# (prompt, intent) - paraphrases of the same few questions and ones that must not share an answer
+CHAT_TRAFFIC = [
+    ("What documents do I need?", "documents"),
+    ("what documents do i need", "documents"),
+    ("What documents do I need for KYC?", "documents"),
+    ("Which documents do I need for KYC", "documents"),
+    ("How long does approval take?", "approval_time"),
+    ("how long does the approval take", "approval_time"),
+    ("How long does KYC approval take?", "approval_time"),
+    ("Can I upload a passport instead of Aadhaar?", "passport"),
+    ("can i upload passport instead of aadhaar", "passport"),
+    ("Why was my application rejected?", "rejection"),
+    ("What documents do I need?", "documents"),
+    ("How long does approval take", "approval_time"),
+    ("How do I update my address?", "address"),
+    ("What documents do I need for KYC?", "documents"),
+    ("Is my data stored securely?", "security"),
+    ("how long does approval take?", "approval_time"),
+]
+
+
+class FakeStreamingBody:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self):
+        return self._stream.read()
+
+
+class FakeBedrockClient:
+    """bedrock-runtime stand-in - Cohere Command response shapes with simulated generation time"""
+
+    def __init__(self, first_token_ms, token_ms, tokens):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.calls = 0
+
+    def _words(self):
+        return [f"word{i} " for i in range(self.tokens)]
+
+    def invoke_model(self, body, modelId, **kwargs):
+        self.calls += 1
+        time.sleep((self.first_token_ms + self.token_ms * self.tokens) / 1000)
+        # The reply starts with the question, so a cached reply can be traced back to it
+        question = json.loads(body)["prompt"].rsplit("Question: ", 1)[-1].split("\nAnswer:")[0]
+        text = question + ": " + "".join(self._words())
+        payload = {"generations": [{"text": text, "finish_reason": "COMPLETE"}]}
+        return {"body": FakeStreamingBody(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, body, modelId, **kwargs):
+        self.calls += 1
+        assert json.loads(body).get("stream") is True
+
+        def events():
+            time.sleep(self.first_token_ms / 1000)
+            for index, word in enumerate(self._words()):
+                if index:
+                    time.sleep(self.token_ms / 1000)
+                yield {"chunk": {"bytes": json.dumps({"text": word, "is_finished": False}).encode("utf-8")}}
+            yield {"chunk": {"bytes": json.dumps({"is_finished": True, "finish_reason": "COMPLETE"}).encode("utf-8")}}
+
+        return {"body": events()}
+
+
+class FakeManagementClient:
+    """apigatewaymanagementapi stand-in that records when each message was posted"""
+
+    class exceptions:
+        class GoneException(Exception):
+            pass
+
+    def __init__(self):
+        self.messages = []
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.messages.append((time.perf_counter(), json.loads(Data)))
+
+
+def load_lambda():
+    """Import chatbot_lambda.txt as a module (its boto3 client is replaced before use)"""
+    module = types.ModuleType("chatbot_lambda")
+    with open(LAMBDA_SOURCE) as f:
+        code = compile(f.read(), LAMBDA_SOURCE, "exec")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+    exec(code, module.__dict__)
+    module.print = lambda *args, **kwargs: None
+    return module
+
+
+def run_buffered(module, prompt):
+    started = time.perf_counter()
+    response = module.lambda_handler({"body": json.dumps({"prompt": prompt})}, None)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    assert json.loads(response["body"])["reply"]
+    return elapsed_ms, elapsed_ms
+
+
+def run_stream(module, prompt):
+    management = FakeManagementClient()
+    event = {
+        "requestContext": {"connectionId": "abc=", "routeKey": "$default", "domainName": "local", "stage": "test"},
+        "body": json.dumps({"prompt": prompt}),
+    }
+    module.management_clients["https://local/test"] = management
+    started = time.perf_counter()
+    module.lambda_handler(event, None)
+    tokens = [(at, message) for at, message in management.messages if message["type"] == "token"]
+    assert management.messages[-1][1]["type"] == "done"
+    return (tokens[0][0] - started) * 1000, (management.messages[-1][0] - started) * 1000
+
+
+def run_cache_traffic(module, threshold):
+    module.answer_cache = module.AnswerCache(500, 3600, threshold)
+    fake = module.bedrock_client
+    calls_before = fake.calls
+    intents = dict(CHAT_TRAFFIC)
+    wrong = 0
+    for prompt, intent in CHAT_TRAFFIC:
+        answered = module.generate(prompt).split(":", 1)[0]
+        if intents[answered] != intent:
+            wrong += 1
+            print(f"⚠️  '{prompt}' was answered with the reply to '{answered}'")
+    summary = module.answer_cache.summary()
+    print(f"🗄️  Answer cache at threshold {threshold}: {len(CHAT_TRAFFIC)} prompts, "
+          f"{fake.calls - calls_before} model calls, {summary['exact_hits']} exact + {summary['similar_hits']} "
+          f"similar hits, hit rate {summary['hit_rate']:.0%}, {summary['saved_ms']:.0f} ms of generation saved, "
+          f"{wrong} wrong answers")
+
+
+def time_client_creation(runs):
+    import boto3
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        boto3.client(service_name="bedrock-runtime", region_name="us-west-2")
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot Lambda against a fake Bedrock")
+    parser.add_argument("--runs", type=int, default=5, help="Invocations per mode")
+    parser.add_argument("--first-token-ms", type=float, default=400, help="Fake model latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=30, help="Fake model time per further token")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per reply")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Similarity threshold of the answer cache (default: the Lambda's)")
+    args = parser.parse_args()
+
+    module = load_lambda()
+    module.bedrock_client = FakeBedrockClient(args.first_token_ms, args.token_ms, args.tokens)
+    # Latency runs repeat one prompt, so they bypass the answer cache
+    module.answer_cache = module.AnswerCache(0, 0, 1.0)
+    prompt = "What documents do I need for KYC?"
+
+    print(f"🤖 Fake Bedrock: {args.first_token_ms:.0f} ms to first token, {args.token_ms:.0f} ms per token, "
+          f"{args.tokens} tokens")
+    if module.retrieval_index is not None:
+        print(f"📚 Retrieval index {module.retrieval_index.version} loaded from {module.RETRIEVAL_INDEX_PATH}")
+    for name, run in (("buffered", run_buffered), ("stream", run_stream)):
+        ttfts, totals = zip(*(run(module, prompt) for _ in range(args.runs)))
+        print(f"📊 {name:<8} time to first token {statistics.median(ttfts):8.1f} ms | "
+              f"full reply {statistics.median(totals):8.1f} ms")
+
+    run_cache_traffic(module, args.threshold if args.threshold is not None else module.CACHE_SIMILARITY_THRESHOLD)
+
+    creation = time_client_creation(args.runs)
+    print(f"🔌 Creating a bedrock-runtime client: {statistics.median(creation):.1f} ms median "
+          f"(first {creation[0]:.1f} ms) - saved on every warm invocation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Chatbot code shared by the chatbot Lambda (chatbot_lambda.txt), chatbot_retrieval.py and
+the backend's chat endpoint (upcoming-features/kyc-backend-app), so a question gets the
+same prompt and the same cached answer whichever path serves it. Standard library only.
+
+Answer cache: exact tier on the normalized question, similarity tier on the cosine of
+hashed word, word-pair and trigram embeddings above a threshold. Entries are bounded (LRU),
+expire, and are namespaced by the caller (model, guardrail, knowledge base version).
+"""
+
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+
+EMBEDDING_DIMENSIONS = 4096
+PROMPT_TEMPLATE = (
+    "You are the assistant of our KYC service. Answer the customer's question in a few "
+    "sentences using only the information below. If it does not answer the question, say "
+    "you are not sure and suggest contacting support.\n\n{context}\n\nQuestion: {question}\nAnswer:"
+)
+# Instructions ahead of the knowledge base context when the prompt carries a conversation
+CONVERSATION_INSTRUCTIONS = (
+    "You are the assistant of our KYC service. Answer the customer's last question in a few "
+    "sentences using only the information below and the conversation. If they do not answer "
+    "it, say you are not sure and suggest contacting support.\n\n"
+)
+
+
+def estimate_tokens(text):
+    """Rough model token count - about four characters per token for English text"""
+    return math.ceil(len(text) / 4)
+
+
+def normalize_prompt(prompt):
+    """Lowercase words only - 'What documents do I need?' and 'what documents do i need' match"""
+    return " ".join(re.findall(r"[a-z0-9]+", prompt.lower()))
+
+
+def embed(normalized):
+    """
+    Lightweight embedding: word, word-pair and character trigram features hashed into
+    EMBEDDING_DIMENSIONS buckets, as a unit-length sparse vector {bucket: weight}
+    """
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {normalized} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector = {}
+    for feature in features:
+        bucket = zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIMENSIONS
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache in front of the model, bounded by max_entries (LRU) and a TTL.
+    Not thread-safe - use it from one thread or event loop.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, threshold):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (namespace, normalized) -> entry
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "saved_ms": 0.0}
+
+    def _expire(self, now):
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+            del self._entries[key]
+
+    def record(self, tier, saved_ms):
+        """Count a lookup - tier is None on a miss. Override to report it elsewhere too."""
+        if tier is None:
+            self.stats["misses"] += 1
+            return
+        self.stats[f"{tier}_hits"] += 1
+        self.stats["saved_ms"] += saved_ms
+
+    def get(self, namespace, prompt):
+        """(answer, tier) of a cached answer for the prompt, or (None, None)"""
+        self._expire(time.time())
+        normalized = normalize_prompt(prompt)
+        entry = self._entries.get((namespace, normalized))
+        tier = "exact"
+        if entry is None and self.threshold < 1:
+            vector = embed(normalized)
+            best = 0.0
+            for (entry_namespace, _), candidate in self._entries.items():
+                if entry_namespace != namespace:
+                    continue
+                score = cosine(vector, candidate["vector"])
+                if score > best:
+                    best, entry = score, candidate
+            if best < self.threshold:
+                entry = None
+            tier = "similar"
+        if entry is None:
+            self.record(None, 0.0)
+            return None, None
+        self._entries.move_to_end((namespace, entry["normalized"]))
+        self.record(tier, entry["generation_ms"])
+        return entry["answer"], tier
+
+    def put(self, namespace, prompt, answer, generation_ms):
+        if not answer:
+            return
+        normalized = normalize_prompt(prompt)
+        key = (namespace, normalized)
+        self._entries[key] = {
+            "normalized": normalized,
+            "vector": embed(normalized),
+            "answer": answer,
+            "generation_ms": generation_ms,
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def summary(self):
+        hits = self.stats["exact_hits"] + self.stats["similar_hits"]
+        lookups = hits + self.stats["misses"]
+        return dict(self.stats, entries=len(self._entries),
+                    hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+                    saved_ms=round(self.stats["saved_ms"], 1))
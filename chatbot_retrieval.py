@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+BM25 retrieval over the chatbot knowledge base (FAQ and policy documents).
+The index is built offline with NumPy/SciPy and saved as .npy arrays of a row-compressed
+term x passage matrix holding precomputed BM25 weights. At cold start the arrays are
+memory-mapped, so loading costs no parsing and a query only touches the rows of its
+terms. The chatbot Lambda prepends the top passages to the prompt within a token budget.
+
+Usage:
+    python chatbot_retrieval.py build [--source chatbot_knowledge] [--output chatbot_index]
+    python chatbot_retrieval.py query "what documents do I need" [--index chatbot_index] [--top-k 3]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from chatbot_common import estimate_tokens
+
+DEFAULT_SOURCE = "chatbot_knowledge"
+DEFAULT_INDEX = "chatbot_index"
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PASSAGE_WORDS = 120
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it my of on or so that the "
+    "this to was what when where which who why will with you your".split()
+)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(path):
+    """Passages of a markdown document - one per section, long sections split by paragraph"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    document_title = os.path.splitext(os.path.basename(path))[0]
+    passages = []
+    title = document_title
+    paragraphs = []
+
+    def flush():
+        current = []
+        for paragraph in paragraphs:
+            if current and len(" ".join(current + [paragraph]).split()) > MAX_PASSAGE_WORDS:
+                passages.append({"source": os.path.basename(path), "title": title, "text": " ".join(current)})
+                current = []
+            current.append(paragraph)
+        if current:
+            passages.append({"source": os.path.basename(path), "title": title, "text": " ".join(current)})
+        paragraphs.clear()
+
+    for block in re.split(r"\n\s*\n", text):
+        lines = [line.strip() for line in block.strip().splitlines()]
+        while lines and lines[0].startswith("#"):
+            flush()
+            heading = lines.pop(0).lstrip("#").strip()
+            if heading:
+                title = heading
+        if lines:
+            paragraphs.append(" ".join(lines))
+    flush()
+    return passages
+
+
+def build_index(source, output):
+    """Tokenize every .md/.txt document under source and save the BM25 index to output"""
+    from scipy import sparse
+
+    passages = []
+    for name in sorted(os.listdir(source)):
+        if name.endswith((".md", ".txt")):
+            passages.extend(split_passages(os.path.join(source, name)))
+    if not passages:
+        raise SystemExit(f"❌ No .md or .txt documents in {source}")
+
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    lengths = np.zeros(len(passages), dtype=np.float32)
+    for passage_id, passage in enumerate(passages):
+        # The section title is part of what a passage is about
+        tokens = tokenize(f"{passage['title']} {passage['text']}")
+        lengths[passage_id] = len(tokens)
+        for token in tokens:
+            rows.append(vocabulary.setdefault(token, len(vocabulary)))
+            cols.append(passage_id)
+            counts.append(1)
+
+    # Duplicate (term, passage) entries are summed into term frequencies
+    tf = sparse.csc_matrix(
+        (np.asarray(counts, dtype=np.float32), (np.asarray(rows), np.asarray(cols))),
+        shape=(len(vocabulary), len(passages))
+    ).tocsr()
+    tf.sum_duplicates()
+    document_frequency = np.diff(tf.indptr)
+    idf = np.log1p((len(passages) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / lengths.mean())
+
+    weights = tf.tocoo()
+    data = idf[weights.row] * weights.data * (BM25_K1 + 1) / (weights.data + norm[weights.col])
+    # Rows are terms, so one query term is one contiguous slice of indices/data
+    matrix = sparse.csr_matrix((data.astype(np.float32), (weights.row, weights.col)), shape=tf.shape)
+
+    os.makedirs(output, exist_ok=True)
+    np.save(os.path.join(output, "indptr.npy"), matrix.indptr.astype(np.int32))
+    np.save(os.path.join(output, "indices.npy"), matrix.indices.astype(np.int32))
+    np.save(os.path.join(output, "weights.npy"), matrix.data.astype(np.float32))
+    meta = {"vocabulary": vocabulary, "passages": passages, "k1": BM25_K1, "b": BM25_B}
+    encoded = json.dumps(meta, sort_keys=True).encode("utf-8")
+    meta["version"] = hashlib.sha256(encoded).hexdigest()[:12]
+    with open(os.path.join(output, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class RetrievalIndex:
+    """Memory-mapped BM25 index - loading reads only the vocabulary and passage texts"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.version = meta["version"]
+        self.vocabulary = meta["vocabulary"]
+        self.passages = meta["passages"]
+        self.indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(path, "indices.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+
+    def search(self, query, top_k=3):
+        """[(score, passage)] of the best passages for the query, best first"""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.indptr[term], self.indptr[term + 1]
+            # Passage ids are unique within a term's row, so plain fancy-index addition is safe
+            scores[self.indices[start:end]] += self.weights[start:end]
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[i]), self.passages[i]) for i in ranked]
+
+    def context_for(self, query, top_k=3, token_budget=600, min_score=0.0):
+        """Best passages joined as prompt context, stopping before token_budget is exceeded"""
+        parts = []
+        used = 0
+        for score, passage in self.search(query, top_k):
+            if score < min_score:
+                break
+            text = f"{passage['title']}\n{passage['text']}"
+            tokens = estimate_tokens(text)
+            if used + tokens > token_budget:
+                if parts:
+                    break
+                # The best passage alone is over budget - keep its beginning
+                text = text[:token_budget * 4]
+                tokens = estimate_tokens(text)
+            parts.append(text)
+            used += tokens
+        return "\n\n".join(parts)
+
+
+def load_index(path=DEFAULT_INDEX):
+    """The index at path, or None when it has not been built"""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    return RetrievalIndex(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the chatbot retrieval index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from the knowledge base")
+    build.add_argument("--source", default=DEFAULT_SOURCE, help="Directory of .md/.txt documents")
+    build.add_argument("--output", default=DEFAULT_INDEX, help="Index directory")
+    query = commands.add_parser("query", help="Show the passages retrieved for a question")
+    query.add_argument("question")
+    query.add_argument("--index", default=DEFAULT_INDEX, help="Index directory")
+    query.add_argument("--top-k", type=int, default=3)
+    query.add_argument("--token-budget", type=int, default=600)
+    query.add_argument("--runs", type=int, default=1000, help="Repetitions for the timing")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        meta = build_index(args.source, args.output)
+        print(f"✅ Indexed {len(meta['passages'])} passages, {len(meta['vocabulary'])} terms "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms -> {args.output} (version {meta['version']})")
+        return
+
+    started = time.perf_counter()
+    index = load_index(args.index)
+    if index is None:
+        raise SystemExit(f"❌ No index at {args.index} - run 'python chatbot_retrieval.py build' first")
+    print(f"📂 Loaded index {index.version} in {(time.perf_counter() - started) * 1000:.2f} ms")
+    for score, passage in index.search(args.question, args.top_k):
+        print(f"  {score:6.2f}  [{passage['source']}] {passage['title']}")
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        context = index.context_for(args.question, args.top_k, args.token_budget)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / args.runs
+    print(f"⏱️  {elapsed_ms:.3f} ms per query, context of ~{estimate_tokens(context)} tokens")
+
+
+if __name__ == "__main__":
+    main()
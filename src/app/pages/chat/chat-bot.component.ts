@@ -39,6 +39,30 @@ export class ChatbotComponent {
     this.userInput = '';
     this.isLoading = true;
 
+    const reply = { from: 'bot' as const, text: '' };
+    this.chatbotService.streamMessage(message).subscribe({
+      next: (text) => {
+        if (!reply.text) {
+          this.messages.push(reply);
+          this.isLoading = false;
+        }
+        reply.text += text;
+      },
+      error: () => {
+        if (reply.text) {
+          reply.text += ' ❌';
+          return;
+        }
+        // Streaming unavailable - fall back to the full reply
+        this.sendBuffered(message);
+      },
+      complete: () => {
+        this.isLoading = false;
+      }
+    });
+  }
+
+  private sendBuffered(message: string) {
     this.chatbotService.sendMessage(message).subscribe({
       next: (res) => {
         this.messages.push({ from: 'bot', text: res.reply });
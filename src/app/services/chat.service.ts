@@ -1,19 +1,131 @@
-
-
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, map } from 'rxjs';
+import { environment } from '../../environments/environment';
 
 @Injectable({
   providedIn: 'root'
 })
 export class ChatbotService {
-  private apiUrl = 'https://4i1o5wz778.execute-api.us-west-2.amazonaws.com/prod/chatbotLambda3'; // Replace with your actual endpoint
+  private apiUrl = environment.chatApiUrl;
+  // WebSocket API in front of the same Lambda - replies arrive token by token (empty when not deployed)
+  private streamUrl = environment.chatSocketUrl;
+  // KYC backend /chat - streams server-sent events without the Lambda hop (empty to use the WebSocket)
+  private chatUrl = environment.chatUrl;
+  // Returned by the backend so follow-up questions are answered with the earlier turns
+  private conversationId: string | null = null;
 
   constructor(private http: HttpClient) {}
 
   sendMessage(prompt: string): Observable<{ reply: string }> {
-    return this.http.post<{ reply: string }>(this.apiUrl, { prompt });
+    return this.http.post<{ reply?: string; response?: string }>(this.apiUrl, { prompt }).pipe(
+      map(res => ({ reply: res.reply ?? res.response ?? '' }))
+    );
   }
-}
 
+  /**
+   * Emits each piece of the reply as it streams and completes when the reply is done -
+   * from the KYC backend when environment.chatUrl is set, else from the Lambda's WebSocket
+   * when environment.chatSocketUrl is set, else the whole buffered reply at once
+   */
+  streamMessage(prompt: string): Observable<string> {
+    if (this.chatUrl) {
+      return this.streamMessageFromBackend(prompt);
+    }
+    if (this.streamUrl) {
+      return this.streamMessageFromLambda(prompt);
+    }
+    return this.sendMessage(prompt).pipe(map(res => res.reply));
+  }
+
+  /** Server-sent events from the KYC backend's /chat */
+  private streamMessageFromBackend(prompt: string): Observable<string> {
+    return new Observable<string>(subscriber => {
+      const controller = new AbortController();
+
+      fetch(this.chatUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+        body: JSON.stringify({ prompt, stream: true, conversation_id: this.conversationId }),
+        signal: controller.signal
+      }).then(async response => {
+        if (!response.ok || !response.body) {
+          throw new Error(`Chat request failed with status ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          // Events are separated by a blank line
+          const events = buffer.split('\n\n');
+          buffer = events.pop() ?? '';
+          for (const event of events) {
+            const data = event.split('\n').filter(line => line.startsWith('data:')).map(line => line.slice(5)).join('');
+            if (!data) continue;
+            const message = JSON.parse(data);
+            if (message.type === 'token') {
+              subscriber.next(message.text);
+            } else if (message.type === 'done') {
+              this.conversationId = message.conversation_id ?? this.conversationId;
+              subscriber.complete();
+              return;
+            } else if (message.type === 'error') {
+              throw new Error(message.message);
+            }
+          }
+        }
+        throw new Error('Chat stream ended before the reply finished');
+      }).catch(err => {
+        if (!controller.signal.aborted) {
+          subscriber.error(err);
+        }
+      });
+
+      return () => controller.abort();
+    });
+  }
+
+  /** Start a new conversation - the next message is sent without history */
+  resetConversation() {
+    this.conversationId = null;
+  }
+
+  /** The chatbot Lambda's WebSocket API */
+  private streamMessageFromLambda(prompt: string): Observable<string> {
+    return new Observable<string>(subscriber => {
+      const socket = new WebSocket(this.streamUrl);
+      let finished = false;
+
+      socket.onopen = () => socket.send(JSON.stringify({ prompt }));
+      socket.onmessage = event => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'token') {
+          subscriber.next(message.text);
+        } else if (message.type === 'done') {
+          finished = true;
+          subscriber.complete();
+          socket.close();
+        } else if (message.type === 'error') {
+          finished = true;
+          subscriber.error(new Error(message.message));
+          socket.close();
+        }
+      };
+      socket.onerror = () => subscriber.error(new Error('Chat connection failed'));
+      socket.onclose = () => {
+        if (!finished) {
+          subscriber.error(new Error('Chat connection closed before the reply finished'));
+        }
+      };
+
+      return () => {
+        if (socket.readyState === WebSocket.OPEN || socket.readyState === WebSocket.CONNECTING) {
+          socket.close();
+        }
+      };
+    });
+  }
+}
@@ -0,0 +1,7 @@
+export const environment = {
+  production: false,
+  // Local KYC backend (uvicorn main:app --port 8000)
+  chatUrl: 'http://localhost:8000/chat',
+  chatSocketUrl: '',
+  chatApiUrl: 'https://4i1o5wz778.execute-api.us-west-2.amazonaws.com/prod/chatbotLambda3'
+};
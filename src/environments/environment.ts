@@ -0,0 +1,10 @@
+export const environment = {
+  production: true,
+  // Chat replies stream from the KYC backend's /chat when chatUrl is set,
+  // otherwise from the chatbot Lambda's WebSocket API when chatSocketUrl is set
+  // (no WebSocket stage is deployed yet - replies come whole from chatApiUrl)
+  chatUrl: '',
+  chatSocketUrl: '',
+  // Buffered replies, used when streaming fails before the first token
+  chatApiUrl: 'https://4i1o5wz778.execute-api.us-west-2.amazonaws.com/prod/chatbotLambda3'
+};
@@ -132,21 +132,28 @@ const getBackendUrl = (path: string) => {
   return `${apiUrl}/uploads/${cleanPath.replace(/^uploads\//, '')}`;
 };
 
-// Helper function to get pre-signed URLs for S3 files
-const getS3PresignedUrl = async (s3Path: string): Promise<string> => {
+// Helper function to get pre-signed URLs for all S3 documents of a case in one call
+// size 'preview' resolves images and PDFs to their preview derivative; videos and no size to the original
+const getCaseDocumentUrls = async (caseId: string, size?: 'preview'): Promise<Record<string, string>> => {
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
   try {
-    const response = await fetch(`${apiUrl}/files/${encodeURIComponent(s3Path)}`);
-    if (response.ok) {
-      const data = await response.json();
-      return data.download_url;
-    } else {
-      console.error('Failed to get pre-signed URL for S3 file:', s3Path);
-      return s3Path; // Fallback to original path
+    const query = size ? `?size=${size}` : '';
+    const response = await fetch(`${apiUrl}/kyc/documents/${caseId}/urls${query}`);
+    if (!response.ok) {
+      console.error('Failed to get pre-signed URLs for case:', caseId);
+      return {};
     }
+    const data = await response.json();
+    const urls: Record<string, string> = {};
+    for (const doc of data.documents) {
+      if (doc.file_path.startsWith('s3://') && doc.download_url) {
+        urls[doc.file_path] = doc.download_url;
+      }
+    }
+    return urls;
   } catch (error) {
-    console.error('Error getting pre-signed URL:', error);
-    return s3Path; // Fallback to original path
+    console.error('Error getting pre-signed URLs:', error);
+    return {};
   }
 };
 
@@ -162,6 +169,7 @@ export default function EditKycForm() {
   const [error, setError] = useState<string | null>(null)
   const [screenData, setScreenData] = useState<BackendScreenData | null>(null)
   const [resolvedUrls, setResolvedUrls] = useState<Record<string, string>>({})
+  const [originalUrls, setOriginalUrls] = useState<Record<string, string>>({})
 
   // Form state
   const [formData, setFormData] = useState<FormData>({
@@ -208,17 +216,13 @@ export default function EditKycForm() {
 
         // Resolve S3 URLs for documents
         if (data.documents) {
-          const urlPromises = data.documents.map(async (doc) => {
-            if (doc.file_path.startsWith('s3://')) {
-              const resolvedUrl = await getS3PresignedUrl(doc.file_path);
-              return { [doc.file_path]: resolvedUrl };
-            }
-            return {};
-          });
-          
-          const resolvedUrlObjects = await Promise.all(urlPromises);
-          const newResolvedUrls = resolvedUrlObjects.reduce((acc, obj) => ({ ...acc, ...obj }), {});
+          // Previews for display; the originals stay one click away for reviewers
+          const [newResolvedUrls, newOriginalUrls] = await Promise.all([
+            getCaseDocumentUrls(kycId, 'preview'),
+            getCaseDocumentUrls(kycId)
+          ]);
           setResolvedUrls(newResolvedUrls);
+          setOriginalUrls(newOriginalUrls);
         }
 
         // Update form data if details exist
@@ -335,6 +339,14 @@ export default function EditKycForm() {
     return getBackendUrl(filePath);
   };
 
+  // Helper function to get the full-size original of a document
+  const getOriginalUrl = (filePath: string) => {
+    if (originalUrls[filePath]) {
+      return originalUrls[filePath];
+    }
+    return getBackendUrl(filePath);
+  };
+
   const renderStep = () => {
     switch (currentStep) {
       case "personal":
@@ -643,6 +655,16 @@ export default function EditKycForm() {
                         <p className="mt-1 text-xs text-gray-500">
                           Uploaded on {new Date(doc.uploaded_at).toLocaleDateString()}
                         </p>
+                        {!doc.doc_type.includes('video') && (
+                          <a
+                            href={getOriginalUrl(doc.file_path)}
+                            target="_blank"
+                            rel="noopener noreferrer"
+                            className="mt-1 inline-block text-xs font-medium text-blue-600 hover:text-blue-700"
+                          >
+                            View original
+                          </a>
+                        )}
                       </div>
                     </div>
                   ))}
@@ -0,0 +1,218 @@
+"""
+Admission control for the upload and database-heavy routes.
+Each route group may run a limited number of requests per worker. Above the limit a bounded
+queue holds requests briefly, and beyond that they are refused with 429 and Retry-After, so a
+burst fails fast instead of piling up on the connection pool until pool_timeout and then
+retrying. Both groups share one budget, the pool size (DB_POOL_SIZE + DB_MAX_OVERFLOW): an
+upload holds a slot of its own group and one of the db group, so uploads never take more
+than half the pool and all requests together never more than the pool. Limits adapt to
+latency: a window slower than the group's baseline times ADMISSION_LATENCY_TOLERANCE lowers
+the limit by a tenth, a saturated window at normal latency raises it by one.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import get_settings
+from metrics import metrics
+
+WINDOW_SIZE = 20
+DECREASE_FACTOR = 0.9
+# The baseline follows slow changes (more data, a busier database) but not a burst
+BASELINE_DRIFT = 0.05
+LATENCY_SMOOTHING = 0.2
+MAX_RETRY_AFTER_SECONDS = 60
+# Groups whose requests also count against another group's budget
+PARENT_GROUPS = {"upload": "db"}
+
+
+class AdmissionLimiter:
+    """Adaptive concurrency limit with a bounded wait queue for one route group (event loop only)"""
+
+    def __init__(self, name: str, limit: int, min_limit: int, max_limit: int, max_queue: int,
+                 queue_timeout: float, tolerance: float):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.baseline: Optional[float] = None  # seconds
+        self.latency: Optional[float] = None  # smoothed seconds
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._window: List[float] = []
+        self._saturated = False
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained"""
+        latency = self.latency or 1.0
+        seconds = latency * (len(self._waiters) + 1) / max(1, int(self.limit))
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(seconds)))
+
+    def _reject(self, reason: str):
+        metrics.increment(f"admission.rejected {self.name}")
+        metrics.increment(f"admission.rejected_{reason} {self.name}")
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy - try again shortly",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises 429 when the queue is full or too slow"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        self._saturated = True
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        metrics.increment(f"admission.queued {self.name}")
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait((future,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        metrics.observe(f"admission.queue_wait_ms {self.name}", (time.perf_counter() - queued) * 1000)
+        if not future.done():
+            self._abandon(future)
+            self._reject("queue_timeout")
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done():
+            # The slot was handed over just as the waiter gave up - pass it on
+            self.in_flight -= 1
+            self._wake()
+        else:
+            future.cancel()
+            self._waiters.remove(future)
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def release(self, elapsed: float):
+        """Give the slot back and record how long the request held it"""
+        self.in_flight -= 1
+        self._record(elapsed)
+        self._wake()
+
+    def cancel(self):
+        """Give the slot back without recording a latency - the request never ran"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _record(self, elapsed: float):
+        self.latency = elapsed if self.latency is None else self.latency + (elapsed - self.latency) * LATENCY_SMOOTHING
+        self._window.append(elapsed)
+        if len(self._window) < WINDOW_SIZE:
+            return
+        average = sum(self._window) / len(self._window)
+        self._window = []
+        if self.baseline is None or average < self.baseline:
+            self.baseline = average
+        else:
+            self.baseline += (average - self.baseline) * BASELINE_DRIFT
+
+        if average > self.baseline * self.tolerance:
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            metrics.increment(f"admission.limit_decreased {self.name}")
+        elif self._saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self._saturated = False
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "baseline_ms": round(self.baseline * 1000, 1) if self.baseline is not None else None,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+        }
+
+
+def pool_capacity() -> int:
+    """Connections one worker's engine may open"""
+    settings = get_settings()
+    return max(1, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
+
+def create_limiter(name: str) -> AdmissionLimiter:
+    """
+    db - every database route, uploads included, shares the whole pool; upload - uploads hold
+    a connection while the file is stored and extracted, so at most half of it is theirs
+    """
+    settings = get_settings()
+    capacity = pool_capacity()
+    max_limit = max(1, capacity // 2) if name == "upload" else capacity
+    return AdmissionLimiter(
+        name,
+        limit=max_limit,
+        min_limit=1,
+        max_limit=max_limit,
+        max_queue=max(1, int(max_limit * settings.ADMISSION_QUEUE_FACTOR)),
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        tolerance=settings.ADMISSION_LATENCY_TOLERANCE
+    )
+
+
+_limiters: Dict[str, AdmissionLimiter] = {}
+
+
+def get_admission_limiter(name: str) -> AdmissionLimiter:
+    """Get or create this worker's limiter of a route group"""
+    if name not in _limiters:
+        _limiters[name] = create_limiter(name)
+    return _limiters[name]
+
+
+def admission_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+def limiter_chain(name: str) -> List[AdmissionLimiter]:
+    """The group's limiter followed by those of the groups whose budget it shares"""
+    names = [name]
+    while names[-1] in PARENT_GROUPS:
+        names.append(PARENT_GROUPS[names[-1]])
+    return [get_admission_limiter(group) for group in names]
+
+
+def admit(name: str):
+    """Route dependency holding a slot of the group's limiter - and its parent groups' - for the whole request"""
+    async def dependency():
+        if not get_settings().ADMISSION_ENABLED:
+            yield
+            return
+        held = []
+        try:
+            for limiter in limiter_chain(name):
+                await limiter.acquire()
+                held.append(limiter)
+        except BaseException:
+            # Refused or cancelled further up the chain - give back the slots already taken
+            for limiter in reversed(held):
+                limiter.cancel()
+            raise
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            for limiter in reversed(held):
+                limiter.release(elapsed)
+    return dependency
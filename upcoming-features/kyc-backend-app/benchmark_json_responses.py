@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+JSON response benchmark for the large read endpoints.
+Builds a /customers payload of --customers rows and a /kyc/screen-data payload with
+--documents documents, then compares the previous path (Pydantic response_model
+validation plus FastAPI's JSON rendering) with fast_json (orjson, no second validation)
+on serialization time and bytes on the wire uncompressed, gzip and brotli.
+No database or AWS access is required.
+
+Usage:
+    python benchmark_json_responses.py [--customers 1000] [--documents 200] [--runs 20]
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import fast_json
+from main import CustomerOut, KycScreenData
+
+STATUSES = ["pending", "submitted", "under_review", "approved", "rejected"]
+
+
+def customers_payload(count: int) -> list:
+    return [{
+        "kyc_details_id": i,
+        "kyc_case_id": 100000 + i,
+        "name": f"Customer Number {i}",
+        "email": f"customer{i}@example.com",
+        "status": STATUSES[i % len(STATUSES)]
+    } for i in range(count)]
+
+
+def screen_data_payload(documents: int) -> dict:
+    created = datetime(2024, 1, 15, 10, 30)
+    return {
+        "case": {"id": 42, "status": "submitted", "created_at": created.isoformat(),
+                 "updated_at": (created + timedelta(hours=2)).isoformat()},
+        "details": {
+            "id": 7, "name": "Customer Number 42", "dob": "1990-04-12", "address": "12 MG Road, Bengaluru 560001",
+            "email": "customer42@example.com", "phone": "+91 98765 43210", "pan": "ABCDE1234F",
+            "aadhar": "1234 5678 9012", "passport": "K1234567", "gender": "F", "father_name": "Father Of 42",
+            "created_at": created.isoformat(),
+        },
+        "documents": [{
+            "id": i,
+            "doc_type": ["aadhar_front", "aadhar_back", "pan", "passport", "photo", "selfie"][i % 6],
+            "file_path": f"uploads/kyc/42/{i:04d}_3f2a9c1e7b5d4a60.jpg",
+            "uploaded_at": (created + timedelta(minutes=i)).isoformat()
+        } for i in range(documents)],
+        "status": {"id": 3, "kyc_case_id": 42, "aadhar_front": True, "aadhar_back": True, "pan": True,
+                   "passport": False, "photo": True, "selfie": True, "video": False},
+    }
+
+
+def time_ms(render, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def compare(label: str, payload, adapter: TypeAdapter, runs: int):
+    def response_model_path():
+        # What FastAPI does for a route returning model objects with a response_model
+        validated = adapter.validate_python(payload)
+        return JSONResponse(jsonable_encoder(adapter.dump_python(validated, mode="json"))).body
+
+    def fast_path():
+        return fast_json.dumps(payload)
+
+    before_ms = time_ms(response_model_path, runs)
+    after_ms = time_ms(fast_path, runs)
+    body = fast_path()
+    print(f"📦 {label}")
+    print(f"   response_model + JSONResponse {before_ms:8.2f} ms  {len(response_model_path()):>9,} bytes")
+    print(f"   fast_json ({'orjson' if fast_json.orjson else 'json'}){'':<12}{after_ms:8.2f} ms  "
+          f"{len(body):>9,} bytes  ({before_ms / after_ms:.1f}x faster)")
+    encodings = ["gzip"] + (["br"] if fast_json.brotli else [])
+    for encoding in encodings:
+        compress_ms = time_ms(lambda: fast_json.compress(body, encoding), runs)
+        size = len(fast_json.compress(body, encoding))
+        print(f"   + {encoding:<4}{'':<24}{compress_ms:8.2f} ms  {size:>9,} bytes  "
+              f"({size / len(body):.0%} of uncompressed)")
+    if not fast_json.brotli:
+        print("   (install brotli to compare br)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON rendering of the large read endpoints")
+    parser.add_argument("--customers", type=int, default=1000, help="Rows in the /customers payload")
+    parser.add_argument("--documents", type=int, default=200, help="Documents in the /kyc/screen-data payload")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    compare(f"/customers with {args.customers} customers", customers_payload(args.customers),
+            TypeAdapter(List[CustomerOut]), args.runs)
+    compare(f"/kyc/screen-data with {args.documents} documents", screen_data_payload(args.documents),
+            TypeAdapter(KycScreenData), args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Worker start-up benchmark.
+Measures, in fresh interpreters, how long it takes to import main.py and to run the
+application's startup hooks - i.e. how long a new uvicorn worker needs before it can
+serve requests. No database or AWS access is required.
+The frameworks (fastapi, pydantic, sqlalchemy) are imported and timed first; what the
+target checks is the application's own share on top of them, which does not depend on how
+fast the machine imports third-party packages.
+
+Usage:
+    python benchmark_startup.py [--runs 10] [--target-ms 300]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+WORKER_SCRIPT = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import fastapi, pydantic, sqlalchemy.orm
+frameworks = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+ready = time.perf_counter()
+asyncio.run(main.app.router.shutdown())
+print(json.dumps({
+    "frameworks_ms": (frameworks - started) * 1000,
+    "import_ms": (imported - frameworks) * 1000,
+    "app_ms": (ready - frameworks) * 1000,
+    "ready_ms": (ready - started) * 1000,
+}))
+"""
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DB = os.path.join(APP_DIR, "benchmark_startup.db")
+
+
+def run_once() -> dict:
+    """Start one fresh interpreter and time import and startup"""
+    env = dict(os.environ)
+    # Point the engine at a throwaway SQLite file so nothing reaches RDS
+    env.setdefault("DATABASE_URL", f"sqlite:///{BENCHMARK_DB}")
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KYC API worker start-up")
+    parser.add_argument("--runs", type=int, default=10, help="Number of fresh interpreters to start")
+    parser.add_argument("--target-ms", type=float, default=300,
+                        help="Fail if the application's median share of start-up exceeds this")
+    args = parser.parse_args()
+
+    print(f"🚀 Starting {args.runs} fresh workers...")
+    samples = [run_once() for _ in range(args.runs)]
+
+    frameworks_ms = [s["frameworks_ms"] for s in samples]
+    import_ms = [s["import_ms"] for s in samples]
+    app_ms = [s["app_ms"] for s in samples]
+    ready_ms = [s["ready_ms"] for s in samples]
+    print(f"📚 Frameworks:       median {statistics.median(frameworks_ms):7.1f} ms   max {max(frameworks_ms):7.1f} ms")
+    print(f"📦 Import main.py:   median {statistics.median(import_ms):7.1f} ms   max {max(import_ms):7.1f} ms")
+    print(f"⚙️  Application:      median {statistics.median(app_ms):7.1f} ms   max {max(app_ms):7.1f} ms")
+    print(f"✅ Worker ready:     median {statistics.median(ready_ms):7.1f} ms   max {max(ready_ms):7.1f} ms")
+
+    if os.path.exists(BENCHMARK_DB):
+        os.remove(BENCHMARK_DB)
+
+    if statistics.median(app_ms) > args.target_ms:
+        print(f"❌ Median application start-up above target of {args.target_ms:.0f} ms")
+        sys.exit(1)
+    print(f"🎯 Within target of {args.target_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
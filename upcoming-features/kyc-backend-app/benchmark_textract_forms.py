@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Textract form parser benchmark.
+Builds large multi-page AnalyzeDocument responses from the fixtures in
+fixtures/textract/ and compares the indexed parser in textract_forms.py with the
+naive approach of scanning all blocks for every relationship Id.
+
+Usage:
+    python benchmark_textract_forms.py [--pages 1 10 50 200] [--save]
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+
+from textract_forms import extract_key_values, parse_responses
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "textract")
+FIXTURES = ("aadhar_front", "pancard", "passport")
+
+
+def load_fixture(doc_type: str) -> dict:
+    with open(os.path.join(FIXTURE_DIR, f"{doc_type}_analyze_document.json")) as f:
+        return json.load(f)
+
+
+def build_multipage(response: dict, pages: int) -> dict:
+    """Repeat a one-page response over many pages with unique block Ids"""
+    blocks = []
+    for page in range(1, pages + 1):
+        for block in response["Blocks"]:
+            clone = copy.deepcopy(block)
+            clone["Id"] = f"p{page}-{block['Id']}"
+            clone["Page"] = page
+            for relationship in clone.get("Relationships", ()):
+                relationship["Ids"] = [f"p{page}-{i}" for i in relationship["Ids"]]
+            blocks.append(clone)
+    return {"DocumentMetadata": {"Pages": pages}, "Blocks": blocks}
+
+
+def naive_key_values(blocks):
+    """Reference implementation - resolves every Id with a linear scan"""
+    def find(block_id):
+        for block in blocks:
+            if block["Id"] == block_id:
+                return block
+        return None
+
+    def text_of(block):
+        parts = []
+        for relationship in block.get("Relationships", ()):
+            if relationship["Type"] != "CHILD":
+                continue
+            for child_id in relationship["Ids"]:
+                child = find(child_id)
+                if child["BlockType"] == "WORD":
+                    parts.append(child["Text"])
+                elif child["BlockType"] == "SELECTION_ELEMENT":
+                    parts.append(child["SelectionStatus"])
+        return " ".join(parts)
+
+    pairs = []
+    for block in blocks:
+        if block["BlockType"] == "KEY_VALUE_SET" and "KEY" in block.get("EntityTypes", ()):
+            values = []
+            for relationship in block.get("Relationships", ()):
+                if relationship["Type"] == "VALUE":
+                    values.extend(text_of(find(i)) for i in relationship["Ids"])
+            pairs.append((text_of(block), " ".join(values)))
+    return pairs
+
+
+def time_call(fn, *args, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Textract form parser")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--naive-max-pages", type=int, default=50,
+                        help="Skip the quadratic reference above this many pages")
+    parser.add_argument("--save", action="store_true",
+                        help="Write the generated multi-page responses to fixtures/textract/")
+    args = parser.parse_args()
+
+    print(f"{'layout':<14}{'pages':>7}{'blocks':>9}{'indexed ms':>13}{'naive ms':>12}")
+    for doc_type in FIXTURES:
+        fixture = load_fixture(doc_type)
+        for pages in args.pages:
+            response = build_multipage(fixture, pages)
+            blocks = response["Blocks"]
+            if args.save:
+                path = os.path.join(FIXTURE_DIR, f"{doc_type}_{pages}_pages.json")
+                with open(path, "w") as f:
+                    json.dump(response, f)
+
+            indexed_ms = time_call(parse_responses, [response], doc_type)
+            if pages <= args.naive_max_pages:
+                naive_ms = f"{time_call(naive_key_values, blocks, repeat=1):12.1f}"
+                assert len(naive_key_values(blocks)) == len(extract_key_values(blocks))
+            else:
+                naive_ms = f"{'skipped':>12}"
+            print(f"{doc_type:<14}{pages:>7}{len(blocks):>9}{indexed_ms:13.2f}{naive_ms}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-case version for conditional GETs of /kyc/progress and /kyc/screen-data.
+The version is KycCase.updated_at plus the case's document count, read in one query.
+Every write that changes what those endpoints return touches updated_at, so a poll whose
+If-None-Match still matches is answered 304 without running the endpoint's queries.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from file_stream import etag_matches
+from metrics import metrics
+from models import KycCase, KycDocument
+from progress_events import get_progress_broker
+
+# Clients keep the body but revalidate it on every poll
+CACHE_CONTROL = "private, no-cache"
+
+
+def touch_case(db: Session, case_id: int):
+    """Mark the case as changed and push the change to its progress streams on commit (caller commits)"""
+    db.query(KycCase).filter(KycCase.id == case_id).update(
+        {KycCase.updated_at: datetime.utcnow()}, synchronize_session=False
+    )
+    get_progress_broker().stage(db, case_id)
+
+
+def case_etag(db: Session, case_id: int) -> Optional[str]:
+    """Weak ETag of the case's current version, or None when the case does not exist"""
+    document_count = (
+        select(func.count(KycDocument.id))
+        .where(KycDocument.kyc_case_id == KycCase.id)
+        .correlate(KycCase)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(KycCase.updated_at, document_count).where(KycCase.id == case_id)
+    ).first()
+    if row is None:
+        return None
+    updated_at, documents = row
+    stamp = updated_at.strftime("%Y%m%d%H%M%S%f") if updated_at else "0"
+    # Weak - the same version is served gzip, brotli or uncompressed
+    return f'W/"{case_id}-{stamp}-{documents}"'
+
+
+def not_modified(if_none_match: Optional[str], etag: Optional[str], name: str) -> bool:
+    """Whether the client's copy is current; counts answered and full responses per endpoint"""
+    if etag is not None and etag_matches(if_none_match, etag[2:]):
+        metrics.increment(f"conditional.not_modified {name}")
+        return True
+    metrics.increment(f"conditional.full {name}")
+    return False
@@ -0,0 +1,360 @@
+"""
+Chat assistant served by the API - the same Bedrock model as the chatbot Lambda without
+the API Gateway hop. Generations run in the thread pool under a global concurrency limit,
+identical prompts in flight share one model call, and each client is rate limited.
+Replies are returned whole or streamed as server-sent events. Like the Lambda, questions
+are grounded with the BM25 knowledge base index (chatbot_retrieval.py) and first questions
+are answered from the answer cache (chat_cache.py) when they can be.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from chat_cache import AnswerCache
+from chatbot_common import PROMPT_TEMPLATE
+from config import get_settings
+from metrics import metrics
+
+try:
+    # Copied next to main.py with the built chatbot_index/ directory (needs NumPy)
+    import chatbot_retrieval
+except ImportError:
+    chatbot_retrieval = None
+
+STREAM_ERRORS = ("internalServerException", "modelStreamErrorException", "throttlingException",
+                 "validationException", "modelTimeoutException", "serviceUnavailableException")
+MAX_TRACKED_CLIENTS = 10000
+
+
+class ChatModel:
+    """
+    Generates a reply to one prompt, piece by piece (runs in a worker thread). The generator
+    returns False when the reply must not be cached - cut off, or changed by the guardrail.
+    """
+    name = "base"
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class StubChatModel(ChatModel):
+    """Development model - a canned reply delivered at a model-like pace"""
+    name = "stub"
+    REPLY = ("I'm your KYC assistant. To complete KYC, upload your Aadhaar card (front and back), "
+             "PAN card, passport, photo, selfie and a short video, then review your details and submit.")
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(random.uniform(0.2, 0.4))
+        for word in self.REPLY.split(" "):
+            time.sleep(0.02)
+            yield word + " "
+
+
+class BedrockChatModel(ChatModel):
+    """Cohere Command on Bedrock with the chat guardrail, via invoke_model_with_response_stream"""
+    name = "bedrock"
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            settings = get_settings()
+            self._client = boto3.client(
+                'bedrock-runtime',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                aws_session_token=settings.AWS_SESSION_TOKEN or None,
+                region_name='us-west-2'
+            )
+        return self._client
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        settings = get_settings()
+        response = self.client.invoke_model_with_response_stream(
+            body=json.dumps({"prompt": prompt, "stream": True}),
+            modelId=settings.CHAT_MODEL_ID,
+            guardrailIdentifier=settings.CHAT_GUARDRAIL_ID,
+            guardrailVersion=settings.CHAT_GUARDRAIL_VERSION,
+            contentType="application/json",
+            accept="application/json"
+        )
+        for event in response["body"]:
+            for error in STREAM_ERRORS:
+                if error in event:
+                    raise RuntimeError(f"{error}: {event[error].get('message', '')}")
+            if "chunk" not in event:
+                continue
+            payload = json.loads(event["chunk"]["bytes"])
+            if payload.get("text"):
+                yield payload["text"]
+            if payload.get("is_finished"):
+                return (payload.get("finish_reason") == "COMPLETE"
+                        and payload.get("amazon-bedrock-guardrailAction") != "INTERVENED")
+        return False
+
+
+CHAT_MODELS = {"stub": StubChatModel, "bedrock": BedrockChatModel}
+_models = {}
+
+
+_retrieval_index = None
+_retrieval_loaded = False
+
+
+def get_retrieval_index():
+    """The knowledge base index at CHAT_RETRIEVAL_INDEX_PATH, loaded once per worker; None when not built"""
+    global _retrieval_index, _retrieval_loaded
+    if not _retrieval_loaded:
+        if chatbot_retrieval is None:
+            print("⚠️  chatbot_retrieval is not installed - chat prompts are sent without knowledge base context")
+        else:
+            _retrieval_index = chatbot_retrieval.load_index(get_settings().CHAT_RETRIEVAL_INDEX_PATH)
+            if _retrieval_index is None:
+                print("⚠️  Chat knowledge base index not built - run 'python chatbot_retrieval.py build'")
+        _retrieval_loaded = True
+    return _retrieval_index
+
+
+def retrieve_context(question: str) -> str:
+    """Best knowledge base passages for the question within CHAT_RETRIEVAL_TOKEN_BUDGET (thread pool)"""
+    index = get_retrieval_index()
+    if index is None:
+        return ""
+    settings = get_settings()
+    started = time.perf_counter()
+    context = index.context_for(question, settings.CHAT_RETRIEVAL_TOP_K, settings.CHAT_RETRIEVAL_TOKEN_BUDGET)
+    metrics.observe("chat.retrieval_ms", (time.perf_counter() - started) * 1000)
+    return context
+
+
+def ground_prompt(question: str, context: str) -> str:
+    """The question with its knowledge base passages, or as it is when there are none"""
+    if not context:
+        return question
+    return PROMPT_TEMPLATE.format(context=context, question=question)
+
+
+def cache_namespace() -> str:
+    """Answers of another model, guardrail or knowledge base are never reused"""
+    settings = get_settings()
+    index = get_retrieval_index()
+    index_version = index.version if index is not None else "none"
+    return f"{settings.CHAT_MODEL_ID}:{settings.CHAT_GUARDRAIL_ID}:{settings.CHAT_GUARDRAIL_VERSION}:{index_version}"
+
+
+def get_chat_model(backend: Optional[str] = None) -> ChatModel:
+    """Model for the configured backend, created once per worker"""
+    backend = backend or get_settings().CHAT_BACKEND
+    if backend not in CHAT_MODELS:
+        raise ValueError(f"Unknown chat backend: {backend}")
+    if backend not in _models:
+        _models[backend] = CHAT_MODELS[backend]()
+    return _models[backend]
+
+
+class ClientRateLimiter:
+    """Token bucket per client - rate_per_minute sustained, burst at once"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # client -> [tokens, updated]
+
+    def acquire(self, client: str) -> Optional[float]:
+        """Take one request from the client's bucket; returns seconds to wait when it is empty"""
+        now = time.monotonic()
+        bucket = self._buckets.pop(client, None) or [float(self.burst), now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._buckets[client] = bucket
+        while len(self._buckets) > MAX_TRACKED_CLIENTS:
+            self._buckets.popitem(last=False)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return None
+        return (1 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+
+class Generation:
+    """One model call in flight; any number of requests read its pieces as they arrive"""
+
+    def __init__(self):
+        self.pieces: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.cacheable = False
+        self.generation_ms = 0.0
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, piece: str):
+        self.pieces.append(piece)
+        self._notify()
+
+    def finish(self, error: Optional[Exception] = None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.pieces):
+                yield self.pieces[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class ChatService:
+    """Bounded, coalescing and cached front of the chat model"""
+
+    def __init__(self, max_concurrency: int, cache: AnswerCache):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Dict[str, Generation] = {}
+        self._tasks = set()
+        self.cache = cache
+
+    @staticmethod
+    def coalesce_key(prompt: str) -> str:
+        return " ".join(prompt.lower().split())
+
+    def _run_model(self, model: ChatModel, prompt: str, generation: Generation, loop):
+        started = time.perf_counter()
+        first_piece = True
+        pieces = model.stream(prompt)
+        while True:
+            try:
+                piece = next(pieces)
+            except StopIteration as finished:
+                generation.cacheable = finished.value is not False
+                break
+            if first_piece:
+                metrics.observe(f"chat.ttft_ms {model.name}", (time.perf_counter() - started) * 1000)
+                first_piece = False
+            loop.call_soon_threadsafe(generation.push, piece)
+        generation.generation_ms = (time.perf_counter() - started) * 1000
+        metrics.observe(f"chat.generation_ms {model.name}", generation.generation_ms)
+
+    async def _produce(self, key: str, prompt: str, generation: Generation, cache_question: Optional[str]):
+        model = get_chat_model()
+        try:
+            queued = time.perf_counter()
+            async with self._semaphore:
+                metrics.observe("chat.queue_wait_ms", (time.perf_counter() - queued) * 1000)
+                await run_in_threadpool(self._run_model, model, prompt, generation, asyncio.get_running_loop())
+            if cache_question is not None and generation.cacheable:
+                self.cache.put(cache_namespace(), cache_question, "".join(generation.pieces), generation.generation_ms)
+            generation.finish()
+        except Exception as e:
+            print(f"❌ DEBUG: Chat generation failed: {e}")
+            metrics.increment(f"chat.errors {model.name}")
+            generation.finish(e)
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stream(self, prompt: str, cache_question: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Reply pieces for the prompt, joining an identical generation already in flight.
+        With cache_question the answer cache is consulted first and a complete reply is stored
+        under it - pass the customer's question only when the prompt has no conversation history.
+        """
+        if cache_question is not None:
+            cached, _ = self.cache.get(cache_namespace(), cache_question)
+            if cached is not None:
+                return _replay(cached)
+        key = self.coalesce_key(prompt)
+        generation = self._in_flight.get(key)
+        if generation is None:
+            generation = Generation()
+            self._in_flight[key] = generation
+            task = asyncio.get_running_loop().create_task(self._produce(key, prompt, generation, cache_question))
+            # The generation outlives a requester that disconnects - keep the task referenced
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            metrics.increment("chat.generations")
+        else:
+            metrics.increment("chat.coalesced")
+        return generation.follow()
+
+    async def complete(self, prompt: str, cache_question: Optional[str] = None) -> str:
+        """Whole reply for the prompt"""
+        return "".join([piece async for piece in self.stream(prompt, cache_question)])
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "cache": self.cache.summary()}
+
+
+async def _replay(answer: str) -> AsyncIterator[str]:
+    """A cached answer, delivered whole"""
+    yield answer
+
+
+def sse_event(message: dict) -> str:
+    return f"data: {json.dumps(message)}\n\n"
+
+
+async def stream_events(service: "ChatService", prompt: str, conversation_id: Optional[str] = None,
+                        on_reply: Optional[Callable[[str], Awaitable[None]]] = None,
+                        cache_question: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Server-sent events with the same messages as the Lambda WebSocket: token, done, error.
+    on_reply receives the whole reply before the done event is sent.
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    pieces = []
+    try:
+        async for piece in service.stream(prompt, cache_question):
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            pieces.append(piece)
+            yield sse_event({"type": "token", "text": piece})
+    except Exception:
+        yield sse_event({"type": "error", "message": "Error getting reply."})
+        return
+    if on_reply is not None:
+        await on_reply("".join(pieces))
+    yield sse_event({"type": "done", "ttft_ms": first_token_ms, "conversation_id": conversation_id})
+
+
+_chat_service = None
+_rate_limiter = None
+
+
+def get_chat_service() -> ChatService:
+    """Get or create this worker's chat service"""
+    global _chat_service
+    if _chat_service is None:
+        settings = get_settings()
+        _chat_service = ChatService(
+            settings.CHAT_MAX_CONCURRENCY,
+            AnswerCache(settings.CHAT_CACHE_MAX_ENTRIES, settings.CHAT_CACHE_TTL_SECONDS,
+                        settings.CHAT_CACHE_SIMILARITY_THRESHOLD)
+        )
+    return _chat_service
+
+
+def get_chat_rate_limiter() -> ClientRateLimiter:
+    """Get or create this worker's per-client chat rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        settings = get_settings()
+        _rate_limiter = ClientRateLimiter(settings.CHAT_RATE_LIMIT_PER_MINUTE, settings.CHAT_RATE_LIMIT_BURST)
+    return _rate_limiter
@@ -0,0 +1,29 @@
+"""
+Answer cache in front of the chat model - the chatbot Lambda's AnswerCache from
+chatbot_common.py (repository root), so a question gets the same treatment whichever path
+serves it. Lookups are also counted in /metrics. Only first questions of a conversation
+are cached - a follow-up's answer depends on the earlier turns.
+"""
+
+import os
+import sys
+from typing import Optional
+
+# chatbot_common.py is shared with the chatbot Lambda; copy it next to main.py when the
+# backend is deployed without the rest of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+import chatbot_common
+from metrics import metrics
+
+
+class AnswerCache(chatbot_common.AnswerCache):
+    """Two-tier answer cache bounded by max_entries (LRU) and a TTL (event loop only)"""
+
+    def record(self, tier: Optional[str], saved_ms: float):
+        super().record(tier, saved_ms)
+        if tier is None:
+            metrics.increment("chat.cache_misses")
+            return
+        metrics.increment(f"chat.cache_hits {tier}")
+        metrics.increment("chat.cache_saved_ms", saved_ms)
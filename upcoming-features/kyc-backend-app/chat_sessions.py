@@ -0,0 +1,167 @@
+"""
+Chat conversation history, stored per conversation in chat_conversations.
+Each prompt is sent with as much recent history as fits CHAT_HISTORY_TOKEN_BUDGET. When
+stored history outgrows the budget the oldest turns are condensed into short summary
+lines (no extra model call), and the summary itself is capped at CHAT_SUMMARY_MAX_TOKENS,
+so prompt size - and with it latency and cost per turn - stays bounded.
+"""
+
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from chat import ground_prompt
+from chatbot_common import CONVERSATION_INSTRUCTIONS, estimate_tokens
+from config import get_settings
+from database import get_session_local
+from metrics import metrics
+from models import ChatConversation
+
+CONVERSATION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+CONDENSED_CHARS = 160
+ROLE_LABELS = {"customer": "Customer", "assistant": "Assistant"}
+
+
+def _turn_tokens(turn: dict) -> int:
+    return estimate_tokens(f"{ROLE_LABELS[turn['role']]}: {turn['text']}\n")
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def condense(customer: dict, assistant: Optional[dict]) -> str:
+    """One summary line for a question and the first sentence of its answer"""
+    line = f"Customer asked: {_clip(customer['text'], CONDENSED_CHARS)}"
+    if assistant is not None:
+        first_sentence = re.split(r"(?<=[.!?])\s", assistant["text"].strip(), maxsplit=1)[0]
+        line += f" / Assistant: {_clip(first_sentence, CONDENSED_CHARS)}"
+    return line
+
+
+def compact(summary: List[str], turns: List[dict], budget: int, summary_budget: int):
+    """
+    Fold the oldest question/answer pairs into the summary until summary and turns fit the
+    budget (the latest pair is always kept), then drop the oldest summary lines over
+    summary_budget. Returns (summary, turns, token count).
+    """
+    summary, turns = list(summary), list(turns)
+
+    def total():
+        return sum(estimate_tokens(line) for line in summary) + sum(_turn_tokens(turn) for turn in turns)
+
+    while len(turns) > 2 and total() > budget:
+        customer = turns.pop(0)
+        assistant = turns.pop(0) if turns and turns[0]["role"] == "assistant" else None
+        summary.append(condense(customer, assistant))
+    while summary and sum(estimate_tokens(line) for line in summary) > summary_budget:
+        summary.pop(0)
+    return summary, turns, total()
+
+
+def has_history(conversation: Optional[dict]) -> bool:
+    return bool(conversation and (conversation["summary"] or conversation["turns"]))
+
+
+def build_prompt(conversation: Optional[dict], prompt: str, context: str = "") -> str:
+    """
+    Model prompt for a new question: knowledge base context, summary lines and the most
+    recent turns that fit the history budget, then the question. Without history it is the
+    chatbot Lambda's prompt - the question grounded in the context, or as it is without one.
+    """
+    if not has_history(conversation):
+        return ground_prompt(prompt, context)
+    budget = get_settings().CHAT_HISTORY_TOKEN_BUDGET - estimate_tokens(prompt)
+    lines = []
+    used = 0
+    for turn in reversed(conversation["turns"]):
+        tokens = _turn_tokens(turn)
+        if used + tokens > budget:
+            break
+        lines.insert(0, f"{ROLE_LABELS[turn['role']]}: {turn['text']}")
+        used += tokens
+    summary = []
+    for line in reversed(conversation["summary"]):
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            break
+        summary.insert(0, f"- {line}")
+        used += tokens
+
+    parts = []
+    if context:
+        parts.append(CONVERSATION_INSTRUCTIONS + context)
+    if summary:
+        parts.append("Earlier in this conversation:\n" + "\n".join(summary))
+    parts.append("\n".join(lines + [f"Customer: {prompt}", "Assistant:"]))
+    metrics.observe("chat.history_tokens", used)
+    return "\n\n".join(parts)
+
+
+def _is_expired(conversation: ChatConversation) -> bool:
+    ttl = timedelta(hours=get_settings().CHAT_CONVERSATION_TTL_HOURS)
+    return conversation.updated_at is not None and conversation.updated_at < datetime.utcnow() - ttl
+
+
+def load_conversation(conversation_id: Optional[str]) -> Optional[dict]:
+    """Summary and turns of a live conversation, or None for a new, unknown or expired one"""
+    if not conversation_id or not CONVERSATION_ID_PATTERN.match(conversation_id):
+        return None
+    db = get_session_local()()
+    try:
+        conversation = db.query(ChatConversation).filter(ChatConversation.id == conversation_id).first()
+        if conversation is None or _is_expired(conversation):
+            return None
+        return {"id": conversation.id, "summary": conversation.summary or [], "turns": conversation.turns or []}
+    finally:
+        db.close()
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def record_turn(conversation_id: str, prompt: str, reply: str):
+    """Append a question and its reply to the conversation, compacting its history"""
+    settings = get_settings()
+    db = get_session_local()()
+    try:
+        conversation = db.query(ChatConversation).filter(
+            ChatConversation.id == conversation_id
+        ).with_for_update().first()
+        if conversation is None:
+            conversation = ChatConversation(id=conversation_id, summary=[], turns=[])
+            db.add(conversation)
+        elif _is_expired(conversation):
+            conversation.summary, conversation.turns = [], []
+        turns = (conversation.turns or []) + [
+            {"role": "customer", "text": prompt},
+            {"role": "assistant", "text": reply},
+        ]
+        summary, turns, token_count = compact(
+            conversation.summary or [], turns, settings.CHAT_HISTORY_TOKEN_BUDGET, settings.CHAT_SUMMARY_MAX_TOKENS
+        )
+        # New lists so the JSON columns are seen as changed
+        conversation.summary = summary
+        conversation.turns = turns
+        conversation.token_count = token_count
+        conversation.updated_at = datetime.utcnow()
+        db.commit()
+        metrics.observe("chat.conversation_tokens", token_count)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def collect_expired_conversations(db: Session) -> int:
+    """Delete conversations idle past CHAT_CONVERSATION_TTL_HOURS; returns how many were deleted"""
+    cutoff = datetime.utcnow() - timedelta(hours=get_settings().CHAT_CONVERSATION_TTL_HOURS)
+    deleted = db.query(ChatConversation).filter(ChatConversation.updated_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -5,6 +5,7 @@ from functools import lru_cache
 class Settings(BaseSettings):
     # Environment
     ENV: str = os.getenv("ENV", "local")
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     
     # Database - Use AWS PostgreSQL for both local and AWS environments
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
@@ -16,6 +17,9 @@ class Settings(BaseSettings):
     DB_PORT: str = os.getenv("DB_PORT", "5432")
     DB_NAME: str = os.getenv("DB_NAME", "kycdb")
     
+    # Create tables in every worker's startup hook (off by default - run `python database.py` once instead)
+    INIT_DB_ON_STARTUP: bool = os.getenv("INIT_DB_ON_STARTUP", "false").lower() == "true"
+    
     # AWS Configuration (optional - will use environment variables or AWS profiles)
     AWS_ACCESS_KEY_ID: str = os.getenv("AWS_ACCESS_KEY_ID", "")
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
@@ -26,6 +30,95 @@ class Settings(BaseSettings):
     # CORS Settings
     CORS_ORIGINS: list = ["http://localhost:3000"]  # Add your frontend URLs
     
+    # Document extraction - backend is one of "mock", "textract", "local_ocr"
+    EXTRACTOR_BACKEND: str = os.getenv("EXTRACTOR_BACKEND", "mock")
+    EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "15"))
+    EXTRACTION_MAX_WORKERS: int = int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+    
+    # Image normalization of uploaded photos (EXIF rotation, downscale, JPEG recompression)
+    IMAGE_NORMALIZATION_ENABLED: bool = os.getenv("IMAGE_NORMALIZATION_ENABLED", "true").lower() == "true"
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "2000"))
+    IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+    IMAGE_KEEP_ORIGINAL: bool = os.getenv("IMAGE_KEEP_ORIGINAL", "false").lower() == "true"
+    IMAGE_PROCESS_WORKERS: int = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+    
+    # Resumable (tus-style) uploads - the maximum size defaults to /kyc/upload's MAX_FILE_SIZE (50MB)
+    RESUMABLE_MAX_UPLOAD_SIZE: int = int(os.getenv("RESUMABLE_MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+    RESUMABLE_MAX_CHUNK_SIZE: int = int(os.getenv("RESUMABLE_MAX_CHUNK_SIZE", str(32 * 1024 * 1024)))
+    UPLOAD_SESSION_TTL_HOURS: float = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    UPLOAD_GC_INTERVAL_SECONDS: float = float(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", "900"))
+    
+    # Face matching of video keyframes and selfies against the photo/passport - backend is "rekognition", or "stub" (records "unavailable")
+    FACE_MATCH_BACKEND: str = os.getenv("FACE_MATCH_BACKEND", "stub")
+    FACE_MATCH_THRESHOLD: float = float(os.getenv("FACE_MATCH_THRESHOLD", "90"))
+    KEYFRAME_INTERVAL_SECONDS: float = float(os.getenv("KEYFRAME_INTERVAL_SECONDS", "1"))
+    KEYFRAME_MAX_FRAMES: int = int(os.getenv("KEYFRAME_MAX_FRAMES", "5"))
+    
+    # Presigned download URLs - cached per worker and reissued once less than the margin remains
+    PRESIGNED_URL_EXPIRES_SECONDS: int = int(os.getenv("PRESIGNED_URL_EXPIRES_SECONDS", "3600"))
+    PRESIGNED_URL_REFRESH_MARGIN_SECONDS: int = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN_SECONDS", "900"))
+    PRESIGNED_URL_CACHE_SIZE: int = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "5000"))
+    
+    # Local files streamed by /files/stream are handed to nginx when set (internal location aliasing uploads/)
+    FILE_ACCEL_REDIRECT_PREFIX: str = os.getenv("FILE_ACCEL_REDIRECT_PREFIX", "")
+    
+    # Chat assistant - backend is "bedrock" or "stub" (canned replies for development)
+    CHAT_BACKEND: str = os.getenv("CHAT_BACKEND", "stub")
+    CHAT_MODEL_ID: str = os.getenv("CHAT_MODEL_ID", "cohere.command-text-v14")
+    CHAT_GUARDRAIL_ID: str = os.getenv("CHAT_GUARDRAIL_ID", "d6oz1ievwyot")
+    CHAT_GUARDRAIL_VERSION: str = os.getenv("CHAT_GUARDRAIL_VERSION", "1")
+    CHAT_MAX_CONCURRENCY: int = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+    CHAT_MAX_PROMPT_CHARS: int = int(os.getenv("CHAT_MAX_PROMPT_CHARS", "2000"))
+    CHAT_RATE_LIMIT_PER_MINUTE: float = float(os.getenv("CHAT_RATE_LIMIT_PER_MINUTE", "20"))
+    CHAT_RATE_LIMIT_BURST: int = int(os.getenv("CHAT_RATE_LIMIT_BURST", "5"))
+    # Conversation history sent with each prompt, trimmed to the budget (estimated tokens)
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "800"))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
+    CHAT_CONVERSATION_TTL_HOURS: int = int(os.getenv("CHAT_CONVERSATION_TTL_HOURS", "24"))
+    # Answer cache and knowledge base grounding - same defaults as the chatbot Lambda
+    CHAT_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "500"))
+    CHAT_CACHE_TTL_SECONDS: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+    CHAT_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("CHAT_CACHE_SIMILARITY_THRESHOLD", "0.85"))
+    CHAT_RETRIEVAL_INDEX_PATH: str = os.getenv("CHAT_RETRIEVAL_INDEX_PATH", "chatbot_index")
+    CHAT_RETRIEVAL_TOP_K: int = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "3"))
+    CHAT_RETRIEVAL_TOKEN_BUDGET: int = int(os.getenv("CHAT_RETRIEVAL_TOKEN_BUDGET", "600"))
+    
+    # JSON bodies of the large read endpoints at least this size are brotli/gzip compressed
+    RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    
+    # Pushed progress - "local" (one worker) or "postgres" (LISTEN/NOTIFY across workers)
+    PROGRESS_EVENTS_BACKEND: str = os.getenv("PROGRESS_EVENTS_BACKEND", "local")
+    PROGRESS_EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("PROGRESS_EVENTS_HEARTBEAT_SECONDS", "15"))
+    
+    # Connection pool of each worker's engine (PostgreSQL)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    
+    # Admission control - route concurrency limits sized from the pool, adapted to latency
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_QUEUE_FACTOR: float = float(os.getenv("ADMISSION_QUEUE_FACTOR", "1.0"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+    ADMISSION_LATENCY_TOLERANCE: float = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+    
+    # Idempotency-Key on /kyc/upload, /kyc/register and /kyc/details
+    IDEMPOTENCY_TTL_HOURS: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+    IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+    
+    # Slow query log
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    SLOW_QUERY_LOG_SIZE: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+    
+    # Health probing - dependencies are checked in the background on this interval
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "15"))
+    HEALTH_STALE_AFTER_SECONDS: float = float(os.getenv("HEALTH_STALE_AFTER_SECONDS", "60"))
+    
+    # Expired chat conversations and other stale rows are deleted on this interval (maintenance.py)
+    MAINTENANCE_INTERVAL_SECONDS: float = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "900"))
+    
+    # Admin endpoints - requests must send it in the X-Admin-Token header; they are refused while it is unset
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
     # Lambda Settings
     LAMBDA_FUNCTION_NAME: str = os.getenv("LAMBDA_FUNCTION_NAME", "kyc-api")
     
@@ -37,6 +130,32 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache()
+def load_custom_secrets():
+    """
+    Load our secrets.py once - it shares its name with the stdlib module,
+    so it is imported from its path
+    """
+    import importlib.util
+    
+    # Get the path to our custom secrets.py file
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    secrets_path = os.path.join(current_dir, 'secrets.py')
+    
+    # Load our custom secrets module
+    spec = importlib.util.spec_from_file_location("custom_secrets", secrets_path)
+    custom_secrets = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(custom_secrets)
+    return custom_secrets
+
+
+def uses_secrets_manager() -> bool:
+    """
+    Whether database credentials come from Secrets Manager rather than DATABASE_URL
+    """
+    return not get_settings().DATABASE_URL
+
+
 def get_database_url() -> str:
     """
     Get database URL - always use AWS PostgreSQL
@@ -49,19 +168,7 @@ def get_database_url() -> str:
     
     # Always use AWS PostgreSQL database
     try:
-        import importlib.util
-        import os
-        
-        # Get the path to our custom secrets.py file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        secrets_path = os.path.join(current_dir, 'secrets.py')
-        
-        # Load our custom secrets module
-        spec = importlib.util.spec_from_file_location("custom_secrets", secrets_path)
-        custom_secrets = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(custom_secrets)
-        
-        secret_db_url = custom_secrets.get_database_url()
+        secret_db_url = load_custom_secrets().get_cached_database_url()
         if secret_db_url:
             return secret_db_url
     except Exception as e:
@@ -77,4 +184,4 @@ def get_database_url() -> str:
     fallback_url = f"postgresql://{username}:{password}@{host}:{port}/{dbname}"
     print(f"Using PostgreSQL database URL: postgresql://{username}:***@{host}:{port}/{dbname}")
     
-    return fallback_url 
\ No newline at end of file
+    return fallback_url
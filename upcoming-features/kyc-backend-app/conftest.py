@@ -0,0 +1,11 @@
+"""
+Shared pytest setup - a throwaway SQLite database and local settings, set before any test
+module imports the application (settings are read once, at import).
+"""
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="kyc-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["ENV"] = "local"
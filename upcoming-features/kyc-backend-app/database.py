@@ -1,12 +1,44 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from models import Base
-from config import get_settings, get_database_url
+from config import get_settings, get_database_url, load_custom_secrets, uses_secrets_manager
+from query_counter import install_query_counter
+from slow_query_log import get_slow_query_log
 
 # Don't create engine at import time - create it when needed
 _engine = None
 _SessionLocal = None
 
+def is_authentication_error(error: Exception) -> bool:
+    """Whether a connect error was caused by rejected credentials"""
+    message = str(error).lower()
+    return "password authentication failed" in message or "authentication failed" in message
+
+def install_credential_refresh(engine):
+    """
+    Supply credentials from the secrets cache on every new connection.
+    If the server rejects them (the secret was rotated), the secret is reloaded
+    once and the connection retried, so the pool heals without a restart.
+    """
+    secrets_cache = load_custom_secrets().secrets_cache
+    secrets_cache.start_background_refresh()
+
+    @event.listens_for(engine, "do_connect")
+    def _connect_with_current_credentials(dialect, conn_rec, cargs, cparams):
+        secret = secrets_cache.get()
+        cparams["user"] = secret.get("username", cparams.get("user"))
+        cparams["password"] = secret.get("password", cparams.get("password"))
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except dialect.dbapi.OperationalError as e:
+            if not is_authentication_error(e):
+                raise
+            print("🔑 Database authentication failed - refreshing credentials from Secrets Manager")
+            secret = secrets_cache.refresh(previous=secret)
+            cparams["user"] = secret.get("username", cparams.get("user"))
+            cparams["password"] = secret.get("password", cparams.get("password"))
+            return dialect.connect(*cargs, **cparams)
+
 def get_engine():
     """Get or create the database engine"""
     global _engine
@@ -27,9 +59,13 @@ def get_engine():
             _engine = create_engine(
                 database_url,
                 pool_pre_ping=True,  # Enable connection health checks
-                pool_size=5,  # Adjust based on your needs
-                max_overflow=10
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW
             )
+            if uses_secrets_manager():
+                install_credential_refresh(_engine)
+        install_query_counter(_engine)
+        get_slow_query_log().install(_engine)
     return _engine
 
 def get_session_local():
@@ -41,9 +77,13 @@ def get_session_local():
     return _SessionLocal
 
 def init_db():
-    """Initialize the database by creating all tables"""
+    """Initialize the database by creating all tables and any indexes missing from existing ones"""
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so indexes added to their models later are created here
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db():
     """Get database session"""
@@ -52,4 +92,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+if __name__ == "__main__":
+    # Create the schema once per deployment instead of in every worker's startup hook
+    init_db()
+    print("✅ Database initialized successfully")
@@ -0,0 +1,163 @@
+"""
+Thumbnail and preview derivatives of uploaded documents.
+Images are downscaled and PDFs rendered from their first page, then cached in storage
+next to the originals under uploads/derivatives/<size>/. Derivatives are created in the
+background at upload time and lazily on first request; the admin UI loads them through
+/files/{file_path}?size=thumb|preview instead of the full original. A re-upload to the same
+location deletes the cached derivatives of the old file before they can be served again.
+Rendering needs Pillow (and pypdfium2 for PDFs) - without them the original is served.
+"""
+
+import asyncio
+import io
+import os
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from image_pipeline import get_process_pool
+from metrics import metrics
+from storage import UPLOAD_DIR, is_safe_key, path_within_uploads, storage
+
+# Longest side in pixels per derivative size
+DERIVATIVE_SIZES = {"thumb": 256, "preview": 1024}
+DERIVATIVE_QUALITY = 80
+RENDERABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".pdf"}
+
+# Derivatives being rendered in this worker - concurrent requests share one render
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def is_renderable(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in RENDERABLE_EXTENSIONS
+
+
+def derivative_path(file_path: str, size: str) -> Optional[str]:
+    """
+    Storage location of a derivative, in the same form as the original:
+    s3://bucket/uploads/kyc/1/pancard/pan.pdf -> s3://bucket/uploads/derivatives/preview/kyc/1/pancard/pan.pdf.jpg
+    uploads/1_pancard_pan.pdf -> uploads/derivatives/preview/1_pancard_pan.pdf.jpg
+    None when the original is outside storage (a '..' key, or a local path outside uploads/),
+    so no derivative is read or written outside uploads/derivatives.
+    """
+    if file_path.startswith("s3://"):
+        bucket, key = file_path.replace("s3://", "").split("/", 1)
+        if not is_safe_key(key):
+            return None
+        if key.startswith("uploads/"):
+            key = key[len("uploads/"):]
+        return f"s3://{bucket}/uploads/derivatives/{size}/{key}.jpg"
+    name = path_within_uploads(file_path)
+    if name is None:
+        return None
+    return os.path.join(UPLOAD_DIR, "derivatives", size, f"{name}.jpg")
+
+
+def render_derivative(data: bytes, is_pdf: bool, max_dimension: int, quality: int) -> Optional[bytes]:
+    """
+    Render one derivative as JPEG (runs in a pool process).
+    Returns None when the optional libraries are missing or the file cannot be read.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        if is_pdf:
+            try:
+                import pypdfium2 as pdfium
+            except ImportError:
+                return None
+            pdf = pdfium.PdfDocument(data)
+            try:
+                page = pdf[0]
+                # Render at a scale that gives roughly max_dimension on the longer side
+                width, height = page.get_size()
+                scale = max(max_dimension / max(width, height), 0.1)
+                image = page.render(scale=scale).to_pil()
+            finally:
+                pdf.close()
+        else:
+            image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        return output.getvalue()
+    except Exception as e:
+        print(f"⚠️  DEBUG: Derivative rendering failed: {e}")
+        return None
+
+
+async def _create(file_path: str, size: str, target: str) -> Optional[str]:
+    data = await run_in_threadpool(storage.read_file, file_path)
+    is_pdf = file_path.lower().endswith(".pdf")
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(
+        get_process_pool(), render_derivative, data, is_pdf, DERIVATIVE_SIZES[size], DERIVATIVE_QUALITY
+    )
+    if rendered is None:
+        metrics.increment("derivatives.unavailable")
+        return None
+    await run_in_threadpool(storage.write_path, target, rendered, "image/jpeg")
+    metrics.increment(f"derivatives.created {size}")
+    metrics.increment("derivatives.bytes_saved", len(data) - len(rendered))
+    print(f"🖼️  DEBUG: Created {size} derivative {target} ({len(data)} -> {len(rendered)} bytes)")
+    return target
+
+
+async def get_or_create_derivative(file_path: str, size: str) -> Optional[str]:
+    """
+    Location of the cached derivative of a stored file, rendering it on first use.
+    Returns None when the file type or environment cannot produce one.
+    """
+    if size not in DERIVATIVE_SIZES or not is_renderable(file_path):
+        return None
+    target = derivative_path(file_path, size)
+    if target is None:
+        return None
+    if await run_in_threadpool(storage.path_exists, target):
+        metrics.increment(f"derivatives.hits {size}")
+        return target
+
+    future = _in_flight.get(target)
+    if future is not None:
+        return await asyncio.shield(future)
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[target] = future
+    try:
+        result = await _create(file_path, size, target)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters get the exception; retrieve it here so an unawaited future does not warn
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(target, None)
+
+
+def invalidate_derivatives(file_path: str):
+    """Delete the cached derivatives of a stored file whose content was replaced"""
+    for size in DERIVATIVE_SIZES:
+        target = derivative_path(file_path, size)
+        if target is not None:
+            storage.delete_path(target)
+    metrics.increment("derivatives.invalidated")
+
+
+async def create_derivatives(file_path: str):
+    """Background task run after an upload - render every size of the new content ahead of review"""
+    for size in DERIVATIVE_SIZES:
+        target = derivative_path(file_path, size)
+        if target is None:
+            continue
+        try:
+            # Rendered afresh - a lazy render started before the upload may have cached the old file
+            await _create(file_path, size, target)
+        except Exception as e:
+            print(f"❌ DEBUG: {size} derivative of {file_path} failed: {e}")
@@ -0,0 +1,78 @@
+"""
+Persisted extraction results.
+Each document is extracted once - at upload time or by a reprocessing job - and the
+fields are stored in extraction_results. Read endpoints merge the stored rows instead
+of running extraction again.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from extractors import Extraction, normalize_doc_type
+from models import ExtractionResult, KycDocument
+
+# Later documents override earlier ones when fields overlap
+MERGE_ORDER = ("aadhar_front", "aadhar_back", "pancard", "passport")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream) -> str:
+    """sha256 of a file-like object, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def get_document_result(db: Session, kyc_document_id: int) -> Optional[ExtractionResult]:
+    """Stored extraction result of one document"""
+    return db.query(ExtractionResult).filter(ExtractionResult.kyc_document_id == kyc_document_id).first()
+
+
+def is_current(result: Optional[ExtractionResult], content_hash: Optional[str], extractor: str, version: str) -> bool:
+    """Whether a stored result was produced from the same file by the same extractor version"""
+    return (
+        result is not None
+        and content_hash is not None
+        and result.content_hash == content_hash
+        and result.extractor == extractor
+        and result.extractor_version == version
+    )
+
+
+def save_extraction(db: Session, doc: KycDocument, extraction: Extraction,
+                    content_hash: Optional[str]) -> ExtractionResult:
+    """Insert or update the extraction result of a document (caller commits)"""
+    result = get_document_result(db, doc.id)
+    if result is None:
+        result = ExtractionResult(kyc_document_id=doc.id)
+        db.add(result)
+    result.kyc_case_id = doc.kyc_case_id
+    result.doc_type = normalize_doc_type(doc.doc_type) or doc.doc_type
+    result.fields = extraction.fields
+    result.confidence = extraction.confidence
+    result.extractor = extraction.extractor
+    result.extractor_version = extraction.version
+    result.content_hash = content_hash
+    return result
+
+
+def load_case_results(db: Session, case_id: int) -> List[ExtractionResult]:
+    """All stored extraction results of a case in one query"""
+    return db.query(ExtractionResult).filter(ExtractionResult.kyc_case_id == case_id).all()
+
+
+def merge_results(results: List[ExtractionResult]) -> Dict[str, str]:
+    """Merge stored fields of a case in document precedence order"""
+    ordered = sorted(results, key=lambda r: r.updated_at or r.created_at or datetime.min)
+    by_type = {result.doc_type: result for result in ordered}
+    merged = {}
+    for doc_type in MERGE_ORDER:
+        if doc_type in by_type:
+            merged.update(by_type[doc_type].fields or {})
+    return merged
@@ -0,0 +1,529 @@
+"""
+Document extractor engine.
+Extractors are registered per backend ("mock", "textract", "local_ocr") and document
+type. The backend is chosen per environment with EXTRACTOR_BACKEND (checked at start-up).
+Uploads extract their document on a shared pool with per-extractor timeouts, and
+extract_documents extracts several documents of a case concurrently on the same pool.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import get_settings
+from metrics import metrics
+from storage import storage
+from textract_forms import parse_form
+
+# Mock data arrays for document extraction
+aadhaar_front_mocks = [
+    {"name": "Rahul Sharma", "dob": "1988-05-23", "gender": "Male", "aadhar_number": "234567890123"},
+    {"name": "Priya Singh", "dob": "1992-11-10", "gender": "Female", "aadhar_number": "345678901234"},
+    {"name": "Amit Patel", "dob": "1985-03-15", "gender": "Male", "aadhar_number": "456789012345"},
+    {"name": "Sneha Reddy", "dob": "1990-07-19", "gender": "Female", "aadhar_number": "567890123456"},
+    {"name": "Vikram Desai", "dob": "1979-12-01", "gender": "Male", "aadhar_number": "678901234567"},
+    {"name": "Anjali Mehta", "dob": "1995-04-22", "gender": "Female", "aadhar_number": "789012345678"},
+    {"name": "Rohit Verma", "dob": "1983-09-30", "gender": "Male", "aadhar_number": "890123456789"},
+    {"name": "Kavita Joshi", "dob": "1987-06-14", "gender": "Female", "aadhar_number": "901234567890"},
+    {"name": "Suresh Kumar", "dob": "1975-01-05", "gender": "Male", "aadhar_number": "123456780912"},
+    {"name": "Meena Gupta", "dob": "1991-08-27", "gender": "Female", "aadhar_number": "234567801923"}
+]
+
+aadhaar_back_mocks = [
+    {"address": "Flat 12B, Green Residency, Baner Road, Pune, Maharashtra", "pincode": "411045"},
+    {"address": "23, Rose Villa, Sector 17, Chandigarh", "pincode": "160017"},
+    {"address": "B-45, Lake View, Salt Lake, Kolkata, West Bengal", "pincode": "700064"},
+    {"address": "Plot 8, MG Road, Bengaluru, Karnataka", "pincode": "560001"},
+    {"address": "H.No. 123, Lajpat Nagar, New Delhi", "pincode": "110024"},
+    {"address": "501, Palm Heights, Andheri East, Mumbai", "pincode": "400069"},
+    {"address": "7, Lotus Enclave, Banjara Hills, Hyderabad", "pincode": "500034"},
+    {"address": "C-22, Ashok Nagar, Chennai, Tamil Nadu", "pincode": "600083"},
+    {"address": "D-9, Alkapuri, Vadodara, Gujarat", "pincode": "390007"},
+    {"address": "A-1, Civil Lines, Jaipur, Rajasthan", "pincode": "302006"}
+]
+
+pancard_mocks = [
+    {"name": "Rahul Sharma", "pan_number": "FMPPK1234L"},
+    {"name": "Priya Singh", "pan_number": "BNZPS1234K"},
+    {"name": "Amit Patel", "pan_number": "AKLPJ2345M"},
+    {"name": "Sneha Reddy", "pan_number": "QWERT5678Z"},
+    {"name": "Vikram Desai", "pan_number": "ZXCVB6789N"},
+    {"name": "Anjali Mehta", "pan_number": "LKJHG3456B"},
+    {"name": "Rohit Verma", "pan_number": "POIUY4321V"},
+    {"name": "Kavita Joshi", "pan_number": "MNBVC0987X"},
+    {"name": "Suresh Kumar", "pan_number": "ASDFG7654C"},
+    {"name": "Meena Gupta", "pan_number": "GHJKL8765D"}
+]
+
+passport_mocks = [
+    {"name": "Rahul Sharma", "passport_number": "M1234567", "address": "22, Lotus Apartments, Andheri West, Mumbai, Maharashtra, 400053"},
+    {"name": "Priya Singh", "passport_number": "N2345678", "address": "14, Sunrise Towers, Powai, Mumbai, Maharashtra, 400076"},
+    {"name": "Amit Patel", "passport_number": "P3456789", "address": "8, Green Park, South Delhi, 110016"},
+    {"name": "Sneha Reddy", "passport_number": "Q4567890", "address": "33, Lake Gardens, Kolkata, 700045"},
+    {"name": "Vikram Desai", "passport_number": "R5678901", "address": "55, Residency Road, Bengaluru, 560025"},
+    {"name": "Anjali Mehta", "passport_number": "S6789012", "address": "12, Marine Drive, Kochi, 682031"},
+    {"name": "Rohit Verma", "passport_number": "T7890123", "address": "7, Civil Lines, Jaipur, 302006"},
+    {"name": "Kavita Joshi", "passport_number": "U8901234", "address": "19, Sector 21, Chandigarh, 160022"},
+    {"name": "Suresh Kumar", "passport_number": "V9012345", "address": "2, MG Road, Pune, 411001"},
+    {"name": "Meena Gupta", "passport_number": "W0123456", "address": "101, City Center, Ahmedabad, 380009"}
+]
+
+def mock_extract_aadhaar_front_info():
+    return random.choice(aadhaar_front_mocks)
+
+def mock_extract_aadhaar_back_info():
+    return random.choice(aadhaar_back_mocks)
+
+def mock_extract_pancard_info(name=None):
+    if name:
+        # Find the mock with the same name, else random
+        for rec in pancard_mocks:
+            if rec["name"] == name:
+                return rec.copy()
+        rec = random.choice(pancard_mocks)
+        rec = rec.copy()
+        rec["name"] = name
+        return rec
+    else:
+        return random.choice(pancard_mocks).copy()
+
+def mock_extract_passport_info(name=None):
+    if name:
+        for rec in passport_mocks:
+            if rec["name"] == name:
+                return rec.copy()
+        rec = random.choice(passport_mocks)
+        rec = rec.copy()
+        rec["name"] = name
+        return rec
+    else:
+        return random.choice(passport_mocks).copy()
+
+
+def join_address(address: str, pincode: str) -> str:
+    """Append the pincode to an address"""
+    return f"{address}, {pincode}" if address and pincode else address or pincode
+
+
+def normalize_doc_type(doc_type: str) -> Optional[str]:
+    """Map an uploaded doc_type onto the extractor registry key"""
+    value = (doc_type or "").lower()
+    if "aadhar" in value or "aadhaar" in value:
+        if "front" in value:
+            return "aadhar_front"
+        if "back" in value:
+            return "aadhar_back"
+        return None
+    if "pan" in value:
+        return "pancard"
+    if "passport" in value:
+        return "passport"
+    return None
+
+
+class Extraction:
+    """Fields extracted from one document"""
+
+    def __init__(self, fields: Dict[str, str], extractor: str, version: str, confidence: Optional[float] = None):
+        self.fields = fields
+        self.extractor = extractor
+        self.version = version
+        self.confidence = confidence
+
+
+class Extractor:
+    """Base class - extract KycDetail fields from one document"""
+
+    name = "base"
+    version = "1"
+    timeout_seconds: Optional[float] = None  # falls back to EXTRACTION_TIMEOUT_SECONDS
+
+    def extract(self, file_path: str, context: dict) -> Extraction:
+        raise NotImplementedError
+
+
+# Mock extractors
+
+class MockAadhaarFrontExtractor(Extractor):
+    name = "mock"
+
+    def extract(self, file_path, context):
+        return Extraction(dict(mock_extract_aadhaar_front_info()), self.name, self.version)
+
+
+class MockAadhaarBackExtractor(Extractor):
+    name = "mock"
+
+    def extract(self, file_path, context):
+        info = mock_extract_aadhaar_back_info()
+        return Extraction(
+            {"address": join_address(info.get("address", ""), info.get("pincode", ""))},
+            self.name, self.version
+        )
+
+
+class MockPancardExtractor(Extractor):
+    name = "mock"
+
+    def extract(self, file_path, context):
+        return Extraction(mock_extract_pancard_info(context.get("name")), self.name, self.version)
+
+
+class MockPassportExtractor(Extractor):
+    name = "mock"
+
+    def extract(self, file_path, context):
+        return Extraction(mock_extract_passport_info(context.get("name")), self.name, self.version)
+
+
+# Text parsers shared by the OCR-backed extractors
+
+AADHAAR_NUMBER_RE = re.compile(r"\b(\d{4})\s?(\d{4})\s?(\d{4})\b")
+PAN_NUMBER_RE = re.compile(r"\b([A-Z]{5}[0-9]{4}[A-Z])\b")
+PASSPORT_NUMBER_RE = re.compile(r"\b([A-Z][0-9]{7})\b")
+DATE_RE = re.compile(r"\b(\d{2})[/-](\d{2})[/-](\d{4})\b")
+PINCODE_RE = re.compile(r"\b(\d{6})\b")
+HEADER_WORDS = ("government", "india", "income tax", "department", "aadhaar", "aadhar", "republic", "passport")
+
+
+def _parse_date(text: str) -> Optional[str]:
+    match = DATE_RE.search(text)
+    if not match:
+        return None
+    day, month, year = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _guess_name(lines: List[str]) -> Optional[str]:
+    """First line that looks like a person's name rather than a card header"""
+    for line in lines:
+        cleaned = line.strip()
+        words = cleaned.split()
+        if len(words) < 2 or any(ch.isdigit() for ch in cleaned):
+            continue
+        if any(word in cleaned.lower() for word in HEADER_WORDS):
+            continue
+        if all(word.replace(".", "").isalpha() for word in words):
+            return cleaned.title()
+    return None
+
+
+def parse_aadhaar_front_text(lines: List[str]) -> Dict[str, str]:
+    text = "\n".join(lines)
+    fields = {}
+    number = AADHAAR_NUMBER_RE.search(text)
+    if number:
+        fields["aadhar_number"] = "".join(number.groups())
+    dob = _parse_date(text)
+    if dob:
+        fields["dob"] = dob
+    lowered = text.lower()
+    if "female" in lowered:
+        fields["gender"] = "Female"
+    elif "male" in lowered:
+        fields["gender"] = "Male"
+    name = _guess_name(lines)
+    if name:
+        fields["name"] = name
+    return fields
+
+
+def parse_aadhaar_back_text(lines: List[str]) -> Dict[str, str]:
+    text = " ".join(line.strip() for line in lines)
+    match = re.search(r"address\s*:?\s*(.+)", text, re.IGNORECASE)
+    address = match.group(1).strip() if match else ""
+    pincode = PINCODE_RE.search(address or text)
+    if pincode and address:
+        address = address[:pincode.end()]
+    return {"address": address} if address else {}
+
+
+def parse_pancard_text(lines: List[str]) -> Dict[str, str]:
+    text = "\n".join(lines)
+    fields = {}
+    number = PAN_NUMBER_RE.search(text)
+    if number:
+        fields["pan_number"] = number.group(1)
+    name = _guess_name(lines)
+    if name:
+        fields["name"] = name
+    return fields
+
+
+def parse_passport_text(lines: List[str]) -> Dict[str, str]:
+    text = "\n".join(lines)
+    fields = {}
+    number = PASSPORT_NUMBER_RE.search(text)
+    if number:
+        fields["passport_number"] = number.group(1)
+    name = _guess_name(lines)
+    if name:
+        fields["name"] = name
+    return fields
+
+
+TEXT_PARSERS = {
+    "aadhar_front": parse_aadhaar_front_text,
+    "aadhar_back": parse_aadhaar_back_text,
+    "pancard": parse_pancard_text,
+    "passport": parse_passport_text,
+}
+
+
+class TextractExtractor(Extractor):
+    """
+    Amazon Textract AnalyzeDocument (FORMS).
+    Key/value pairs give the typed fields; the doc-type text parser fills in whatever
+    the form layout did not label.
+    """
+
+    name = "textract"
+    version = "2"
+    timeout_seconds = 20
+
+    def __init__(self, doc_type: str):
+        self.doc_type = doc_type
+        self._client = None
+        # Extractors are shared by the pool's threads - build the client only once
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    settings = get_settings()
+                    self._client = boto3.client(
+                        'textract',
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                        aws_session_token=settings.AWS_SESSION_TOKEN or None,
+                        region_name='us-west-2'  # same region as the S3 bucket
+                    )
+        return self._client
+
+    def extract(self, file_path, context):
+        if file_path.startswith("s3://"):
+            bucket, key = file_path.replace("s3://", "").split("/", 1)
+            document = {'S3Object': {'Bucket': bucket, 'Name': key}}
+        else:
+            document = {'Bytes': storage.read_file(file_path)}
+        response = self.client.analyze_document(Document=document, FeatureTypes=['FORMS'])
+        form = parse_form(response['Blocks'], self.doc_type)
+        lines = [b['Text'] for b in response['Blocks'] if b['BlockType'] == 'LINE']
+        fields = TEXT_PARSERS[self.doc_type](lines)
+        fields.update(form["fields"])
+        return Extraction(fields, self.name, self.version, form["confidence"])
+
+
+class LocalOcrExtractor(Extractor):
+    """Tesseract OCR (pytesseract + Pillow) plus the doc-type text parser"""
+
+    name = "local_ocr"
+    timeout_seconds = 30
+
+    def __init__(self, doc_type: str):
+        self.doc_type = doc_type
+
+    def extract(self, file_path, context):
+        import io
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError as e:
+            raise RuntimeError(f"Local OCR requires pytesseract and Pillow: {e}")
+
+        image = Image.open(io.BytesIO(storage.read_file(file_path)))
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        lines: Dict[tuple, List[str]] = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            if not word.strip():
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            confidence = float(data["conf"][i])
+            if confidence >= 0:
+                confidences.append(confidence)
+        text_lines = [" ".join(words) for _, words in sorted(lines.items())]
+        confidence = sum(confidences) / len(confidences) / 100 if confidences else None
+        return Extraction(TEXT_PARSERS[self.doc_type](text_lines), self.name, self.version, confidence)
+
+
+# Registry: backend -> doc_type -> extractor
+_registry: Dict[str, Dict[str, Extractor]] = {}
+
+
+def register_extractor(backend: str, doc_type: str, extractor: Extractor):
+    """Register an extractor for a document type under a backend"""
+    _registry.setdefault(backend, {})[doc_type] = extractor
+
+
+register_extractor("mock", "aadhar_front", MockAadhaarFrontExtractor())
+register_extractor("mock", "aadhar_back", MockAadhaarBackExtractor())
+register_extractor("mock", "pancard", MockPancardExtractor())
+register_extractor("mock", "passport", MockPassportExtractor())
+for _doc_type in TEXT_PARSERS:
+    register_extractor("textract", _doc_type, TextractExtractor(_doc_type))
+    register_extractor("local_ocr", _doc_type, LocalOcrExtractor(_doc_type))
+
+
+def check_backend(backend: Optional[str] = None) -> str:
+    """
+    The backend to extract with, or ValueError when it is not registered - checked once at
+    start-up, so a typo in EXTRACTOR_BACKEND stops the worker instead of failing every upload
+    """
+    backend = backend or get_settings().EXTRACTOR_BACKEND
+    if backend not in _registry:
+        raise ValueError(f"Unknown extractor backend: {backend} (one of {', '.join(sorted(_registry))})")
+    return backend
+
+
+def get_extractor(doc_type: str, backend: Optional[str] = None) -> Optional[Extractor]:
+    """Get the extractor for a document type, or None if the type has nothing to extract"""
+    backend = check_backend(backend)
+    key = normalize_doc_type(doc_type)
+    if key is None:
+        return None
+    return _registry[backend].get(key)
+
+
+_executor = None
+_executor_workers = None
+# How often a waiter checks whether its queued extraction has started
+QUEUE_POLL_SECONDS = 0.05
+
+
+def configure_executor(max_workers: int):
+    """Size the shared extraction pool before first use - reprocess_documents.py sizes it from --workers"""
+    global _executor_workers
+    if _executor is not None:
+        raise RuntimeError("The extraction pool is already running")
+    _executor_workers = max_workers
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get or create the shared extraction pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_executor_workers or get_settings().EXTRACTION_MAX_WORKERS,
+            thread_name_prefix="extractor"
+        )
+    return _executor
+
+
+def _timeout_for(extractor: Extractor) -> float:
+    return extractor.timeout_seconds or get_settings().EXTRACTION_TIMEOUT_SECONDS
+
+
+def _run_extractor(extractor: Extractor, file_path: str, context: dict) -> Extraction:
+    started = time.perf_counter()
+    try:
+        return extractor.extract(file_path, context)
+    finally:
+        metrics.observe(f"extraction.ms {extractor.name}", (time.perf_counter() - started) * 1000)
+
+
+class SubmittedExtraction:
+    """
+    An extraction submitted to the shared pool. Its timeout runs from when a pool thread
+    starts it - time spent queued behind other extractions is not held against it.
+    """
+
+    def __init__(self, extractor: Extractor, file_path: str, context: dict):
+        self.extractor = extractor
+        self.started_at = None
+        self._started = threading.Event()
+        self.future = get_executor().submit(self._run, file_path, context)
+
+    def _run(self, file_path: str, context: dict) -> Extraction:
+        self.started_at = time.monotonic()
+        self._started.set()
+        return _run_extractor(self.extractor, file_path, context)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left of the timeout, or None while still queued"""
+        if self.started_at is None:
+            return None
+        return max(self.started_at + _timeout_for(self.extractor) - time.monotonic(), 0)
+
+    def result(self) -> Extraction:
+        """Wait from a worker thread; raises concurrent.futures.TimeoutError past the timeout"""
+        while not self._started.wait(QUEUE_POLL_SECONDS) and not self.future.done():
+            pass
+        return self.future.result(timeout=self.remaining())
+
+    async def wait(self) -> Extraction:
+        """Wait from the event loop; raises asyncio.TimeoutError past the timeout"""
+        future = asyncio.wrap_future(self.future)
+        while self.started_at is None and not future.done():
+            await asyncio.sleep(QUEUE_POLL_SECONDS)
+        return await asyncio.wait_for(future, timeout=self.remaining())
+
+
+async def extract_document_async(doc_type: str, file_path: str, context: dict) -> Optional[Extraction]:
+    """Extract one document off the event loop, bounded by the extractor's timeout"""
+    extractor = get_extractor(doc_type)
+    if extractor is None:
+        return None
+    try:
+        return await SubmittedExtraction(extractor, file_path, context).wait()
+    except asyncio.TimeoutError:
+        metrics.increment(f"extraction.timeouts {extractor.name}")
+        print(f"⏱️  DEBUG: {extractor.name} extraction of {doc_type} timed out")
+    except Exception as e:
+        metrics.increment(f"extraction.errors {extractor.name}")
+        print(f"❌ DEBUG: {extractor.name} extraction of {doc_type} failed: {e}")
+    return None
+
+
+def extract_document(extractor: Extractor, file_path: str, context: dict) -> Extraction:
+    """
+    Extract one document on the shared pool from a worker thread (scripts such as
+    reprocess_documents.py), bounded by the extractor's timeout like uploads are.
+    Raises on timeout or failure, so the caller can count the document as failed.
+    """
+    timeout = _timeout_for(extractor)
+    try:
+        return SubmittedExtraction(extractor, file_path, context).result()
+    except FutureTimeoutError:
+        metrics.increment(f"extraction.timeouts {extractor.name}")
+        raise TimeoutError(f"{extractor.name} extraction timed out after {timeout:g}s")
+    except Exception:
+        metrics.increment(f"extraction.errors {extractor.name}")
+        raise
+
+
+def extract_documents(documents, context: dict) -> Dict[int, Extraction]:
+    """
+    Extract several documents of a case concurrently on the shared pool, from a worker thread.
+    Returns extractions keyed by document id; documents that fail or time out are left out.
+    """
+    submitted = {}
+    for doc in documents:
+        extractor = get_extractor(doc.doc_type)
+        if extractor is not None:
+            submitted[doc.id] = SubmittedExtraction(extractor, doc.file_path, context)
+
+    results = {}
+    for doc_id, extraction in submitted.items():
+        name = extraction.extractor.name
+        try:
+            results[doc_id] = extraction.result()
+        except FutureTimeoutError:
+            metrics.increment(f"extraction.timeouts {name}")
+            print(f"⏱️  DEBUG: {name} extraction of document {doc_id} timed out")
+        except Exception as e:
+            metrics.increment(f"extraction.errors {name}")
+            print(f"❌ DEBUG: {name} extraction of document {doc_id} failed: {e}")
+    return results
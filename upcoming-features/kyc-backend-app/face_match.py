@@ -0,0 +1,322 @@
+"""
+Face matching of KYC videos and selfies against the customer's photo or passport.
+Keyframes are sampled from video documents in the image process pool - frames are
+decoded one at a time from a file on disk, so memory stays bounded whatever the video
+size - and the sharpest ones are compared with the reference face. The matcher is
+chosen per environment with FACE_MATCH_BACKEND ("rekognition", or "stub" for
+development, which compares nothing and records every document as "unavailable"), and
+scores are stored per document in face_match_results.
+"""
+
+import asyncio
+import heapq
+import os
+import statistics
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from database import get_session_local
+from derivatives import get_or_create_derivative
+from image_pipeline import get_process_pool
+from metrics import metrics
+from models import FaceMatchResult, KycDocument
+from storage import storage
+
+# Reference documents in order of preference, and documents whose faces are checked against them
+REFERENCE_TYPES = ("photo", "passport")
+SOURCE_TYPES = ("video", "selfie")
+KEYFRAME_MAX_DIMENSION = 1024
+KEYFRAME_QUALITY = 85
+
+
+def document_kind(doc_type: str) -> Optional[str]:
+    """'photo', 'passport', 'video' or 'selfie' for a doc_type, else None"""
+    lowered = doc_type.lower()
+    for kind in SOURCE_TYPES + REFERENCE_TYPES:
+        if kind in lowered:
+            return kind
+    return None
+
+
+def sample_keyframes(video_path: str, interval_seconds: float, max_frames: int) -> List[bytes]:
+    """
+    Sample one frame per interval and keep the sharpest max_frames as JPEG (runs in a pool process).
+    Frames in between are grabbed without being decoded to images. Returns [] without OpenCV.
+    """
+    try:
+        import cv2
+    except ImportError:
+        return []
+
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        return []
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    # WebM from browsers often reports 0 or 1000 fps
+    if not fps or fps > 240:
+        fps = 30
+    step = max(int(round(fps * interval_seconds)), 1)
+
+    sharpest = []  # min-heap of (sharpness, frame index, jpeg)
+    index = 0
+    try:
+        while True:
+            if index % step:
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            height, width = frame.shape[:2]
+            scale = KEYFRAME_MAX_DIMENSION / max(height, width)
+            if scale < 1:
+                frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            sharpness = cv2.Laplacian(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+            if len(sharpest) < max_frames or sharpness > sharpest[0][0]:
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, KEYFRAME_QUALITY])
+                if ok:
+                    item = (sharpness, index, jpeg.tobytes())
+                    if len(sharpest) < max_frames:
+                        heapq.heappush(sharpest, item)
+                    else:
+                        heapq.heapreplace(sharpest, item)
+            index += 1
+    finally:
+        capture.release()
+    # Back in timeline order
+    return [jpeg for _, _, jpeg in sorted(sharpest, key=lambda item: item[1])]
+
+
+class FaceMatcher:
+    """Compares one face image against a reference image"""
+    name = "base"
+    available = True
+
+    def compare(self, reference: bytes, target: bytes) -> Optional[float]:
+        """Similarity 0-100 of the best face in target, or None when no face is found"""
+        raise NotImplementedError
+
+
+class StubFaceMatcher(FaceMatcher):
+    """Development matcher - no faces are compared, so no document is ever reported as matched"""
+    name = "stub"
+    available = False
+
+    def compare(self, reference: bytes, target: bytes) -> Optional[float]:
+        return None
+
+
+class RekognitionFaceMatcher(FaceMatcher):
+    """Amazon Rekognition CompareFaces"""
+    name = "rekognition"
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            settings = get_settings()
+            self._client = boto3.client(
+                'rekognition',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                aws_session_token=settings.AWS_SESSION_TOKEN or None,
+                region_name='us-west-2'
+            )
+        return self._client
+
+    def compare(self, reference: bytes, target: bytes) -> Optional[float]:
+        try:
+            response = self.client.compare_faces(
+                SourceImage={'Bytes': reference},
+                TargetImage={'Bytes': target},
+                SimilarityThreshold=0
+            )
+        except self.client.exceptions.InvalidParameterException:
+            # Raised when either image has no detectable face
+            return None
+        matches = response.get('FaceMatches', [])
+        if not matches:
+            return 0.0 if response.get('UnmatchedFaces') else None
+        return max(match['Similarity'] for match in matches)
+
+
+FACE_MATCHERS = {"stub": StubFaceMatcher, "rekognition": RekognitionFaceMatcher}
+_matchers = {}
+
+
+def get_face_matcher(backend: Optional[str] = None) -> FaceMatcher:
+    """Matcher for the configured backend, created once per worker"""
+    backend = backend or get_settings().FACE_MATCH_BACKEND
+    if backend not in FACE_MATCHERS:
+        raise ValueError(f"Unknown face match backend: {backend}")
+    if backend not in _matchers:
+        _matchers[backend] = FACE_MATCHERS[backend]()
+    return _matchers[backend]
+
+
+async def _read_image(doc: KycDocument) -> bytes:
+    """JPEG of an image or PDF document - the preview derivative when one can be rendered"""
+    derivative = await get_or_create_derivative(doc.file_path, "preview")
+    return await run_in_threadpool(storage.read_file, derivative or doc.file_path)
+
+
+async def _video_keyframes(doc: KycDocument) -> List[bytes]:
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    if not doc.file_path.startswith("s3://"):
+        return await loop.run_in_executor(
+            get_process_pool(), sample_keyframes, doc.file_path,
+            settings.KEYFRAME_INTERVAL_SECONDS, settings.KEYFRAME_MAX_FRAMES
+        )
+    # The decoder needs a seekable file - stream the object to disk rather than into memory
+    suffix = os.path.splitext(doc.file_path)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as video:
+        await run_in_threadpool(storage.download_to_path, doc.file_path, video.name)
+        return await loop.run_in_executor(
+            get_process_pool(), sample_keyframes, video.name,
+            settings.KEYFRAME_INTERVAL_SECONDS, settings.KEYFRAME_MAX_FRAMES
+        )
+
+
+async def match_document(source: KycDocument, reference_image: bytes, matcher: FaceMatcher) -> dict:
+    """Score every sampled face of a video or selfie against the reference image"""
+    if document_kind(source.doc_type) == "video":
+        frames = await _video_keyframes(source)
+    else:
+        frames = [await _read_image(source)]
+    if not frames:
+        return {"status": "unavailable", "frames_sampled": 0, "faces_detected": 0, "scores": []}
+
+    scores = []
+    for frame in frames:
+        scores.append(await run_in_threadpool(matcher.compare, reference_image, frame))
+    found = [score for score in scores if score is not None]
+    if not found:
+        status = "no_face"
+    elif max(found) >= get_settings().FACE_MATCH_THRESHOLD:
+        status = "matched"
+    else:
+        status = "not_matched"
+    return {
+        "status": status,
+        "frames_sampled": len(frames),
+        "faces_detected": len(found),
+        "best_similarity": max(found) if found else None,
+        "median_similarity": statistics.median(found) if found else None,
+        "scores": scores,
+    }
+
+
+def _load_case(kyc_case_id: int):
+    """Documents of the case and their stored results by source document (runs in the thread pool)"""
+    db = get_session_local()()
+    try:
+        documents = db.query(KycDocument).filter(KycDocument.kyc_case_id == kyc_case_id).all()
+        existing = {
+            result.source_document_id: result
+            for result in db.query(FaceMatchResult).filter(FaceMatchResult.kyc_case_id == kyc_case_id).all()
+        }
+        return documents, existing
+    finally:
+        db.close()
+
+
+def _save(source: KycDocument, reference: KycDocument, matcher: FaceMatcher, outcome: dict):
+    """Store the outcome of one source document (runs in the thread pool)"""
+    db = get_session_local()()
+    try:
+        result = db.query(FaceMatchResult).filter(FaceMatchResult.source_document_id == source.id).first()
+        if result is None:
+            result = FaceMatchResult(source_document_id=source.id)
+            db.add(result)
+        result.kyc_case_id = source.kyc_case_id
+        result.reference_document_id = reference.id
+        result.source_uploaded_at = source.uploaded_at
+        result.reference_uploaded_at = reference.uploaded_at
+        result.matcher = matcher.name
+        result.status = outcome["status"]
+        result.frames_sampled = outcome.get("frames_sampled", 0)
+        result.faces_detected = outcome.get("faces_detected", 0)
+        result.best_similarity = outcome.get("best_similarity")
+        result.median_similarity = outcome.get("median_similarity")
+        result.scores = outcome.get("scores")
+        result.error = outcome.get("error")
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_face_match(kyc_case_id: int):
+    """
+    Background task run after video, selfie, photo or passport uploads.
+    Scores every video/selfie of the case against its reference document; documents
+    already scored by the same matcher against the same uploads are skipped.
+    """
+    documents, existing = await run_in_threadpool(_load_case, kyc_case_id)
+    by_kind = {}
+    for doc in documents:
+        by_kind.setdefault(document_kind(doc.doc_type), []).append(doc)
+    reference = next((by_kind[kind][0] for kind in REFERENCE_TYPES if kind in by_kind), None)
+    sources = [doc for kind in SOURCE_TYPES for doc in by_kind.get(kind, [])]
+    if reference is None or not sources:
+        return
+
+    matcher = get_face_matcher()
+    reference_image = None
+    for source in sources:
+        previous = existing.get(source.id)
+        if (previous is not None and previous.reference_document_id == reference.id
+                and previous.source_uploaded_at == source.uploaded_at
+                and previous.reference_uploaded_at == reference.uploaded_at
+                and previous.matcher == matcher.name
+                and previous.status != "failed"):
+            continue
+
+        started = datetime.utcnow()
+        if not matcher.available:
+            outcome = {"status": "unavailable", "error": f"No face matcher configured (FACE_MATCH_BACKEND={matcher.name})"}
+        else:
+            try:
+                if reference_image is None:
+                    reference_image = await _read_image(reference)
+                outcome = await match_document(source, reference_image, matcher)
+            except Exception as e:
+                print(f"❌ DEBUG: Face match of document {source.id} failed: {e}")
+                metrics.increment(f"face_match.errors {matcher.name}")
+                outcome = {"status": "failed", "error": str(e)}
+        await run_in_threadpool(_save, source, reference, matcher, outcome)
+        elapsed_ms = (datetime.utcnow() - started).total_seconds() * 1000
+        metrics.observe(f"face_match.ms {matcher.name}", elapsed_ms)
+        metrics.increment(f"face_match.{outcome['status']}")
+        print(f"🧑 DEBUG: Face match of {source.doc_type} for case {kyc_case_id}: {outcome['status']} "
+              f"(best {outcome.get('best_similarity')}) in {elapsed_ms:.0f} ms")
+
+
+def load_case_face_matches(db: Session, kyc_case_id: int) -> List[dict]:
+    """Stored face match scores of a case"""
+    results = db.query(FaceMatchResult).filter(FaceMatchResult.kyc_case_id == kyc_case_id).all()
+    return [
+        {
+            "source_document_id": result.source_document_id,
+            "reference_document_id": result.reference_document_id,
+            "status": result.status,
+            "matcher": result.matcher,
+            "frames_sampled": result.frames_sampled,
+            "faces_detected": result.faces_detected,
+            "best_similarity": result.best_similarity,
+            "median_similarity": result.median_similarity,
+            "scores": result.scores,
+            "updated_at": result.updated_at.isoformat() if result.updated_at else None,
+        }
+        for result in results
+    ]
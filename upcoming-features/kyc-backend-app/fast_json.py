@@ -0,0 +1,83 @@
+"""
+Fast JSON responses for the large read endpoints (/customers, /kyc/screen-data,
+/kyc/auto-details). The payload is built as plain dicts and serialized once with orjson
+(stdlib json when it is not installed) - returning a Response skips FastAPI's response_model
+validation and jsonable_encoder pass, whose shape the route already guarantees. Bodies
+above RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli (when installed and
+accepted) or gzip. Compression is applied here rather than by middleware so streamed
+files, Range responses and server-sent events are never buffered or re-encoded.
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config import get_settings
+from metrics import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# brotli quality 5 and gzip level 6 compress large JSON well at a few ms per megabyte
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content) -> bytes:
+    """Serialize to compact JSON bytes (datetimes as ISO 8601)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def accepted_encoding(accept_encoding: str) -> str:
+    """'br', 'gzip' or '' for an Accept-Encoding header (q=0 entries are refused)"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def json_response(request: Request, content, status_code: int = 200) -> Response:
+    """JSON response of already-shaped content, compressed when large and the client accepts it"""
+    body = dumps(content)
+    headers = {"Vary": "Accept-Encoding"}
+    route = request.scope.get("route")
+    name = route.path if route is not None else request.url.path
+    metrics.observe(f"responses.json_bytes {name}", len(body))
+    if len(body) >= get_settings().RESPONSE_COMPRESSION_MIN_BYTES:
+        encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            metrics.observe(f"responses.compressed_bytes {name}", len(body))
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
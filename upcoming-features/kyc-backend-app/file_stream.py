@@ -0,0 +1,211 @@
+"""
+Range-capable streaming of stored documents for local and S3 storage.
+Supports single byte ranges (video seeking), If-None-Match / If-Range with strong ETags,
+and never buffers a whole file: S3 objects are read with one ranged get_object and
+forwarded in chunks, local files are read in chunks - or handed to nginx with
+X-Accel-Redirect when FILE_ACCEL_REDIRECT_PREFIX is set, so nginx serves them with sendfile.
+Local paths are only served from inside uploads/ - see storage.path_within_uploads.
+"""
+
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from config import get_settings
+from metrics import metrics
+from storage import path_within_uploads, storage
+
+STREAM_CHUNK_SIZE = 256 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CONTENT_TYPES = {
+    ".webm": "video/webm",
+    ".mp4": "video/mp4",
+    ".mov": "video/quicktime",
+    ".avi": "video/x-msvideo",
+    ".mkv": "video/x-matroska",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".pdf": "application/pdf",
+}
+# KYC documents are personal data - never cached by shared caches
+CACHE_CONTROL = "private, max-age=3600"
+
+
+def guess_content_type(path: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single byte range, or None to send the whole file
+    (no header, multiple ranges or unparseable syntax). Raises 416 when unsatisfiable.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range - the last N bytes
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison - weak, so W/ prefixes are ignored"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def local_etag(path: str) -> str:
+    """Strong ETag from size and modification time - files are replaced, never edited in place"""
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_s3_body(body) -> Iterator[bytes]:
+    try:
+        for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+            yield chunk
+    finally:
+        body.close()
+
+
+def _partial_headers(etag: str, content_type: str, size: int, byte_range: Optional[Tuple[int, int]]) -> dict:
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Content-Type": content_type,
+    }
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        headers["Content-Length"] = str(end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return headers
+
+
+def stream_local_file(path: str, range_header: Optional[str], if_none_match: Optional[str],
+                      if_range: Optional[str], head: bool = False) -> Response:
+    """Serve a local file with Range and ETag support"""
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    etag = local_etag(path)
+    content_type = guess_content_type(path)
+    if etag_matches(if_none_match, etag):
+        metrics.increment("files.stream.not_modified")
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    prefix = get_settings().FILE_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        # nginx serves the file with sendfile and handles Range itself
+        relative = path_within_uploads(path)
+        if relative is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        metrics.increment("files.stream.accel_redirect")
+        return Response(headers={
+            "X-Accel-Redirect": prefix.rstrip("/") + "/" + relative.replace(os.sep, "/"),
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Content-Type": content_type,
+        })
+
+    size = os.path.getsize(path)
+    # If-Range with a different validator means the client's partial copy is stale - send everything
+    byte_range = parse_range(range_header, size) if not if_range or if_range == etag else None
+    headers = _partial_headers(etag, content_type, size, byte_range)
+    status_code = 206 if byte_range else 200
+    metrics.increment(f"files.stream.{status_code}")
+    if head:
+        return Response(status_code=status_code, headers=headers)
+    start, end = byte_range or (0, size - 1)
+    return StreamingResponse(_iter_file(path, start, end), status_code=status_code, headers=headers)
+
+
+def stream_s3_object(s3_url: str, range_header: Optional[str], if_none_match: Optional[str],
+                     if_range: Optional[str], head: bool = False) -> Response:
+    """
+    Proxy an S3 object with Range and ETag support.
+    The range and validators are forwarded to S3, so each request is one round trip and
+    the body is relayed chunk by chunk.
+    """
+    from botocore.exceptions import ClientError
+
+    bucket, key = s3_url.replace("s3://", "").split("/", 1)
+    params = {"Bucket": bucket, "Key": key}
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    use_range = bool(range_header) and RANGE_PATTERN.match(range_header.strip()) is not None
+    if use_range:
+        params["Range"] = range_header.strip()
+        if if_range:
+            params["IfMatch"] = if_range
+
+    try:
+        response = storage.s3_client.head_object(**params) if head else storage.s3_client.get_object(**params)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 304 or code == "304":
+            metrics.increment("files.stream.not_modified")
+            etag = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag", "")
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        if status == 412 or code == "PreconditionFailed":
+            # If-Range validator changed - the whole current object is sent instead
+            return stream_s3_object(s3_url, None, if_none_match, None, head)
+        if status == 416 or code == "InvalidRange":
+            size = e.response.get("Error", {}).get("ActualObjectSize")
+            if size is None:
+                size = storage.s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        if status == 404 or code in ("NoSuchKey", "404", "NotFound"):
+            raise HTTPException(status_code=404, detail="File not found in S3")
+        raise HTTPException(status_code=502, detail=f"S3 read failed: {code}")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": response["ETag"],
+        "Cache-Control": CACHE_CONTROL,
+        "Content-Type": response.get("ContentType") or guess_content_type(key),
+        "Content-Length": str(response["ContentLength"]),
+    }
+    status_code = 200
+    if response.get("ContentRange"):
+        headers["Content-Range"] = response["ContentRange"]
+        status_code = 206
+    metrics.increment(f"files.stream.{status_code}")
+    if head:
+        return Response(status_code=status_code, headers=headers)
+    return StreamingResponse(_iter_s3_body(response["Body"]), status_code=status_code, headers=headers)
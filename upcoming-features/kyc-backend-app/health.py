@@ -0,0 +1,138 @@
+"""
+Background dependency health prober.
+Database and S3 are probed on an interval by one task per worker, and health
+endpoints serve the cached result instead of touching the dependencies per request.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from database import get_engine
+from metrics import metrics
+from storage import storage
+
+
+def probe_database() -> str:
+    """Run SELECT 1 against the database"""
+    try:
+        engine = get_engine()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return "connected"
+    except Exception as e:
+        return f"error: {str(e)}"
+
+
+def probe_s3() -> str:
+    """Check that the S3 bucket is reachable"""
+    try:
+        if storage.test_connection():
+            return "connected"
+        return "error: bucket not reachable"
+    except Exception as e:
+        return f"error: {str(e)}"
+
+
+class HealthProber:
+    """Periodically refreshes dependency status in the background"""
+
+    def __init__(self, interval_seconds: float, stale_after_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stale_after_seconds = stale_after_seconds
+        # Each dependency is probed by its own loop so a slow S3 call never delays the database status
+        self.probes = {"database": probe_database, "s3": probe_s3}
+        self._status: Dict[str, str] = {name: "unknown" for name in self.probes}
+        self._checked_at: Dict[str, datetime] = {}
+        self._checked_monotonic: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def refresh(self, name: str):
+        """Probe one dependency"""
+        started = time.perf_counter()
+        status = await run_in_threadpool(self.probes[name])
+        if status != "connected" and status != self._status[name]:
+            print(f"⚠️  Health probe: {name}={status}")
+        self._status[name] = status
+        self._checked_at[name] = datetime.utcnow()
+        self._checked_monotonic[name] = time.monotonic()
+        metrics.observe(f"health.probe_ms {name}", (time.perf_counter() - started) * 1000)
+
+    async def _run(self, name: str):
+        while True:
+            try:
+                await self.refresh(name)
+            except Exception as e:
+                print(f"❌ Health probe for {name} failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start probing in the background on the running event loop"""
+        if not self._tasks:
+            loop = asyncio.get_event_loop()
+            self._tasks = [loop.create_task(self._run(name)) for name in self.probes]
+
+    async def stop(self):
+        """Stop the background probe tasks"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def status(self, name: str) -> str:
+        """Last probed status of a dependency"""
+        return self._status[name]
+
+    def checked_at(self, name: str) -> Optional[datetime]:
+        """When a dependency was last probed"""
+        return self._checked_at.get(name)
+
+    def age_seconds(self, name: str) -> Optional[float]:
+        """Seconds since a dependency was last probed"""
+        checked = self._checked_monotonic.get(name)
+        if checked is None:
+            return None
+        return time.monotonic() - checked
+
+    @property
+    def is_ready(self) -> bool:
+        """Ready when a recent probe reached the database"""
+        age = self.age_seconds("database")
+        return age is not None and age <= self.stale_after_seconds and self._status["database"] == "connected"
+
+    def snapshot(self) -> dict:
+        """Cached status of every dependency with its age"""
+        dependencies = {}
+        for name in self.probes:
+            age = self.age_seconds(name)
+            checked_at = self.checked_at(name)
+            dependencies[name] = {
+                "status": self._status[name],
+                "checked_at": checked_at.isoformat() if checked_at else None,
+                "age_seconds": round(age, 3) if age is not None else None
+            }
+        return dependencies
+
+
+_health_prober = None
+
+
+def get_health_prober() -> HealthProber:
+    """Get or create the health prober"""
+    global _health_prober
+    if _health_prober is None:
+        settings = get_settings()
+        _health_prober = HealthProber(
+            interval_seconds=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+            stale_after_seconds=settings.HEALTH_STALE_AFTER_SECONDS
+        )
+    return _health_prober
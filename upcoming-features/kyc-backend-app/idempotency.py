@@ -0,0 +1,199 @@
+"""
+Idempotency-Key support for /kyc/upload, /kyc/register and /kyc/details.
+The first request with a key claims it in idempotency_keys and its successful response is
+stored there for IDEMPOTENCY_TTL_HOURS. A retry with the same key gets that response back
+(Idempotency-Replayed: true) without storing, extracting or committing again; a retry
+that arrives while the first is still running waits for it - woken directly on the same
+worker, by polling the row across workers. A failed request releases its key so the retry
+does the work. A key reused for a different request is refused with 422. The key is
+claimed and completed on the request's own session, committed before and after the work,
+so an idempotent request never holds more than its one pooled connection.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from metrics import metrics
+from models import IdempotencyRecord
+
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.25
+
+# Requests of this worker in flight, so a duplicate on the same worker is woken at once
+_in_flight: Dict[Tuple[str, str], asyncio.Event] = {}
+
+
+def fingerprint(*parts) -> str:
+    """sha256 of the request fields that must match for a key to be reused"""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def claim(db: Session, scope: str, key: str, request_fingerprint: str) -> Optional[dict]:
+    """Claim the key for this request (commits); returns None when claimed, else the existing record"""
+    settings = get_settings()
+    now = datetime.utcnow()
+    # A plain INSERT - nothing enters the session's identity map, so the claim can be retried
+    try:
+        db.execute(insert(IdempotencyRecord).values(
+            scope=scope, key=key, fingerprint=request_fingerprint, status="in_progress",
+            created_at=now, expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+        ))
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    record = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.scope == scope, IdempotencyRecord.key == key
+    ).first()
+    if record is None:
+        # Released between the insert and the read - the caller tries again
+        return {"fingerprint": request_fingerprint, "status": "in_progress"}
+    if record.expires_at < now or (
+        record.fingerprint == request_fingerprint
+        and record.status == "in_progress"
+        and record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    ):
+        # Expired, or its worker died mid-request - take it over unless another retry just did
+        taken = db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.scope == scope,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.created_at == record.created_at
+        ).update({
+            IdempotencyRecord.fingerprint: request_fingerprint,
+            IdempotencyRecord.status: "in_progress",
+            IdempotencyRecord.status_code: None,
+            IdempotencyRecord.response: None,
+            IdempotencyRecord.created_at: now,
+            IdempotencyRecord.expires_at: now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+        }, synchronize_session=False)
+        db.commit()
+        if taken:
+            return None
+        return {"fingerprint": request_fingerprint, "status": "in_progress"}
+    return {
+        "fingerprint": record.fingerprint,
+        "status": record.status,
+        "status_code": record.status_code,
+        "response": record.response,
+    }
+
+
+def complete(db: Session, scope: str, key: str, status_code: int, response):
+    """Store the response of a claimed key"""
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.scope == scope, IdempotencyRecord.key == key
+    ).update({
+        IdempotencyRecord.status: "completed",
+        IdempotencyRecord.status_code: status_code,
+        IdempotencyRecord.response: response,
+    }, synchronize_session=False)
+    db.commit()
+
+
+def release(db: Session, scope: str, key: str):
+    """Give up a claimed key after a failure, so a retry runs the request"""
+    # The work may have failed mid-transaction - drop whatever it left behind first
+    db.rollback()
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.key == key,
+        IdempotencyRecord.status == "in_progress"
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def collect_expired_idempotency_keys(db: Session) -> int:
+    """Delete keys past IDEMPOTENCY_TTL_HOURS; returns how many were deleted"""
+    deleted = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def replay(scope: str, record: dict) -> JSONResponse:
+    metrics.increment(f"idempotency.replayed {scope}")
+    return JSONResponse(
+        status_code=record["status_code"],
+        content=record["response"],
+        headers={"Idempotency-Replayed": "true"}
+    )
+
+
+async def run_idempotent(db: Session, scope: str, key: Optional[str], request_fingerprint: str,
+                         work: Callable[[], Awaitable]):
+    """Run work once per Idempotency-Key, tracking the key on the request's session db"""
+    if key is None:
+        return await work()
+    if not 0 < len(key) <= MAX_KEY_LENGTH or not key.isprintable():
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} printable characters")
+
+    wait_seconds = get_settings().IDEMPOTENCY_WAIT_SECONDS
+    waited_since = None
+    while True:
+        record = await run_in_threadpool(claim, db, scope, key, request_fingerprint)
+        if record is None:
+            break
+        if record["fingerprint"] != request_fingerprint:
+            metrics.increment(f"idempotency.conflicts {scope}")
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if record["status"] == "completed":
+            return replay(scope, record)
+
+        # The first request is still running - wait for its result instead of repeating it
+        if waited_since is None:
+            waited_since = time.perf_counter()
+            metrics.increment(f"idempotency.waited {scope}")
+        remaining = wait_seconds - (time.perf_counter() - waited_since)
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+        finished = _in_flight.get((scope, key))
+        if finished is not None:
+            try:
+                await asyncio.wait_for(finished.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(POLL_SECONDS, remaining))
+
+    finished = asyncio.Event()
+    _in_flight[(scope, key)] = finished
+    try:
+        try:
+            result = await work()
+        except BaseException:
+            await run_in_threadpool(release, db, scope, key)
+            raise
+        if isinstance(result, Response):
+            status_code, body = result.status_code, json.loads(result.body)
+        else:
+            status_code, body = 200, jsonable_encoder(result)
+        if 200 <= status_code < 300:
+            await run_in_threadpool(complete, db, scope, key, status_code, body)
+            metrics.increment(f"idempotency.stored {scope}")
+        else:
+            await run_in_threadpool(release, db, scope, key)
+        return result
+    finally:
+        # A retry that took over a stale lock on this worker has registered its own event
+        if _in_flight.get((scope, key)) is finished:
+            del _in_flight[(scope, key)]
+        finished.set()
@@ -0,0 +1,170 @@
+"""
+Image normalization for uploaded ID photos.
+Phone photos are EXIF-rotated upright, downscaled to an OCR-friendly resolution and
+recompressed before they are stored and sent to OCR. The CPU work runs in a process
+pool so it never blocks the event loop. Pillow is optional - without it images are
+stored unchanged.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional
+
+from config import get_settings
+from metrics import metrics
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+_pool = None
+
+
+@dataclass
+class NormalizedImage:
+    """Result of the normalization stage for one upload"""
+    data: bytes
+    filename: str
+    content_type: str
+    original_bytes: int
+    stored_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    rotated: bool = False
+    changed: bool = False
+    elapsed_ms: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.stored_bytes
+
+    def summary(self) -> dict:
+        return {
+            "original_bytes": self.original_bytes,
+            "stored_bytes": self.stored_bytes,
+            "bytes_saved": self.bytes_saved,
+            "width": self.width,
+            "height": self.height,
+            "rotated": self.rotated,
+            "changed": self.changed,
+            "latency_ms": round(self.elapsed_ms, 1),
+        }
+
+
+def is_image(filename: str) -> bool:
+    return os.path.splitext(filename or "")[1].lower() in IMAGE_EXTENSIONS
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get or create the image pool"""
+    global _pool
+    if _pool is None:
+        # spawn - forking a worker that already runs threads (health probes, boto3) is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=get_settings().IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def normalize_image_bytes(data: bytes, max_dimension: int, quality: int) -> Optional[dict]:
+    """
+    Rotate, downscale and recompress one image (runs in a pool process).
+    Returns None when Pillow is missing or the bytes are not a readable image.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            orientation = image.getexif().get(0x0112, 1)
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+
+            resized = max(image.size) > max_dimension
+            if resized:
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            output = io.BytesIO()
+            # The EXIF orientation is applied to the pixels, so no EXIF is written back
+            image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+            return {
+                "data": output.getvalue(),
+                "width": image.size[0],
+                "height": image.size[1],
+                "rotated": orientation not in (1, None),
+                "resized": resized,
+            }
+    except Exception as e:
+        print(f"⚠️  DEBUG: Image normalization skipped: {e}")
+        return None
+
+
+async def normalize_upload(data: bytes, filename: str) -> Optional[NormalizedImage]:
+    """
+    Normalize an uploaded image off the event loop.
+    Returns None for non-images or when normalization is disabled; the original is kept
+    whenever recompression would not make it smaller and no rotation was needed.
+    """
+    settings = get_settings()
+    if not settings.IMAGE_NORMALIZATION_ENABLED or not is_image(filename):
+        return None
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            get_process_pool(), normalize_image_bytes, data, settings.IMAGE_MAX_DIMENSION, settings.IMAGE_JPEG_QUALITY
+        )
+    except BrokenProcessPool as e:
+        # A crashed worker must not fail the upload - store the original and start a fresh pool next time
+        print(f"❌ DEBUG: Image pool failed, storing original: {e}")
+        metrics.increment("image.pool_errors")
+        shutdown_process_pool()
+        result = None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stem, ext = os.path.splitext(filename)
+    content_type = "image/png" if ext.lower() == ".png" else "image/jpeg"
+    normalized = NormalizedImage(
+        data=data, filename=filename, content_type=content_type,
+        original_bytes=len(data), stored_bytes=len(data), elapsed_ms=elapsed_ms
+    )
+    if result is not None:
+        normalized.width, normalized.height = result["width"], result["height"]
+        if result["rotated"] or result["resized"] or len(result["data"]) < len(data):
+            normalized.data = result["data"]
+            normalized.filename = f"{stem}.jpg"
+            normalized.content_type = "image/jpeg"
+            normalized.stored_bytes = len(result["data"])
+            normalized.rotated = result["rotated"]
+            normalized.changed = True
+
+    metrics.observe("image.normalize_ms", elapsed_ms)
+    metrics.observe("image.bytes_saved", normalized.bytes_saved)
+    metrics.increment("image.original_bytes", normalized.original_bytes)
+    metrics.increment("image.stored_bytes", normalized.stored_bytes)
+    print(
+        f"🖼️  DEBUG: Normalized {filename}: {normalized.original_bytes} -> {normalized.stored_bytes} bytes "
+        f"in {elapsed_ms:.0f} ms"
+    )
+    return normalized
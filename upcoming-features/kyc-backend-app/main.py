@@ -5,17 +5,19 @@ This is a FastAPI-based backend application for handling KYC (Know Your Customer
 Configured to use AWS PostgreSQL (RDS) and S3 storage.
 """
 
+import asyncio
+import hmac
+import io
 import os
 import sys
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, Header, BackgroundTasks, Request, Response
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 import shutil
 from typing import List, Optional, Dict
 from datetime import datetime
-import random
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
 # Set environment to AWS
 os.environ["ENV"] = "aws"
@@ -24,11 +26,37 @@ os.environ["ENV"] = "aws"
 sys.path.append('..')
 
 # AWS environment imports
-from database import get_db, init_db, get_engine
+from database import get_db, init_db, get_engine, get_session_local
 from models import User, KycDocument, KycCase, KycDetail, KycStatus
-from storage import storage
-from secrets import get_database_url
+from storage import UPLOAD_DIR, is_safe_key, path_within_uploads, storage
 from config import get_settings
+from metrics import metrics
+from query_counter import start_request_stats
+from slow_query_log import get_slow_query_log
+from health import get_health_prober
+from maintenance import get_maintenance
+from extractors import check_backend, extract_document_async, extract_documents, get_extractor, normalize_doc_type
+from extraction_store import (
+    get_document_result, hash_stream, is_current, load_case_results, merge_results, save_extraction
+)
+from image_pipeline import normalize_upload, shutdown_process_pool
+from derivatives import (
+    DERIVATIVE_SIZES, create_derivatives, get_or_create_derivative, invalidate_derivatives, is_renderable
+)
+from file_stream import stream_local_file, stream_s3_object
+from face_match import document_kind, load_case_face_matches, run_face_match
+from resumable import (
+    TUS_EXTENSIONS, TUS_VERSION, abort_upload, append_chunk, create_upload_session,
+    get_upload_gc, get_upload_session, parse_metadata, require_tus_resumable, tus_headers
+)
+from fast_json import json_response
+from case_version import CACHE_CONTROL, case_etag, not_modified, touch_case
+from progress_events import get_progress_broker, stream_progress
+from admission import admission_stats, admit
+from idempotency import fingerprint, run_idempotent
+from chat import get_chat_rate_limiter, get_chat_service, retrieve_context, stream_events
+from chat_sessions import build_prompt, has_history, load_conversation, new_conversation_id, record_turn
+from starlette.concurrency import run_in_threadpool
 
 # File upload configuration
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB in bytes
@@ -54,12 +82,29 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def on_startup():
-    """Initialize database on startup"""
-    try:
-        init_db()
-        print("✅ Database initialized successfully")
-    except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
+    """Start background tasks - schema creation runs once at deploy time (python database.py)"""
+    # An unknown EXTRACTOR_BACKEND stops the worker here rather than failing every upload
+    check_backend()
+    if get_settings().INIT_DB_ON_STARTUP:
+        try:
+            init_db()
+            print("✅ Database initialized successfully")
+        except Exception as e:
+            print(f"❌ Database initialization failed: {e}")
+    
+    # Dependency health is probed in the background and served from cache
+    get_health_prober().start()
+    get_upload_gc().start()
+    get_maintenance().start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop background tasks"""
+    await get_health_prober().stop()
+    await get_upload_gc().stop()
+    await get_maintenance().stop()
+    get_progress_broker().stop()
+    shutdown_process_pool()
 
 @app.middleware("http")
 async def add_cors_headers(request, call_next):
@@ -72,6 +117,11 @@ async def add_cors_headers(request, call_next):
     response.headers["Access-Control-Allow-Methods"] = "*"
     response.headers["Access-Control-Allow-Headers"] = "*"
     response.headers["Access-Control-Allow-Credentials"] = "false"
+    # Resumable upload clients read these from cross-origin responses
+    response.headers["Access-Control-Expose-Headers"] = (
+        "Location, Upload-Offset, Upload-Length, Upload-Expires, Tus-Resumable, "
+        "Accept-Ranges, Content-Range, Content-Length, ETag, X-Conversation-Id, Retry-After, Idempotency-Replayed"
+    )
 
 
     # Log CORS requests for debugging
@@ -81,6 +131,23 @@ async def add_cors_headers(request, call_next):
     # Let nginx handle CORS headers, just log the request
     return response
 
+@app.middleware("http")
+async def track_query_stats(request, call_next):
+    """Count SQL statements per request - headers in debug mode, metrics otherwise"""
+    stats = start_request_stats()
+    response = await call_next(request)
+
+    if get_settings().DEBUG:
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["X-Query-Time-Ms"] = f"{stats.total_time_ms:.2f}"
+    else:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        metrics.observe(f"db.queries {request.method} {route_path}", stats.count)
+        metrics.observe(f"db.query_time_ms {request.method} {route_path}", stats.total_time_ms)
+
+    return response
+
 @app.get("/cors-test")
 @app.head("/cors-test")
 async def cors_test():
@@ -92,90 +159,6 @@ async def cors_test():
         "status": "success"
     }
 
-# Mock data arrays for document extraction
-aadhaar_front_mocks = [
-    {"name": "Rahul Sharma", "dob": "1988-05-23", "gender": "Male", "aadhar_number": "234567890123"},
-    {"name": "Priya Singh", "dob": "1992-11-10", "gender": "Female", "aadhar_number": "345678901234"},
-    {"name": "Amit Patel", "dob": "1985-03-15", "gender": "Male", "aadhar_number": "456789012345"},
-    {"name": "Sneha Reddy", "dob": "1990-07-19", "gender": "Female", "aadhar_number": "567890123456"},
-    {"name": "Vikram Desai", "dob": "1979-12-01", "gender": "Male", "aadhar_number": "678901234567"},
-    {"name": "Anjali Mehta", "dob": "1995-04-22", "gender": "Female", "aadhar_number": "789012345678"},
-    {"name": "Rohit Verma", "dob": "1983-09-30", "gender": "Male", "aadhar_number": "890123456789"},
-    {"name": "Kavita Joshi", "dob": "1987-06-14", "gender": "Female", "aadhar_number": "901234567890"},
-    {"name": "Suresh Kumar", "dob": "1975-01-05", "gender": "Male", "aadhar_number": "123456780912"},
-    {"name": "Meena Gupta", "dob": "1991-08-27", "gender": "Female", "aadhar_number": "234567801923"}
-]
-
-aadhaar_back_mocks = [
-    {"address": "Flat 12B, Green Residency, Baner Road, Pune, Maharashtra", "pincode": "411045"},
-    {"address": "23, Rose Villa, Sector 17, Chandigarh", "pincode": "160017"},
-    {"address": "B-45, Lake View, Salt Lake, Kolkata, West Bengal", "pincode": "700064"},
-    {"address": "Plot 8, MG Road, Bengaluru, Karnataka", "pincode": "560001"},
-    {"address": "H.No. 123, Lajpat Nagar, New Delhi", "pincode": "110024"},
-    {"address": "501, Palm Heights, Andheri East, Mumbai", "pincode": "400069"},
-    {"address": "7, Lotus Enclave, Banjara Hills, Hyderabad", "pincode": "500034"},
-    {"address": "C-22, Ashok Nagar, Chennai, Tamil Nadu", "pincode": "600083"},
-    {"address": "D-9, Alkapuri, Vadodara, Gujarat", "pincode": "390007"},
-    {"address": "A-1, Civil Lines, Jaipur, Rajasthan", "pincode": "302006"}
-]
-
-pancard_mocks = [
-    {"name": "Rahul Sharma", "pan_number": "FMPPK1234L"},
-    {"name": "Priya Singh", "pan_number": "BNZPS1234K"},
-    {"name": "Amit Patel", "pan_number": "AKLPJ2345M"},
-    {"name": "Sneha Reddy", "pan_number": "QWERT5678Z"},
-    {"name": "Vikram Desai", "pan_number": "ZXCVB6789N"},
-    {"name": "Anjali Mehta", "pan_number": "LKJHG3456B"},
-    {"name": "Rohit Verma", "pan_number": "POIUY4321V"},
-    {"name": "Kavita Joshi", "pan_number": "MNBVC0987X"},
-    {"name": "Suresh Kumar", "pan_number": "ASDFG7654C"},
-    {"name": "Meena Gupta", "pan_number": "GHJKL8765D"}
-]
-
-passport_mocks = [
-    {"name": "Rahul Sharma", "passport_number": "M1234567", "address": "22, Lotus Apartments, Andheri West, Mumbai, Maharashtra, 400053"},
-    {"name": "Priya Singh", "passport_number": "N2345678", "address": "14, Sunrise Towers, Powai, Mumbai, Maharashtra, 400076"},
-    {"name": "Amit Patel", "passport_number": "P3456789", "address": "8, Green Park, South Delhi, 110016"},
-    {"name": "Sneha Reddy", "passport_number": "Q4567890", "address": "33, Lake Gardens, Kolkata, 700045"},
-    {"name": "Vikram Desai", "passport_number": "R5678901", "address": "55, Residency Road, Bengaluru, 560025"},
-    {"name": "Anjali Mehta", "passport_number": "S6789012", "address": "12, Marine Drive, Kochi, 682031"},
-    {"name": "Rohit Verma", "passport_number": "T7890123", "address": "7, Civil Lines, Jaipur, 302006"},
-    {"name": "Kavita Joshi", "passport_number": "U8901234", "address": "19, Sector 21, Chandigarh, 160022"},
-    {"name": "Suresh Kumar", "passport_number": "V9012345", "address": "2, MG Road, Pune, 411001"},
-    {"name": "Meena Gupta", "passport_number": "W0123456", "address": "101, City Center, Ahmedabad, 380009"}
-]
-
-def mock_extract_aadhaar_front_info():
-    return random.choice(aadhaar_front_mocks)
-
-def mock_extract_aadhaar_back_info():
-    return random.choice(aadhaar_back_mocks)
-
-def mock_extract_pancard_info(name=None):
-    if name:
-        # Find the mock with the same name, else random
-        for rec in pancard_mocks:
-            if rec["name"] == name:
-                return rec.copy()
-        rec = random.choice(pancard_mocks)
-        rec = rec.copy()
-        rec["name"] = name
-        return rec
-    else:
-        return random.choice(pancard_mocks).copy()
-
-def mock_extract_passport_info(name=None):
-    if name:
-        for rec in passport_mocks:
-            if rec["name"] == name:
-                return rec.copy()
-        rec = random.choice(passport_mocks)
-        rec = rec.copy()
-        rec["name"] = name
-        return rec
-    else:
-        return random.choice(passport_mocks).copy()
-
 def validate_file_upload(file: UploadFile):
     """Validate file upload size and type"""
     print(f"🔍 DEBUG: Validating file: {file.filename}")
@@ -279,6 +262,11 @@ class CustomerOut(BaseModel):
     email: Optional[str] = None
     status: Optional[str] = None
 
+class ChatRequest(BaseModel):
+    prompt: str
+    stream: bool = False
+    conversation_id: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     environment: str
@@ -286,35 +274,66 @@ class HealthResponse(BaseModel):
     database: str
     s3: str
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin endpoints with the configured admin token; closed while none is configured"""
+    admin_token = get_settings().ADMIN_TOKEN
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled - ADMIN_TOKEN is not set")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
 # API Endpoints
 @app.get("/health", response_model=HealthResponse)
 @app.head("/health")
 async def health_check():
-    """Health check endpoint with AWS service status"""
-    try:
-        # Test database connection
-        engine = get_engine()
-        with engine.connect() as conn:
-            conn.execute("SELECT 1")
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    
-    try:
-        # Test S3 connection
-        storage.test_connection()
-        s3_status = "connected"
-    except Exception as e:
-        s3_status = f"error: {str(e)}"
-    
+    """Health check endpoint with AWS service status (cached by the background prober)"""
+    prober = get_health_prober()
     return HealthResponse(
         status="healthy",
         environment="aws",
         timestamp=datetime.utcnow().isoformat(),
-        database=db_status,
-        s3=s3_status
+        database=prober.status("database"),
+        s3=prober.status("s3")
     )
 
+@app.get("/health/live")
+@app.head("/health/live")
+async def health_live():
+    """Liveness probe - the worker is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+@app.head("/health/ready")
+async def health_ready():
+    """Readiness probe - cached dependency state and its age"""
+    prober = get_health_prober()
+    body = {
+        "status": "ready" if prober.is_ready else "not_ready",
+        "dependencies": prober.snapshot()
+    }
+    return JSONResponse(status_code=200 if prober.is_ready else 503, content=body)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-worker request and database metrics"""
+    snapshot = metrics.snapshot()
+    snapshot["presigned_url_cache"] = storage.url_cache.stats()
+    snapshot["chat"] = get_chat_service().stats()
+    snapshot["progress_events"] = get_progress_broker().stats()
+    snapshot["admission"] = admission_stats()
+    return snapshot
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries():
+    """Most recent statements slower than the configured threshold"""
+    slow_query_log = get_slow_query_log()
+    entries = slow_query_log.entries()
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "count": len(entries),
+        "queries": entries
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -326,6 +345,8 @@ async def root():
         "storage": "S3",
         "endpoints": {
             "health": "/health",
+            "health_live": "/health/live",
+            "health_ready": "/health/ready",
             "register": "/register",
             "kyc_register": "/kyc/register",
             "kyc_upload": "/kyc/upload",
@@ -334,11 +355,12 @@ async def root():
             "kyc_screen_data": "/kyc/screen-data/{case_id}",
             "kyc_progress": "/kyc/progress/{case_id}",
             "customers": "/customers",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
-@app.post("/register")
+@app.post("/register", dependencies=[Depends(admit("db"))])
 def register_user(data: UserRegistrationRequest, db: Session = Depends(get_db)):
     """Register a new user"""
     try:
@@ -376,9 +398,17 @@ def register_user(data: UserRegistrationRequest, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.post("/kyc/register")
-def register_user_kyc(data: UserRegistrationRequest, db: Session = Depends(get_db)):
-    """Register a new user or update existing user (KYC endpoint)"""
+@app.post("/kyc/register", dependencies=[Depends(admit("db"))])
+async def register_user_kyc(data: UserRegistrationRequest, idempotency_key: Optional[str] = Header(None),
+                            db: Session = Depends(get_db)):
+    """Register a new user or update existing user (KYC endpoint) - retries with the same Idempotency-Key get the first result"""
+    return await run_idempotent(
+        db, "kyc/register", idempotency_key, fingerprint(data.model_dump_json()),
+        lambda: run_in_threadpool(save_kyc_registration, data, db)
+    )
+
+def save_kyc_registration(data: UserRegistrationRequest, db: Session):
+    """Create or update the user and link them to the KYC case"""
     try:
         print(f"🔍 DEBUG: Registration request for kyc_case_id: {data.kyc_case_id}")
         print(f"🔍 DEBUG: Email: {data.email}, Phone: {data.phone}")
@@ -430,6 +460,7 @@ def register_user_kyc(data: UserRegistrationRequest, db: Session = Depends(get_d
                 # Update existing KYC details with email and phone
                 kyc_details.email = data.email
                 kyc_details.phone = data.phone
+                touch_case(db, data.kyc_case_id)
                 db.commit()
                 print(f"✅ DEBUG: Updated existing KYC details with registration info")
             else:
@@ -440,6 +471,7 @@ def register_user_kyc(data: UserRegistrationRequest, db: Session = Depends(get_d
                     phone=data.phone
                 )
                 db.add(kyc_details)
+                touch_case(db, data.kyc_case_id)
                 db.commit()
                 print(f"✅ DEBUG: Created new KYC details with registration info")
         else:
@@ -458,14 +490,37 @@ def register_user_kyc(data: UserRegistrationRequest, db: Session = Depends(get_d
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.post("/kyc/upload")
+def apply_extracted_fields(details: Optional[KycDetail], kyc_case_id: int, fields: dict) -> KycDetail:
+    """Copy non-empty extracted fields onto KycDetail, creating it if needed"""
+    values = {k: v for k, v in fields.items() if v and k in KycDetail.__table__.columns}
+    if details is None:
+        return KycDetail(kyc_case_id=kyc_case_id, **values)
+    for k, v in values.items():
+        setattr(details, k, v)
+    return details
+
+@app.post("/kyc/upload", dependencies=[Depends(admit("upload"))])
 async def upload_document(
+    background_tasks: BackgroundTasks,
     kyc_case_id: int = Form(...),
     doc_type: str = Form(...),
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Upload KYC document and extract information"""
+    """Upload KYC document and extract information - retries with the same Idempotency-Key get the first result"""
+    # Content hash of the uploaded file - part of the idempotency fingerprint, and lets
+    # re-uploads reuse the stored extraction
+    content_hash = await run_in_threadpool(hash_stream, file.file)
+    return await run_idempotent(
+        db, "kyc/upload", idempotency_key,
+        fingerprint(kyc_case_id, doc_type, file.filename, file.content_type, content_hash),
+        lambda: store_uploaded_document(background_tasks, kyc_case_id, doc_type, file, content_hash, db)
+    )
+
+async def store_uploaded_document(background_tasks: BackgroundTasks, kyc_case_id: int, doc_type: str,
+                                  file: UploadFile, content_hash: str, db: Session):
+    """Store the document, save its metadata and extract its details"""
     try:
         print(f"🔍 DEBUG: Uploading document for case_id: {kyc_case_id}, type: {doc_type}")
         print(f"📁 DEBUG: File details - Name: {file.filename}, Size: {file.size}, Content-Type: {file.content_type}")
@@ -487,13 +542,31 @@ async def upload_document(
             print(f"❌ DEBUG: File validation failed: {validation_error}")
             raise validation_error
 
+        # Read once - the same bytes are normalized, hashed and stored
+        original = await file.read()
+        await file.close()
+        filename, content, content_type = file.filename, original, file.content_type
+
+        # Photos are rotated upright, downscaled and recompressed in the image process pool
+        normalized = await normalize_upload(original, file.filename)
+        if normalized is not None and normalized.changed:
+            filename, content, content_type = normalized.filename, normalized.data, normalized.content_type
+        print(f"🔑 DEBUG: Content hash: {content_hash}")
+
         # File storage based on environment
         print(f"🔍 DEBUG: Environment: {get_settings().ENV}")
         if get_settings().ENV == "aws":
             print(f"☁️  DEBUG: Using S3 storage for AWS")
             try:
                 # Use S3 storage for AWS Lambda
-                file_path = await storage.upload_file(file, kyc_case_id, doc_type)
+                file_path = await run_in_threadpool(
+                    storage.upload_bytes, content, kyc_case_id, doc_type, filename, content_type
+                )
+                if normalized is not None and normalized.changed and get_settings().IMAGE_KEEP_ORIGINAL:
+                    await run_in_threadpool(
+                        storage.upload_bytes, original, kyc_case_id, doc_type,
+                        f"original_{file.filename}", file.content_type
+                    )
                 print(f"✅ DEBUG: File uploaded to S3: {file_path}")
             except Exception as s3_error:
                 print(f"❌ DEBUG: S3 upload failed: {s3_error}")
@@ -504,13 +577,13 @@ async def upload_document(
                 # Use local file storage for local development
                 upload_dir = "uploads"
                 os.makedirs(upload_dir, exist_ok=True)
-                file_path = os.path.join(upload_dir, f"{kyc_case_id}_{doc_type}_{file.filename}")
-                
-                # Reset file position to beginning
-                await file.seek(0)
-                
+                file_path = os.path.join(upload_dir, f"{kyc_case_id}_{doc_type}_{filename}")
                 with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
+                    buffer.write(content)
+                if normalized is not None and normalized.changed and get_settings().IMAGE_KEEP_ORIGINAL:
+                    original_path = os.path.join(upload_dir, f"{kyc_case_id}_{doc_type}_original_{file.filename}")
+                    with open(original_path, "wb") as buffer:
+                        buffer.write(original)
                 print(f"✅ DEBUG: File saved locally: {file_path}")
             except Exception as local_error:
                 print(f"❌ DEBUG: Local file save failed: {local_error}")
@@ -528,6 +601,7 @@ async def upload_document(
                 print(f"🔄 DEBUG: Updating existing document record")
                 existing_doc.file_path = file_path
                 existing_doc.uploaded_at = datetime.utcnow()
+                touch_case(db, kyc_case_id)
                 db.commit()
                 doc = existing_doc
             else:
@@ -539,6 +613,7 @@ async def upload_document(
                     uploaded_at=datetime.utcnow()
                 )
                 db.add(doc)
+                touch_case(db, kyc_case_id)
                 db.commit()
                 db.refresh(doc)
             print(f"✅ DEBUG: Document metadata saved successfully")
@@ -546,89 +621,41 @@ async def upload_document(
             print(f"❌ DEBUG: Database save failed: {db_error}")
             raise db_error
 
-        # Mock extraction logic - same as original main.py
+        # Thumbnails and previews for admin review are rendered after the response
+        if is_renderable(file_path):
+            # A re-upload with the same filename lands at the same path - drop the old file's derivatives
+            await run_in_threadpool(invalidate_derivatives, file_path)
+            background_tasks.add_task(create_derivatives, file_path)
+        # Videos and selfies are face-matched against the photo/passport once both are uploaded
+        if document_kind(doc_type):
+            background_tasks.add_task(run_face_match, kyc_case_id)
+
+        # Extract details with the extractor registered for this document type
         print(f"🔍 DEBUG: Processing document type: {doc_type}")
-        if doc_type == "aadhar_front":
-            print(f"🆔 DEBUG: Extracting Aadhar front information")
-            extracted = mock_extract_aadhaar_front_info()
+        if normalize_doc_type(doc_type):
             details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
-            if details:
-                for k, v in extracted.items():
-                    if v:
-                        setattr(details, k, v)
-                db.commit()
-                print(f"✅ DEBUG: Updated existing KYC details with Aadhar front info")
+            extractor = get_extractor(doc_type)
+            stored = get_document_result(db, doc.id)
+            if is_current(stored, content_hash, extractor.name, extractor.version):
+                print(f"♻️  DEBUG: Same file already extracted - reusing stored result")
+                fields = stored.fields
             else:
-                details = KycDetail(kyc_case_id=kyc_case_id, **{k: v for k, v in extracted.items() if v})
-                db.add(details)
-                db.commit()
-                print(f"✅ DEBUG: Created new KYC details with Aadhar front info")
-                
-        elif doc_type == "aadhar_back":
-            print(f"🆔 DEBUG: Extracting Aadhar back information")
-            extracted = mock_extract_aadhaar_back_info()
-            details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
-            if details:
-                for k, v in extracted.items():
-                    if v:
-                        if k == "address":
-                            details.address = v
-                        elif k == "pincode":
-                            if details.address:
-                                details.address += f", {v}"
-                            else:
-                                details.address = v
-                db.commit()
-                print(f"✅ DEBUG: Updated existing KYC details with Aadhar back info")
-            else:
-                address = extracted.get("address", "")
-                pincode = extracted.get("pincode", "")
-                full_address = f"{address}, {pincode}" if address and pincode else address or pincode
-                details = KycDetail(kyc_case_id=kyc_case_id, address=full_address)
-                db.add(details)
-                db.commit()
-                print(f"✅ DEBUG: Created new KYC details with Aadhar back info")
-                
-        elif doc_type == "pancard":
-            print(f"🆔 DEBUG: Extracting PAN card information")
-            details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
-            name = details.name if details and details.name else None
-            extracted = mock_extract_pancard_info(name)
-            if details:
-                for k, v in extracted.items():
-                    if v:
-                        setattr(details, k, v)
+                context = {"name": details.name if details and details.name else None}
+                extraction = await extract_document_async(doc_type, file_path, context)
+                fields = None
+                if extraction:
+                    print(f"🆔 DEBUG: Extracted {doc_type} information with {extraction.extractor} extractor")
+                    save_extraction(db, doc, extraction, content_hash)
+                    fields = extraction.fields
+            if fields:
+                details = apply_extracted_fields(details, kyc_case_id, fields)
+                if details.id is None:
+                    db.add(details)
+                touch_case(db, kyc_case_id)
                 db.commit()
-                print(f"✅ DEBUG: Updated existing KYC details with PAN info")
-            else:
-                details = KycDetail(kyc_case_id=kyc_case_id, **{k: v for k, v in extracted.items() if v})
-                db.add(details)
-                db.commit()
-                print(f"✅ DEBUG: Created new KYC details with PAN info")
-                
-        elif doc_type == "passport":
-            print(f"🆔 DEBUG: Extracting Passport information")
-            details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
-            name = details.name if details and details.name else None
-            extracted = mock_extract_passport_info(name)
-            if details:
-                for k, v in extracted.items():
-                    if v:
-                        if k == "address":
-                            details.address = v
-                        else:
-                            setattr(details, k, v)
-                db.commit()
-                print(f"✅ DEBUG: Updated existing KYC details with Passport info")
-            else:
-                details = KycDetail(kyc_case_id=kyc_case_id, **{k: v for k, v in extracted.items() if v})
-                db.add(details)
-                db.commit()
-                print(f"✅ DEBUG: Created new KYC details with Passport info")
+                print(f"✅ DEBUG: Saved KYC details with {doc_type} info")
         elif doc_type == "video":
             print(f"🎥 DEBUG: Video upload - no extraction needed")
-            # For video uploads, we don't need to extract information
-            pass
         else:
             print(f"⚠️  DEBUG: Unknown document type: {doc_type} - no extraction performed")
 
@@ -638,7 +665,8 @@ async def upload_document(
             "message": "Document uploaded successfully",
             "doc_id": doc.id,
             "file_path": file_path,
-            "kyc_case_id": kyc_case_id
+            "kyc_case_id": kyc_case_id,
+            "image_normalization": normalized.summary() if normalized is not None else None
         }
         
     except Exception as e:
@@ -649,6 +677,163 @@ async def upload_document(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+def pending_case_documents(db: Session, kyc_case_id: int):
+    """Documents of a case without a current stored result, with their content hashes"""
+    stored = {result.kyc_document_id: result for result in load_case_results(db, kyc_case_id)}
+    pending, hashes = [], {}
+    for doc in db.query(KycDocument).filter(KycDocument.kyc_case_id == kyc_case_id).all():
+        extractor = get_extractor(doc.doc_type)
+        if extractor is None:
+            continue
+        content_hash = hash_stream(io.BytesIO(storage.read_file(doc.file_path)))
+        if not is_current(stored.get(doc.id), content_hash, extractor.name, extractor.version):
+            pending.append(doc)
+            hashes[doc.id] = content_hash
+    return pending, hashes
+
+def extract_case_documents(kyc_case_id: int):
+    """
+    Background task after a resumable upload completes - extract every document of the case
+    without a current stored result (this upload, and any whose extraction failed before)
+    concurrently, then fill in the case's details as /kyc/upload does
+    """
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        pending, hashes = pending_case_documents(db, kyc_case_id)
+        details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
+        context = {"name": details.name if details and details.name else None}
+        # Detached copies - no connection is held while the extractors run
+        db.expunge_all()
+    except Exception as e:
+        print(f"❌ DEBUG: Finding documents to extract for case {kyc_case_id} failed: {e}")
+        return
+    finally:
+        db.close()
+    if not pending:
+        return
+
+    extractions = extract_documents(pending, context)
+    if not extractions:
+        return
+    file_paths = {doc.id: doc.file_path for doc in pending}
+    db = SessionLocal()
+    try:
+        details = db.query(KycDetail).filter(KycDetail.kyc_case_id == kyc_case_id).first()
+        for doc in db.query(KycDocument).filter(KycDocument.id.in_(list(extractions))).all():
+            # Replaced by another upload while it was being extracted - that upload extracts it
+            if doc.file_path != file_paths[doc.id]:
+                continue
+            extraction = extractions[doc.id]
+            save_extraction(db, doc, extraction, hashes[doc.id])
+            if extraction.fields:
+                details = apply_extracted_fields(details, kyc_case_id, extraction.fields)
+                if details.id is None:
+                    db.add(details)
+        touch_case(db, kyc_case_id)
+        db.commit()
+        print(f"🆔 DEBUG: Extracted {len(extractions)} of {len(pending)} pending documents of case {kyc_case_id}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ DEBUG: Saving extractions of case {kyc_case_id} failed: {e}")
+    finally:
+        db.close()
+
+@app.options("/kyc/uploads")
+def resumable_upload_options():
+    """tus discovery - supported version, extensions and maximum size"""
+    headers = tus_headers()
+    headers.update({
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": TUS_EXTENSIONS,
+        "Tus-Max-Size": str(get_settings().RESUMABLE_MAX_UPLOAD_SIZE)
+    })
+    return Response(status_code=204, headers=headers)
+
+@app.post("/kyc/uploads", dependencies=[Depends(require_tus_resumable), Depends(admit("upload"))])
+def create_resumable_upload(
+    upload_length: Optional[int] = Header(None),
+    upload_metadata: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Create a resumable upload - Upload-Metadata carries kyc_case_id, doc_type and filename"""
+    if upload_length is None or upload_length <= 0:
+        raise HTTPException(status_code=400, detail="Upload-Length header is required")
+    if upload_length > get_settings().RESUMABLE_MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Upload-Length exceeds the maximum upload size")
+
+    metadata = parse_metadata(upload_metadata)
+    missing = [key for key in ("kyc_case_id", "doc_type", "filename") if not metadata.get(key)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Upload-Metadata is missing: {', '.join(missing)}")
+    try:
+        kyc_case_id = int(metadata["kyc_case_id"])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="kyc_case_id must be an integer")
+    file_ext = os.path.splitext(metadata["filename"])[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    if not db.query(KycCase.id).filter(KycCase.id == kyc_case_id).first():
+        raise HTTPException(status_code=404, detail=f"KYC case {kyc_case_id} not found")
+
+    session = create_upload_session(
+        db, kyc_case_id, metadata["doc_type"], metadata["filename"], metadata.get("filetype"), upload_length
+    )
+    headers = tus_headers(session)
+    headers["Location"] = f"/kyc/uploads/{session.id}"
+    return Response(status_code=201, headers=headers)
+
+@app.head("/kyc/uploads/{upload_id}", dependencies=[Depends(require_tus_resumable)])
+def get_resumable_upload_offset(upload_id: str, db: Session = Depends(get_db)):
+    """Current offset of a resumable upload - where the client resumes after a dropped connection"""
+    session = get_upload_session(db, upload_id)
+    return Response(status_code=200, headers=tus_headers(session))
+
+@app.patch("/kyc/uploads/{upload_id}", dependencies=[Depends(require_tus_resumable), Depends(admit("upload"))])
+async def upload_resumable_chunk(
+    upload_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    upload_offset: Optional[int] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Append a chunk at Upload-Offset; the document is saved when the last byte arrives"""
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    if upload_offset is None or upload_offset < 0:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+
+    max_chunk = get_settings().RESUMABLE_MAX_CHUNK_SIZE
+    chunk = bytearray()
+    async for data in request.stream():
+        chunk.extend(data)
+        if len(chunk) > max_chunk:
+            raise HTTPException(status_code=413, detail=f"Chunk larger than {max_chunk} bytes")
+
+    session = await run_in_threadpool(append_chunk, db, upload_id, upload_offset, bytes(chunk))
+    headers = tus_headers(session)
+    if session.status == "completed":
+        headers["X-Kyc-Document-Id"] = str(session.kyc_document_id)
+        if is_renderable(session.file_path):
+            background_tasks.add_task(create_derivatives, session.file_path)
+        if document_kind(session.doc_type):
+            background_tasks.add_task(run_face_match, session.kyc_case_id)
+        if normalize_doc_type(session.doc_type):
+            background_tasks.add_task(extract_case_documents, session.kyc_case_id)
+    return Response(status_code=204, headers=headers)
+
+@app.delete("/kyc/uploads/{upload_id}", dependencies=[Depends(require_tus_resumable)])
+def terminate_resumable_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Abort a resumable upload and free its stored chunks"""
+    session = get_upload_session(db, upload_id, for_update=True)
+    if session.status == "completed":
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    abort_upload(db, session)
+    return Response(status_code=204, headers=tus_headers())
+
 @app.get("/kyc/case")
 def create_kyc_case(db: Session = Depends(get_db)):
     """Create a new KYC case"""
@@ -680,9 +865,17 @@ def create_kyc_case(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create KYC case: {str(e)}")
 
-@app.post("/kyc/details")
-def save_kyc_details(data: KycDetailsRequest, db: Session = Depends(get_db)):
-    """Save KYC details"""
+@app.post("/kyc/details", dependencies=[Depends(admit("db"))])
+async def save_kyc_details(data: KycDetailsRequest, idempotency_key: Optional[str] = Header(None),
+                           db: Session = Depends(get_db)):
+    """Save KYC details - retries with the same Idempotency-Key get the first result"""
+    return await run_idempotent(
+        db, "kyc/details", idempotency_key, fingerprint(data.model_dump_json()),
+        lambda: run_in_threadpool(store_kyc_details, data, db)
+    )
+
+def store_kyc_details(data: KycDetailsRequest, db: Session):
+    """Save the details and mark the case as submitted"""
     try:
         print(f"🔍 DEBUG: Received KYC details for case_id: {data.kyc_case_id}")
         
@@ -697,6 +890,7 @@ def save_kyc_details(data: KycDetailsRequest, db: Session = Depends(get_db)):
                 if field != 'kyc_case_id':
                     setattr(existing_details, field, value)
             # Note: updated_at field doesn't exist in the database
+            touch_case(db, data.kyc_case_id)
             db.commit()
             db.refresh(existing_details)
             details = existing_details
@@ -704,6 +898,7 @@ def save_kyc_details(data: KycDetailsRequest, db: Session = Depends(get_db)):
             # Create new record
             details = KycDetail(**data.dict())
             db.add(details)
+            touch_case(db, data.kyc_case_id)
             db.commit()
             db.refresh(details)
         
@@ -726,6 +921,7 @@ def save_kyc_details(data: KycDetailsRequest, db: Session = Depends(get_db)):
                     kyc_status = KycStatus(user_id=kyc_case.user_id, status='submitted', kyc_id=str(data.kyc_case_id))
                     db.add(kyc_status)
                 
+                touch_case(db, data.kyc_case_id)
                 db.commit()
                 print(f"🔍 DEBUG: Database committed successfully")
             else:
@@ -745,12 +941,17 @@ def save_kyc_details(data: KycDetailsRequest, db: Session = Depends(get_db)):
         print(f"❌ DEBUG: Error saving KYC details: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to save KYC details: {str(e)}")
 
-@app.get("/kyc/screen-data/{case_id}", response_model=KycScreenData)
-def get_kyc_screen_data(case_id: int, db: Session = Depends(get_db)):
+@app.get("/kyc/screen-data/{case_id}", response_model=KycScreenData, dependencies=[Depends(admit("db"))])
+def get_kyc_screen_data(case_id: int, request: Request, db: Session = Depends(get_db)):
     """Get KYC screen data for a case"""
     try:
         print(f"🔍 DEBUG: Getting screen data for case_id: {case_id}")
         
+        # Unchanged since the client's last poll - one lookup, no body
+        etag = case_etag(db, case_id)
+        if not_modified(request.headers.get("if-none-match"), etag, "screen-data"):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        
         # Convert SQLAlchemy objects to dictionaries safely
         def to_dict(obj):
             if obj is None:
@@ -801,22 +1002,26 @@ def get_kyc_screen_data(case_id: int, db: Session = Depends(get_db)):
         else:
             print(f"❌ DEBUG: No user_id in KYC case, cannot check status")
         
-        return KycScreenData(
-            case={
+        # Same shape as KycScreenData, serialized without a second validation pass
+        response = json_response(request, {
+            "case": {
                 "id": kyc_case.id,
                 "status": kyc_case.status,
                 "created_at": kyc_case.created_at.isoformat() if kyc_case.created_at else None,
                 "updated_at": kyc_case.updated_at.isoformat() if kyc_case.updated_at else None
             },
-            details=details_data,
-            documents=[{
+            "details": details_data,
+            "documents": [{
                 "id": doc.id,
                 "doc_type": doc.doc_type,
                 "file_path": doc.file_path,
                 "uploaded_at": doc.uploaded_at.isoformat() if doc.uploaded_at else None
             } for doc in documents],
-            status=to_dict(kyc_status)
-        )
+            "status": to_dict(kyc_status)
+        })
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
         
     except HTTPException:
         raise
@@ -824,24 +1029,133 @@ def get_kyc_screen_data(case_id: int, db: Session = Depends(get_db)):
         print(f"❌ DEBUG: Error in screen-data endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get screen data: {str(e)}")
 
-@app.get("/kyc/progress/{case_id}", response_model=KycProgressResponse)
-def get_kyc_progress(case_id: int, db: Session = Depends(get_db)):
+@app.get("/kyc/face-match/{case_id}")
+def get_face_match(case_id: int, db: Session = Depends(get_db)):
+    """Face match scores of a case's videos and selfies against its photo/passport"""
+    if not db.query(KycCase.id).filter(KycCase.id == case_id).first():
+        raise HTTPException(status_code=404, detail="KYC case not found")
+    return {"kyc_case_id": case_id, "results": load_case_face_matches(db, case_id)}
+
+def compute_kyc_progress(db: Session, kyc_case: KycCase) -> dict:
+    """Steps and current step of a case - shared by /kyc/progress and its event stream"""
+    case_id = kyc_case.id
+    # Define the steps in order with correct names and status
+    steps = [
+        {"id": "registration", "name": "Registration", "status": "pending"},
+        {"id": "aadhar_upload", "name": "Aadhar Upload", "status": "pending"},
+        {"id": "pan_upload", "name": "PAN Upload", "status": "pending"},
+        {"id": "passport_upload", "name": "Passport Upload", "status": "pending"},
+        {"id": "photo_upload", "name": "Photo Upload", "status": "pending"},
+        {"id": "selfie_upload", "name": "Selfie Upload", "status": "pending"},
+        {"id": "video_upload", "name": "Video Upload", "status": "pending"},
+        {"id": "review", "name": "Review", "status": "pending"},
+        {"id": "kyc_submitted", "name": "KYC Submitted", "status": "pending"}
+    ]
+    
+    # Check if user is registered (has user_id)
+    if kyc_case.user_id:
+        print(f"✅ DEBUG: User is registered, user_id: {kyc_case.user_id}")
+        steps[0]["status"] = "completed"
+    else:
+        print(f"❌ DEBUG: No user_id found in KYC case")
+    
+    # Check document uploads
+    documents = db.query(KycDocument).filter(KycDocument.kyc_case_id == case_id).all()
+    uploaded_doc_types = [doc.doc_type.lower() for doc in documents]
+    print(f"🔍 DEBUG: Uploaded documents: {uploaded_doc_types}")
+    
+    # Update document step statuses
+    # Check for aadhar uploads (both front and back)
+    aadhar_docs = [doc for doc in uploaded_doc_types if 'aadhar' in doc or 'aadhaar' in doc]
+    if len(aadhar_docs) >= 2:  # Both front and back uploaded
+        steps[1]["status"] = "completed"
+        print(f"✅ DEBUG: Aadhar upload completed (found {len(aadhar_docs)} aadhar documents)")
+    elif len(aadhar_docs) == 1:
+        print(f"⚠️ DEBUG: Only {len(aadhar_docs)} aadhar document found, need both front and back")
+    else:
+        print(f"❌ DEBUG: No aadhar documents found")
+        
+    # Check for PAN upload
+    pan_docs = [doc for doc in uploaded_doc_types if 'pan' in doc]
+    if len(pan_docs) >= 1:
+        steps[2]["status"] = "completed"
+        print(f"✅ DEBUG: PAN upload completed (found {len(pan_docs)} PAN documents)")
+    else:
+        print(f"❌ DEBUG: No PAN documents found")
+        
+    # Check for Passport upload
+    passport_docs = [doc for doc in uploaded_doc_types if 'passport' in doc]
+    if len(passport_docs) >= 1:
+        steps[3]["status"] = "completed"
+        print(f"✅ DEBUG: Passport upload completed (found {len(passport_docs)} passport documents)")
+    else:
+        print(f"❌ DEBUG: No passport documents found")
+        
+    # Check for Photo upload
+    photo_docs = [doc for doc in uploaded_doc_types if 'photo' in doc]
+    if len(photo_docs) >= 1:
+        steps[4]["status"] = "completed"
+        print(f"✅ DEBUG: Photo upload completed (found {len(photo_docs)} photo documents)")
+    else:
+        print(f"❌ DEBUG: No photo documents found")
+        
+    # Check for Selfie upload
+    selfie_docs = [doc for doc in uploaded_doc_types if 'selfie' in doc]
+    if len(selfie_docs) >= 1:
+        steps[5]["status"] = "completed"
+        print(f"✅ DEBUG: Selfie upload completed (found {len(selfie_docs)} selfie documents)")
+    else:
+        print(f"❌ DEBUG: No selfie documents found")
+        
+    # Check for Video upload
+    video_docs = [doc for doc in uploaded_doc_types if 'video' in doc]
+    if len(video_docs) >= 1:
+        steps[6]["status"] = "completed"
+        print(f"✅ DEBUG: Video upload completed (found {len(video_docs)} video documents)")
+    else:
+        print(f"❌ DEBUG: No video documents found")
+    
+    # Check details submission - this should not mark review as completed
+    details = db.query(KycDetail).filter(KycDetail.kyc_case_id == case_id).first()
+    if details:
+        print(f"✅ DEBUG: KYC details exist")
+    else:
+        print(f"❌ DEBUG: No KYC details found")
+    
+    # Check if KYC is submitted (case status) - this determines both review and kyc_submitted
+    if kyc_case.status and kyc_case.status.lower() in ["submitted", "approved", "rejected"]:
+        steps[7]["status"] = "completed"  # Review step completed
+        steps[8]["status"] = "completed"  # KYC submitted
+        print(f"✅ DEBUG: KYC submitted with status: {kyc_case.status}")
+    else:
+        print(f"❌ DEBUG: KYC not submitted, status: {kyc_case.status}")
+        # Review step should only be completed when KYC is actually submitted
+        steps[7]["status"] = "pending"  # Review step pending until KYC is submitted
+    
+    # Determine current step
+    current_step = "registration"
+    for i, step in enumerate(steps):
+        if step["status"] == "pending":
+            current_step = step["id"]
+            break
+        elif step["status"] == "completed":
+            current_step = step["id"]
+    
+    print(f"🎯 DEBUG: Current step: {current_step}")
+    print(f"📊 DEBUG: Final steps status: {[step['id'] + ':' + step['status'] for step in steps]}")
+    
+    return {"steps": steps, "current_step": current_step}
+
+@app.get("/kyc/progress/{case_id}", response_model=KycProgressResponse, dependencies=[Depends(admit("db"))])
+def get_kyc_progress(case_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get KYC progress for a case"""
     try:
         print(f"🔍 DEBUG: Checking progress for case_id: {case_id}")
         
-        # Define the steps in order with correct names and status
-        steps = [
-            {"id": "registration", "name": "Registration", "status": "pending"},
-            {"id": "aadhar_upload", "name": "Aadhar Upload", "status": "pending"},
-            {"id": "pan_upload", "name": "PAN Upload", "status": "pending"},
-            {"id": "passport_upload", "name": "Passport Upload", "status": "pending"},
-            {"id": "photo_upload", "name": "Photo Upload", "status": "pending"},
-            {"id": "selfie_upload", "name": "Selfie Upload", "status": "pending"},
-            {"id": "video_upload", "name": "Video Upload", "status": "pending"},
-            {"id": "review", "name": "Review", "status": "pending"},
-            {"id": "kyc_submitted", "name": "KYC Submitted", "status": "pending"}
-        ]
+        # Unchanged since the client's last poll - one lookup, no body
+        etag = case_etag(db, case_id)
+        if not_modified(request.headers.get("if-none-match"), etag, "progress"):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
         
         # Check case exists
         kyc_case = db.query(KycCase).filter(KycCase.id == case_id).first()
@@ -853,102 +1167,12 @@ def get_kyc_progress(case_id: int, db: Session = Depends(get_db)):
         print(f"🔍 DEBUG: KYC case user_id: {kyc_case.user_id}")
         print(f"🔍 DEBUG: KYC case status: {kyc_case.status}")
         
-        # Check if user is registered (has user_id)
-        if kyc_case.user_id:
-            print(f"✅ DEBUG: User is registered, user_id: {kyc_case.user_id}")
-            steps[0]["status"] = "completed"
-        else:
-            print(f"❌ DEBUG: No user_id found in KYC case")
-        
-        # Check document uploads
-        documents = db.query(KycDocument).filter(KycDocument.kyc_case_id == case_id).all()
-        uploaded_doc_types = [doc.doc_type.lower() for doc in documents]
-        print(f"🔍 DEBUG: Uploaded documents: {uploaded_doc_types}")
-        
-        # Update document step statuses
-        # Check for aadhar uploads (both front and back)
-        aadhar_docs = [doc for doc in uploaded_doc_types if 'aadhar' in doc or 'aadhaar' in doc]
-        if len(aadhar_docs) >= 2:  # Both front and back uploaded
-            steps[1]["status"] = "completed"
-            print(f"✅ DEBUG: Aadhar upload completed (found {len(aadhar_docs)} aadhar documents)")
-        elif len(aadhar_docs) == 1:
-            print(f"⚠️ DEBUG: Only {len(aadhar_docs)} aadhar document found, need both front and back")
-        else:
-            print(f"❌ DEBUG: No aadhar documents found")
-            
-        # Check for PAN upload
-        pan_docs = [doc for doc in uploaded_doc_types if 'pan' in doc]
-        if len(pan_docs) >= 1:
-            steps[2]["status"] = "completed"
-            print(f"✅ DEBUG: PAN upload completed (found {len(pan_docs)} PAN documents)")
-        else:
-            print(f"❌ DEBUG: No PAN documents found")
-            
-        # Check for Passport upload
-        passport_docs = [doc for doc in uploaded_doc_types if 'passport' in doc]
-        if len(passport_docs) >= 1:
-            steps[3]["status"] = "completed"
-            print(f"✅ DEBUG: Passport upload completed (found {len(passport_docs)} passport documents)")
-        else:
-            print(f"❌ DEBUG: No passport documents found")
-            
-        # Check for Photo upload
-        photo_docs = [doc for doc in uploaded_doc_types if 'photo' in doc]
-        if len(photo_docs) >= 1:
-            steps[4]["status"] = "completed"
-            print(f"✅ DEBUG: Photo upload completed (found {len(photo_docs)} photo documents)")
-        else:
-            print(f"❌ DEBUG: No photo documents found")
-            
-        # Check for Selfie upload
-        selfie_docs = [doc for doc in uploaded_doc_types if 'selfie' in doc]
-        if len(selfie_docs) >= 1:
-            steps[5]["status"] = "completed"
-            print(f"✅ DEBUG: Selfie upload completed (found {len(selfie_docs)} selfie documents)")
-        else:
-            print(f"❌ DEBUG: No selfie documents found")
-            
-        # Check for Video upload
-        video_docs = [doc for doc in uploaded_doc_types if 'video' in doc]
-        if len(video_docs) >= 1:
-            steps[6]["status"] = "completed"
-            print(f"✅ DEBUG: Video upload completed (found {len(video_docs)} video documents)")
-        else:
-            print(f"❌ DEBUG: No video documents found")
-        
-        # Check details submission - this should not mark review as completed
-        details = db.query(KycDetail).filter(KycDetail.kyc_case_id == case_id).first()
-        if details:
-            print(f"✅ DEBUG: KYC details exist")
-        else:
-            print(f"❌ DEBUG: No KYC details found")
-        
-        # Check if KYC is submitted (case status) - this determines both review and kyc_submitted
-        if kyc_case.status and kyc_case.status.lower() in ["submitted", "approved", "rejected"]:
-            steps[7]["status"] = "completed"  # Review step completed
-            steps[8]["status"] = "completed"  # KYC submitted
-            print(f"✅ DEBUG: KYC submitted with status: {kyc_case.status}")
-        else:
-            print(f"❌ DEBUG: KYC not submitted, status: {kyc_case.status}")
-            # Review step should only be completed when KYC is actually submitted
-            steps[7]["status"] = "pending"  # Review step pending until KYC is submitted
-        
-        # Determine current step
-        current_step = "registration"
-        for i, step in enumerate(steps):
-            if step["status"] == "pending":
-                current_step = step["id"]
-                break
-            elif step["status"] == "completed":
-                current_step = step["id"]
+        progress = compute_kyc_progress(db, kyc_case)
         
-        print(f"🎯 DEBUG: Current step: {current_step}")
-        print(f"📊 DEBUG: Final steps status: {[step['id'] + ':' + step['status'] for step in steps]}")
-        
-        return KycProgressResponse(
-            steps=steps,
-            current_step=current_step
-        )
+        if etag is not None:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = CACHE_CONTROL
+        return KycProgressResponse(**progress)
         
     except HTTPException:
         raise
@@ -956,96 +1180,72 @@ def get_kyc_progress(case_id: int, db: Session = Depends(get_db)):
         print(f"❌ DEBUG: Error in progress endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get progress: {str(e)}")
 
-@app.get("/customers", response_model=List[CustomerOut])
-@app.head("/customers")
-def list_customers(db: Session = Depends(get_db)):
+def load_progress_update(case_id: int, known_version: Optional[str]):
+    """(version, progress) of a case for its event stream - progress is None while unchanged"""
+    db = get_session_local()()
+    try:
+        version = case_etag(db, case_id)
+        if version is None or version == known_version:
+            return version, None
+        kyc_case = db.query(KycCase).filter(KycCase.id == case_id).first()
+        return version, compute_kyc_progress(db, kyc_case)
+    finally:
+        db.close()
+
+@app.get("/kyc/progress/{case_id}/events")
+async def kyc_progress_events(case_id: int, last_event_id: Optional[str] = Header(None)):
+    """KYC progress as server-sent events - the current steps, then again whenever they change"""
+    def case_exists():
+        db = get_session_local()()
+        try:
+            return db.query(KycCase.id).filter(KycCase.id == case_id).first() is not None
+        finally:
+            db.close()
+
+    # No request-scoped session - it would be held for the whole stream
+    if not await run_in_threadpool(case_exists):
+        raise HTTPException(status_code=404, detail="KYC case not found")
+    return StreamingResponse(
+        stream_progress(case_id, load_progress_update, last_event_id),
+        media_type="text/event-stream",
+        # nginx must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/customers", response_model=List[CustomerOut], dependencies=[Depends(admit("db"))])
+@app.head("/customers", dependencies=[Depends(admit("db"))])
+def list_customers(request: Request, db: Session = Depends(get_db)):
     """List all customers with KYC details"""
     try:
-        # Get all KYC details with related information
-        kyc_details = db.query(KycDetail).all()
+        # Get all KYC details with their case and status in a single query
+        rows = db.query(KycDetail, KycStatus.status).outerjoin(
+            KycCase, KycCase.id == KycDetail.kyc_case_id
+        ).outerjoin(
+            KycStatus, KycStatus.user_id == KycCase.user_id
+        ).order_by(KycDetail.id, KycStatus.id).all()
         
         customers = []
-        for detail in kyc_details:
-            # Get KYC case
-            kyc_case = db.query(KycCase).filter(KycCase.id == detail.kyc_case_id).first()
-            
-            # Get KYC status (only if user_id exists)
-            kyc_status = None
-            if kyc_case and kyc_case.user_id:
-                kyc_status = db.query(KycStatus).filter(KycStatus.user_id == kyc_case.user_id).first()
+        seen_details = set()
+        for detail, status in rows:
+            # A user can have several status rows - keep the first, as before
+            if detail.id in seen_details:
+                continue
+            seen_details.add(detail.id)
             
-            customers.append(CustomerOut(
-                kyc_details_id=detail.id,
-                kyc_case_id=kyc_case.id,
-                name=detail.name,
-                email=detail.email,
-                status=kyc_status.status if kyc_status else "unknown"
-            ))
+            # Same shape as CustomerOut, serialized without a second validation pass
+            customers.append({
+                "kyc_details_id": detail.id,
+                "kyc_case_id": detail.kyc_case_id,
+                "name": detail.name,
+                "email": detail.email,
+                "status": status if status else "unknown"
+            })
         
-        return customers
+        return json_response(request, customers)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list customers: {str(e)}")
 
-def extract_aadhar_info(documents, db):
-    """Extract information from Aadhar documents using mock data"""
-    aadhar_info = {}
-    
-    # Check if we have both front and back aadhar documents
-    aadhar_front_docs = [doc for doc in documents if 'aadhar' in doc.doc_type.lower() and 'front' in doc.doc_type.lower()]
-    aadhar_back_docs = [doc for doc in documents if 'aadhar' in doc.doc_type.lower() and 'back' in doc.doc_type.lower()]
-    
-    if aadhar_front_docs:
-        # Extract from aadhar front
-        front_info = mock_extract_aadhaar_front_info()
-        aadhar_info.update(front_info)
-        print(f"✅ DEBUG: Extracted Aadhar front info: {front_info}")
-    
-    if aadhar_back_docs:
-        # Extract from aadhar back
-        back_info = mock_extract_aadhaar_back_info()
-        address = back_info.get("address", "")
-        pincode = back_info.get("pincode", "")
-        full_address = f"{address}, {pincode}" if address and pincode else address or pincode
-        aadhar_info["address"] = full_address
-        print(f"✅ DEBUG: Extracted Aadhar back info: {back_info}")
-    
-    return aadhar_info
-
-def extract_pan_info(documents, db):
-    """Extract information from PAN document using mock data"""
-    pan_info = {}
-    
-    pan_docs = [doc for doc in documents if 'pan' in doc.doc_type.lower()]
-    
-    if pan_docs:
-        # Get existing name from aadhar if available
-        existing_details = db.query(KycDetail).filter(KycDetail.kyc_case_id == pan_docs[0].kyc_case_id).first()
-        name = existing_details.name if existing_details and existing_details.name else None
-        
-        extracted = mock_extract_pancard_info(name)
-        pan_info.update(extracted)
-        print(f"✅ DEBUG: Extracted PAN info: {extracted}")
-    
-    return pan_info
-
-def extract_passport_info(documents, db):
-    """Extract information from Passport document using mock data"""
-    passport_info = {}
-    
-    passport_docs = [doc for doc in documents if 'passport' in doc.doc_type.lower()]
-    
-    if passport_docs:
-        # Get existing name from aadhar if available
-        existing_details = db.query(KycDetail).filter(KycDetail.kyc_case_id == passport_docs[0].kyc_case_id).first()
-        name = existing_details.name if existing_details and existing_details.name else None
-        
-        extracted = mock_extract_passport_info(name)
-        passport_info.update(extracted)
-        print(f"✅ DEBUG: Extracted Passport info: {extracted}")
-    
-    return passport_info
-
 def get_user_info_from_registration(kyc_case, db):
     """Get user information from registration"""
     user_info = {}
@@ -1068,20 +1268,13 @@ def get_auto_populated_kyc_details(case_id: int, db: Session):
         if not kyc_case:
             return None
         
-        # Get all documents for this case
-        documents = db.query(KycDocument).filter(KycDocument.kyc_case_id == case_id).all()
-        
-        # Extract information from different sources
+        # Documents were extracted at upload time - merge the stored results
         user_info = get_user_info_from_registration(kyc_case, db)
-        aadhar_info = extract_aadhar_info(documents, db)
-        pan_info = extract_pan_info(documents, db)
-        passport_info = extract_passport_info(documents, db)
+        results = load_case_results(db, case_id)
+        print(f"✅ DEBUG: Loaded {len(results)} stored extraction results")
         
         # Merge all information (user info takes precedence for email/phone)
-        auto_details = {}
-        auto_details.update(aadhar_info)
-        auto_details.update(pan_info)
-        auto_details.update(passport_info)
+        auto_details = merge_results(results)
         auto_details.update(user_info)  # User info overrides extracted info for email/phone
         
         # Add default values for required fields
@@ -1105,8 +1298,8 @@ def get_auto_populated_kyc_details(case_id: int, db: Session):
         print(f"Error getting auto-populated details: {e}")
         return None
 
-@app.get("/kyc/auto-details/{case_id}")
-def get_auto_populated_details(case_id: int, db: Session = Depends(get_db)):
+@app.get("/kyc/auto-details/{case_id}", dependencies=[Depends(admit("db"))])
+def get_auto_populated_details(case_id: int, request: Request, db: Session = Depends(get_db)):
     """Get auto-populated KYC details from uploaded documents and registration"""
     try:
         print(f"🔍 DEBUG: Getting auto-populated details for case_id: {case_id}")
@@ -1115,12 +1308,12 @@ def get_auto_populated_details(case_id: int, db: Session = Depends(get_db)):
         
         if auto_details:
             print(f"✅ DEBUG: Auto-populated details found for case {case_id}")
-            return {
+            return json_response(request, {
                 "success": True,
                 "message": "Auto-populated details retrieved successfully",
                 "kyc_case_id": case_id,
                 "details": auto_details
-            }
+            })
         else:
             print(f"❌ DEBUG: No auto-populated details found for case {case_id}")
             raise HTTPException(status_code=404, detail="No auto-populated details found")
@@ -1132,64 +1325,177 @@ def get_auto_populated_details(case_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to get auto-populated details: {str(e)}")
 
 # Add a specific endpoint to serve files (as a fallback)
-@app.get("/files/{file_path:path}")
-async def get_file(file_path: str):
+def resolve_file_source(file_path: str) -> str:
+    """s3:// URL or local path of a /files path - 404 for anything outside our bucket or uploads/"""
     # Handle S3 URLs regardless of environment
     if file_path.startswith("s3://"):
-        # Extract the S3 key from the file path
-        s3_key = file_path.replace("s3://", "").split("/", 1)[1]
-        
-        # Generate pre-signed URL for S3
+        if not storage.is_own_s3_url(file_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        return file_path
+    if get_settings().ENV == "aws":
+        # For AWS Lambda, convert the local path to an S3 key
+        s3_key = file_path if file_path.startswith("uploads/") else f"uploads/{file_path}"
+        if not is_safe_key(s3_key):
+            raise HTTPException(status_code=404, detail="File not found")
+        return f"s3://{storage.bucket_name}/{s3_key}"
+    # For local development, serve files from local filesystem
+    relative = path_within_uploads(os.path.join(UPLOAD_DIR, file_path))
+    if relative is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    source = os.path.join(UPLOAD_DIR, relative)
+    if not os.path.exists(source):
+        raise HTTPException(status_code=404, detail="File not found")
+    return source
+
+def validate_size(size: Optional[str]):
+    if size is not None and size != "original" and size not in DERIVATIVE_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown size '{size}'. Use one of: original, {', '.join(DERIVATIVE_SIZES)}"
+        )
+
+async def resolve_derivative(source: str, size: Optional[str]):
+    """Location and size to serve - the requested derivative, or the original when none can be made"""
+    if size not in DERIVATIVE_SIZES or not is_renderable(source):
+        return source, "original"
+    try:
+        derivative = await get_or_create_derivative(source, size)
+    except Exception as e:
+        print(f"❌ DEBUG: {size} derivative of {source} failed, serving original: {e}")
+        derivative = None
+    if derivative:
+        return derivative, size
+    return source, "original"
+
+@app.get("/kyc/documents/{case_id}/urls")
+async def get_document_urls(case_id: int, size: Optional[str] = None, db: Session = Depends(get_db)):
+    """Download URLs for every document of a case in one call - size applies to images and PDFs"""
+    validate_size(size)
+    documents = await run_in_threadpool(
+        lambda: db.query(KycDocument).filter(KycDocument.kyc_case_id == case_id).all()
+    )
+    resolved = await asyncio.gather(*(resolve_derivative(doc.file_path, size) for doc in documents))
+    # Every S3 document signed in one batch off the event loop
+    s3_keys = [source.replace("s3://", "").split("/", 1)[1] for source, _ in resolved if source.startswith("s3://")]
+    signed = await run_in_threadpool(storage.get_file_urls, s3_keys) if s3_keys else {}
+
+    urls = []
+    for doc, (source, served_size) in zip(documents, resolved):
+        if source.startswith("s3://"):
+            download_url = signed[source.replace("s3://", "").split("/", 1)[1]]
+        else:
+            # Local development - served by /files
+            download_url = f"/files/{os.path.relpath(source, 'uploads')}"
+        urls.append({
+            "id": doc.id,
+            "doc_type": doc.doc_type,
+            "file_path": doc.file_path,
+            "download_url": download_url,
+            "size": served_size
+        })
+    return {"kyc_case_id": case_id, "documents": urls}
+
+def client_address(request: Request) -> str:
+    """
+    Caller's address as nginx saw it. X-Real-IP is set by nginx from the connection; the
+    first X-Forwarded-For hops come from the client and can be forged, so only the last one -
+    appended by the proxy in front of us - is used when X-Real-IP is missing.
+    """
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip.strip()
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+@app.post("/chat")
+async def chat(chat_request: ChatRequest, request: Request):
+    """Ask the KYC assistant - the whole reply as JSON, or server-sent events with stream=true"""
+    settings = get_settings()
+    prompt = chat_request.prompt.strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+    if len(prompt) > settings.CHAT_MAX_PROMPT_CHARS:
+        raise HTTPException(status_code=400, detail=f"Prompt is longer than {settings.CHAT_MAX_PROMPT_CHARS} characters")
+
+    retry_after = get_chat_rate_limiter().acquire(client_address(request))
+    if retry_after is not None:
+        metrics.increment("chat.rate_limited")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many chat requests - try again shortly",
+            headers={"Retry-After": str(max(int(retry_after + 0.999), 1))}
+        )
+
+    conversation = await run_in_threadpool(load_conversation, chat_request.conversation_id)
+    conversation_id = conversation["id"] if conversation else new_conversation_id()
+    context = await run_in_threadpool(retrieve_context, prompt)
+    model_prompt = build_prompt(conversation, prompt, context)
+    # Answers to a follow-up depend on the earlier turns - only first questions are cached
+    cache_question = None if has_history(conversation) else prompt
+
+    async def save_turn(reply: str):
         try:
-            download_url = storage.get_file_url(s3_key)
-            if download_url:
-                return {"download_url": download_url}
-            else:
-                raise HTTPException(status_code=404, detail="File not found in S3")
+            await run_in_threadpool(record_turn, conversation_id, prompt, reply)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error accessing file: {str(e)}")
-    
-    # Handle local files based on environment
-    if ENV == "aws":
-        # For AWS Lambda, try to convert local path to S3 key
-        s3_key = file_path
-        
+            print(f"❌ DEBUG: Saving chat turn of conversation {conversation_id} failed: {e}")
+
+    service = get_chat_service()
+    if chat_request.stream or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_events(service, model_prompt, conversation_id, save_turn, cache_question),
+            media_type="text/event-stream",
+            # nginx must pass events through as they are written
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Conversation-Id": conversation_id}
+        )
+    try:
+        reply = await service.complete(model_prompt, cache_question)
+    except Exception:
+        raise HTTPException(status_code=502, detail="Error getting reply")
+    await save_turn(reply)
+    return {"prompt": prompt, "response": reply, "reply": reply, "conversation_id": conversation_id}
+
+@app.api_route("/files/stream/{file_path:path}", methods=["GET", "HEAD"])
+async def stream_file(
+    file_path: str,
+    request: Request,
+    size: Optional[str] = None,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None)
+):
+    """Stream a stored document through the API with Range, ETag and 304 support (video seeking)"""
+    validate_size(size)
+    source, _ = await resolve_derivative(resolve_file_source(file_path), size)
+    head = request.method == "HEAD"
+    if source.startswith("s3://"):
+        return await run_in_threadpool(stream_s3_object, source, range_header, if_none_match, if_range, head)
+    return await run_in_threadpool(stream_local_file, source, range_header, if_none_match, if_range, head)
+
+@app.get("/files/{file_path:path}")
+async def get_file(file_path: str, request: Request, size: Optional[str] = None):
+    """Serve a stored document - size=thumb|preview serves a cached derivative instead of the original"""
+    validate_size(size)
+
+    source, served_size = await resolve_derivative(resolve_file_source(file_path), size)
+
+    if source.startswith("s3://"):
         # Generate pre-signed URL for S3
+        s3_key = source.replace("s3://", "").split("/", 1)[1]
         try:
             download_url = storage.get_file_url(s3_key)
-            if download_url:
-                return {"download_url": download_url}
-            else:
-                raise HTTPException(status_code=404, detail="File not found in S3")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error accessing file: {str(e)}")
-    else:
-        # For local development, serve files from local filesystem
-        file_location = os.path.join("uploads", file_path)
-        if not os.path.exists(file_location):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Determine content type based on file extension
-        content_type = None
-        if file_path.lower().endswith('.webm'):
-            content_type = 'video/webm'
-        elif file_path.lower().endswith('.mp4'):
-            content_type = 'video/mp4'
-        elif file_path.lower().endswith(('.jpg', '.jpeg')):
-            content_type = 'image/jpeg'
-        elif file_path.lower().endswith('.png'):
-            content_type = 'image/png'
-        elif file_path.lower().endswith('.pdf'):
-            content_type = 'application/pdf'
-        
-        return FileResponse(
-            file_location,
-            media_type=content_type,
-            headers={
-                'Accept-Ranges': 'bytes',
-                'Cache-Control': 'public, max-age=3600'
-            }
-        )
+        if not download_url:
+            raise HTTPException(status_code=404, detail="File not found in S3")
+        return {"download_url": download_url, "size": served_size}
+
+    # Local files support Range and ETags like /files/stream
+    return await run_in_threadpool(
+        stream_local_file, source,
+        request.headers.get("range"), request.headers.get("if-none-match"), request.headers.get("if-range")
+    )
 
 if __name__ == "__main__":
     import uvicorn
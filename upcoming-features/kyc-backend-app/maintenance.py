@@ -0,0 +1,81 @@
+"""
+Periodic database housekeeping that belongs to no single feature.
+Each job deletes expired rows of its own table in its own session, so one failing job
+does not hold up the others. Jobs run every MAINTENANCE_INTERVAL_SECONDS in every worker;
+the deletes are idempotent, so workers running them concurrently is harmless.
+"""
+
+import asyncio
+from typing import Callable, Dict
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from chat_sessions import collect_expired_conversations
+from config import get_settings
+from database import get_session_local
+from idempotency import collect_expired_idempotency_keys
+from metrics import metrics
+
+
+class MaintenanceTask:
+    """Runs registered cleanup jobs in the background; each job returns how many rows it deleted"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.jobs: Dict[str, Callable[[Session], int]] = {}
+        self._task = None
+
+    def register(self, name: str, job: Callable[[Session], int]):
+        self.jobs[name] = job
+
+    def run_job(self, name: str) -> int:
+        db = get_session_local()()
+        try:
+            return self.jobs[name](db)
+        finally:
+            db.close()
+
+    async def run_once(self):
+        for name in self.jobs:
+            try:
+                deleted = await run_in_threadpool(self.run_job, name)
+                if deleted:
+                    metrics.increment(f"maintenance.deleted {name}", deleted)
+                    print(f"🧹 Deleted {deleted} expired {name}")
+            except Exception as e:
+                metrics.increment(f"maintenance.errors {name}")
+                print(f"❌ Maintenance job '{name}' failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.run_once()
+
+    def start(self):
+        """Start running the jobs in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_maintenance = None
+
+
+def get_maintenance() -> MaintenanceTask:
+    """Get or create this worker's maintenance task with its jobs"""
+    global _maintenance
+    if _maintenance is None:
+        _maintenance = MaintenanceTask(get_settings().MAINTENANCE_INTERVAL_SECONDS)
+        _maintenance.register("chat conversations", collect_expired_conversations)
+        _maintenance.register("idempotency keys", collect_expired_idempotency_keys)
+    return _maintenance
@@ -0,0 +1,56 @@
+"""
+In-process metrics registry for the KYC API.
+Counters and timings are kept per worker and exposed through the /metrics endpoint.
+"""
+
+import threading
+from typing import Dict
+
+
+class MetricsRegistry:
+    """Thread-safe store of named counters and timing aggregates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """Record one observation of a timing or size"""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = {"count": 0, "total": 0.0, "max": 0.0}
+                self._timings[name] = timing
+            timing["count"] += 1
+            timing["total"] += value
+            if value > timing["max"]:
+                timing["max"] = value
+
+    def snapshot(self) -> dict:
+        """Return a copy of all counters and timing aggregates"""
+        with self._lock:
+            timings = {}
+            for name, timing in self._timings.items():
+                timings[name] = {
+                    "count": timing["count"],
+                    "total": round(timing["total"], 3),
+                    "avg": round(timing["total"] / timing["count"], 3) if timing["count"] else 0.0,
+                    "max": round(timing["max"], 3),
+                }
+            return {"counters": dict(self._counters), "timings": timings}
+
+    def reset(self):
+        """Clear all recorded metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Create a singleton instance
+metrics = MetricsRegistry()
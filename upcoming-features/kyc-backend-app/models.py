@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, Text, Float, JSON
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -17,7 +17,7 @@ class User(Base):
 class KycDocument(Base):
     __tablename__ = 'kyc_documents'
     id = Column(Integer, primary_key=True, index=True)
-    kyc_case_id = Column(Integer, ForeignKey('kyc_cases.id'))
+    kyc_case_id = Column(Integer, ForeignKey('kyc_cases.id'), index=True)  # counted for the case version (case_version.py)
     doc_type = Column(String, nullable=False)  # e.g., 'aadhar-front', 'aadhar-back', 'pancard', etc.
     file_path = Column(String, nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
@@ -70,4 +70,77 @@ class KycCase(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     # Relationships
-    kyc_documents = relationship('KycDocument', back_populates='kyc_case') 
\ No newline at end of file
+    kyc_documents = relationship('KycDocument', back_populates='kyc_case') 
+
+class ExtractionResult(Base):
+    __tablename__ = 'extraction_results'
+    id = Column(Integer, primary_key=True, index=True)
+    kyc_document_id = Column(Integer, ForeignKey('kyc_documents.id'), unique=True, index=True, nullable=False)
+    kyc_case_id = Column(Integer, ForeignKey('kyc_cases.id'), index=True)
+    doc_type = Column(String, nullable=False)  # normalized: aadhar_front, aadhar_back, pancard, passport
+    fields = Column(JSON, nullable=False)
+    confidence = Column(Float)
+    extractor = Column(String, nullable=False)  # e.g., 'mock', 'textract', 'local_ocr'
+    extractor_version = Column(String, nullable=False)
+    content_hash = Column(String(64), index=True)  # sha256 of the uploaded file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UploadSession(Base):
+    __tablename__ = 'upload_sessions'
+    id = Column(String(32), primary_key=True)  # random hex, part of the upload URL
+    kyc_case_id = Column(Integer, ForeignKey('kyc_cases.id'), index=True, nullable=False)
+    doc_type = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    length = Column(BigInteger, nullable=False)  # total size announced by the client (Upload-Length)
+    offset = Column(BigInteger, nullable=False, default=0)  # bytes received and durably stored
+    backend = Column(String, nullable=False)  # 's3' (multipart upload) or 'local' (partial file)
+    file_path = Column(String, nullable=False)  # final location - s3:// URL or local path
+    s3_upload_id = Column(String)
+    parts = Column(JSON, default=list)  # uploaded multipart parts: [{"PartNumber": 1, "ETag": "..."}]
+    pending_bytes = Column(BigInteger, nullable=False, default=0)  # buffered tail below the S3 minimum part size
+    status = Column(String, nullable=False, default='active', index=True)  # active, completed, aborted, expired
+    kyc_document_id = Column(Integer, ForeignKey('kyc_documents.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+class FaceMatchResult(Base):
+    __tablename__ = 'face_match_results'
+    id = Column(Integer, primary_key=True, index=True)
+    kyc_case_id = Column(Integer, ForeignKey('kyc_cases.id'), index=True, nullable=False)
+    source_document_id = Column(Integer, ForeignKey('kyc_documents.id'), unique=True, nullable=False)  # video or selfie
+    reference_document_id = Column(Integer, ForeignKey('kyc_documents.id'), nullable=False)  # photo or passport
+    source_uploaded_at = Column(DateTime)  # upload times the scores were computed for
+    reference_uploaded_at = Column(DateTime)
+    status = Column(String, nullable=False)  # matched, not_matched, no_face, unavailable, failed
+    matcher = Column(String, nullable=False)  # e.g., 'rekognition', 'stub'
+    frames_sampled = Column(Integer, default=0)
+    faces_detected = Column(Integer, default=0)  # frames with at least one face
+    best_similarity = Column(Float)  # 0-100
+    median_similarity = Column(Float)
+    scores = Column(JSON)  # per-frame similarity, None where no face was found
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChatConversation(Base):
+    __tablename__ = 'chat_conversations'
+    id = Column(String(32), primary_key=True)  # random hex, returned to the client as conversation_id
+    summary = Column(JSON, default=list)  # condensed older turns, oldest first
+    turns = Column(JSON, default=list)  # recent turns: [{"role": "customer" | "assistant", "text": "..."}]
+    token_count = Column(Integer, default=0)  # estimated tokens of summary and turns
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class IdempotencyRecord(Base):
+    __tablename__ = 'idempotency_keys'
+    scope = Column(String(64), primary_key=True)  # endpoint, e.g. 'kyc/upload'
+    key = Column(String(255), primary_key=True)  # client's Idempotency-Key header
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request the key was first used with
+    status = Column(String(16), nullable=False)  # in_progress, completed
+    status_code = Column(Integer)
+    response = Column(JSON)  # stored response body, replayed to duplicates
+    created_at = Column(DateTime, default=datetime.utcnow)  # when the current attempt started
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,221 @@
+"""
+Pushed KYC progress for /kyc/progress/{case_id}/events.
+Writes that change a case's progress mark it in their transaction (case_version.touch_case)
+and the change is published when the transaction commits, never for a rollback. Each
+worker wakes only its own streams of that case, which then re-read the progress once -
+however many changes arrived meanwhile. Across workers (and from reprocess_documents.py)
+changes travel through Postgres LISTEN/NOTIFY with PROGRESS_EVENTS_BACKEND=postgres; the
+local backend keeps them in the process, for development and single-worker deployments.
+"""
+
+import asyncio
+import json
+import select
+import threading
+from typing import AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import get_settings
+from metrics import metrics
+
+CHANNEL = "kyc_progress"
+PENDING_KEY = "progress_events.pending"
+# Browsers reconnect this long after a dropped stream, sending the last event id
+RECONNECT_MS = 3000
+
+
+class LocalProgressBroker:
+    """Fan-out of case changes to this worker's streams"""
+    name = "local"
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[int, Set[asyncio.Event]] = {}
+
+    def stage(self, db: Session, case_id: int):
+        """Publish a change of the case when db's transaction commits"""
+        db.info.setdefault(PENDING_KEY, set()).add(case_id)
+
+    def publish(self, case_ids):
+        """Wake the streams of the cases (safe to call from any thread)"""
+        if self._loop is None:
+            return
+        for case_id in case_ids:
+            try:
+                self._loop.call_soon_threadsafe(self._dispatch, case_id)
+            except RuntimeError:
+                # The event loop has shut down
+                return
+
+    def _dispatch(self, case_id: int):
+        metrics.increment("progress_events.changes")
+        for changed in self._subscribers.get(case_id, ()):
+            changed.set()
+
+    def _dispatch_all(self):
+        for case_id in list(self._subscribers):
+            self._dispatch(case_id)
+
+    def subscribe(self, case_id: int) -> asyncio.Event:
+        """Event set whenever the case changes (call on the event loop)"""
+        self._loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        self._subscribers.setdefault(case_id, set()).add(changed)
+        self.start()
+        return changed
+
+    def unsubscribe(self, case_id: int, changed: asyncio.Event):
+        subscribers = self._subscribers.get(case_id)
+        if subscribers is not None:
+            subscribers.discard(changed)
+            if not subscribers:
+                del self._subscribers[case_id]
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "cases": len(self._subscribers),
+            "streams": sum(len(subscribers) for subscribers in self._subscribers.values()),
+        }
+
+
+class PostgresProgressBroker(LocalProgressBroker):
+    """
+    Changes are sent with pg_notify inside the writing transaction - Postgres delivers them
+    at commit - and every worker LISTENs on one dedicated connection in a background thread.
+    """
+    name = "postgres"
+    POLL_SECONDS = 5
+    RECONNECT_SECONDS = 5
+
+    def __init__(self):
+        super().__init__()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def stage(self, db: Session, case_id: int):
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": str(case_id)})
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name="progress-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _listen(self):
+        from database import get_engine
+
+        first_connection = True
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                # Detached from the pool - LISTEN holds the connection for the worker's lifetime
+                connection = get_engine().raw_connection()
+                connection.detach()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {CHANNEL}")
+                print(f"📡 Listening for progress changes on '{CHANNEL}'")
+                if not first_connection:
+                    # Changes may have been missed while reconnecting - let every stream re-check
+                    self._loop.call_soon_threadsafe(self._dispatch_all)
+                first_connection = False
+                while not self._stopping.is_set():
+                    if select.select([dbapi_connection], [], [], self.POLL_SECONDS) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    case_ids = set()
+                    while dbapi_connection.notifies:
+                        case_ids.add(int(dbapi_connection.notifies.pop(0).payload))
+                    self.publish(case_ids)
+            except Exception as e:
+                print(f"❌ DEBUG: Progress listener failed: {e}")
+                metrics.increment("progress_events.listen_errors")
+                self._stopping.wait(self.RECONNECT_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+PROGRESS_BROKERS = {"local": LocalProgressBroker, "postgres": PostgresProgressBroker}
+_broker = None
+
+
+def get_progress_broker():
+    """Get or create this worker's broker for the configured backend"""
+    global _broker
+    if _broker is None:
+        backend = get_settings().PROGRESS_EVENTS_BACKEND
+        if backend not in PROGRESS_BROKERS:
+            raise ValueError(f"Unknown progress events backend: {backend}")
+        _broker = PROGRESS_BROKERS[backend]()
+    return _broker
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        get_progress_broker().publish(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def sse_message(event_name: str, data: dict, event_id: Optional[str] = None) -> str:
+    message = f"id: {event_id}\n" if event_id else ""
+    return message + f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_progress(case_id: int, load: Callable[[int, Optional[str]], Tuple[Optional[str], Optional[dict]]],
+                          last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Server-sent events of a case: its progress now, then again after every change.
+    load(case_id, known_version) runs in the thread pool and returns the case's version
+    (None once the case is gone) and its progress, or None for it while the version is
+    known_version. The version is the event id, so a reconnecting browser that already has
+    the current progress is not sent it again.
+    """
+    broker = get_progress_broker()
+    heartbeat = get_settings().PROGRESS_EVENTS_HEARTBEAT_SECONDS
+    # Subscribed before the first read, so no change can fall between the two
+    changed = broker.subscribe(case_id)
+    sent_version = last_event_id
+    metrics.increment("progress_events.streams")
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        while True:
+            changed.clear()
+            version, progress = await run_in_threadpool(load, case_id, sent_version)
+            if version is None:
+                yield sse_message("error", {"message": "KYC case not found"})
+                return
+            if progress is not None:
+                sent_version = version
+                metrics.increment("progress_events.sent")
+                yield sse_message("progress", progress, version)
+            # Comments keep proxies and load balancers from closing an idle stream
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat)
+                    break
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(case_id, changed)
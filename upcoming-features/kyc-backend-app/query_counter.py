@@ -0,0 +1,100 @@
+"""
+Per-request SQL statement counting.
+SQLAlchemy cursor events record how many statements ran and how long they took
+for the request (or test block) that is currently active.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+
+class QueryStats:
+    """Statement count and total execution time for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0  # seconds
+        self.statements = []
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements.append(statement)
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+
+# The stats object is mutable so sync endpoints running in the threadpool
+# (which get a copy of the context) still update the request's counters
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Collectors opened with count_queries() see every statement in the process,
+# so a test can wrap a TestClient call whose handler runs in another thread
+_collectors = []
+_collectors_lock = threading.Lock()
+
+
+def install_query_counter(engine):
+    """Register cursor events on the engine that feed the active QueryStats"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("query_start_time")
+        if not start_times:
+            return
+        elapsed = time.perf_counter() - start_times.pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if _collectors:
+            with _collectors_lock:
+                for collector in _collectors:
+                    collector.record(statement, elapsed)
+
+
+def start_request_stats() -> QueryStats:
+    """Begin counting statements for the current request"""
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def get_request_stats() -> Optional[QueryStats]:
+    """Get the stats of the current request, if counting is active"""
+    return _current_stats.get()
+
+
+@contextmanager
+def count_queries():
+    """Count the statements executed inside the block"""
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Fail with AssertionError if the block runs more than max_queries statements"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(stats.statements))
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, got {stats.count}:\n{statements}"
+        )
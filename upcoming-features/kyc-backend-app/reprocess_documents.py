@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Bulk document re-extraction.
+Re-runs extraction over stored documents after extraction logic changes and stores the
+results in extraction_results (KycDetail rows the customer may have edited are left alone).
+Documents are paged from kyc_documents by id, or from the uploads/kyc/ S3 prefix, and
+extracted on a worker pool under a global rate limit. Progress is checkpointed so an
+interrupted run resumes where it stopped.
+
+Usage:
+    python reprocess_documents.py [--workers 4] [--rate 5] [--source db|s3] [--force]
+    python reprocess_documents.py --reset           # start over, ignoring the checkpoint
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+# Add parent directory to path for imports
+sys.path.append('..')
+
+from case_version import touch_case
+from database import get_session_local
+from extraction_store import get_document_result, hash_stream, is_current, save_extraction
+from extractors import check_backend, configure_executor, extract_document, get_extractor, normalize_doc_type
+from models import KycDetail, KycDocument
+from storage import storage
+
+DEFAULT_CHECKPOINT = "reprocess_checkpoint.json"
+REPORT_EVERY_SECONDS = 5
+
+
+class RateLimiter:
+    """Token bucket shared by all workers - rate documents per second, with bursts up to rate"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class Checkpoint:
+    """
+    Progress file written atomically. "position" is a low-water mark - every document at or
+    before it has finished - so resuming never skips a document that was still in flight.
+    """
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.source = source
+        self.position = None
+        self.counts = {"processed": 0, "extracted": 0, "skipped": 0, "failed": 0}
+        self.failed = []
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("source") != self.source:
+            raise SystemExit(f"❌ Checkpoint {self.path} is for source '{data.get('source')}' - use --reset")
+        self.position = data.get("position")
+        self.counts.update(data.get("counts", {}))
+        self.failed = data.get("failed", [])
+
+    def save(self):
+        data = {
+            "source": self.source,
+            "position": self.position,
+            "counts": self.counts,
+            "failed": self.failed[-1000:],
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def iter_db_documents(position, page_size: int, doc_type=None, case_id=None):
+    """(position, document id) pairs in id order, paged with keyset pagination"""
+    last_id = position or 0
+    SessionLocal = get_session_local()
+    while True:
+        db = SessionLocal()
+        try:
+            query = db.query(KycDocument.id, KycDocument.doc_type).filter(KycDocument.id > last_id)
+            if doc_type:
+                query = query.filter(KycDocument.doc_type == doc_type)
+            if case_id:
+                query = query.filter(KycDocument.kyc_case_id == case_id)
+            page = query.order_by(KycDocument.id).limit(page_size).all()
+        finally:
+            db.close()
+        if not page:
+            return
+        for doc_id, row_doc_type in page:
+            if normalize_doc_type(row_doc_type):
+                yield doc_id, doc_id
+        last_id = page[-1][0]
+
+
+def iter_s3_documents(position, page_size: int, doc_type=None, case_id=None):
+    """(S3 key, document id) pairs for objects under uploads/kyc/ that belong to a document"""
+    prefix = f"uploads/kyc/{case_id}/" if case_id else "uploads/kyc/"
+    params = {"Bucket": storage.bucket_name, "Prefix": prefix, "PaginationConfig": {"PageSize": page_size}}
+    if position:
+        params["StartAfter"] = position
+    SessionLocal = get_session_local()
+    for page in storage.s3_client.get_paginator("list_objects_v2").paginate(**params):
+        keys = [obj["Key"] for obj in page.get("Contents", [])]
+        if not keys:
+            continue
+        urls = {f"s3://{storage.bucket_name}/{key}": key for key in keys}
+        db = SessionLocal()
+        try:
+            rows = db.query(KycDocument.id, KycDocument.file_path, KycDocument.doc_type).filter(
+                KycDocument.file_path.in_(list(urls))
+            ).all()
+        finally:
+            db.close()
+        by_url = {file_path: (doc_id, row_doc_type) for doc_id, file_path, row_doc_type in rows}
+        for url, key in urls.items():
+            doc_id, row_doc_type = by_url.get(url, (None, None))
+            # Objects without a document row (replaced uploads, derivatives) are skipped
+            if doc_id is None or not normalize_doc_type(row_doc_type):
+                continue
+            if doc_type and row_doc_type != doc_type:
+                continue
+            yield key, doc_id
+
+
+def reprocess_document(doc_id: int, backend, force: bool) -> str:
+    """Re-extract one document; returns 'extracted' or 'skipped'"""
+    db = get_session_local()()
+    try:
+        doc = db.query(KycDocument).filter(KycDocument.id == doc_id).first()
+        if doc is None:
+            return "skipped"
+        extractor = get_extractor(doc.doc_type, backend)
+        if extractor is None:
+            return "skipped"
+        content_hash = hash_stream(io.BytesIO(storage.read_file(doc.file_path)))
+        stored = get_document_result(db, doc.id)
+        if not force and is_current(stored, content_hash, extractor.name, extractor.version):
+            return "skipped"
+        # Same context as the upload flow
+        details = db.query(KycDetail).filter(KycDetail.kyc_case_id == doc.kyc_case_id).first()
+        context = {"name": details.name if details and details.name else None}
+        # Same per-extractor timeout and error accounting as uploads
+        extraction = extract_document(extractor, doc.file_path, context)
+        save_extraction(db, doc, extraction, content_hash)
+        # Auto-populated screen data changes with the extraction
+        touch_case(db, doc.kyc_case_id)
+        db.commit()
+        return "extracted"
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def report(checkpoint: Checkpoint, started: float, started_count: int, recent: deque):
+    elapsed = time.monotonic() - started
+    done = checkpoint.counts["processed"] - started_count
+    rate = done / elapsed if elapsed else 0.0
+    line = f"{rate:.2f} docs/s overall"
+    if len(recent) >= 2 and recent[-1][0] > recent[0][0]:
+        recent_rate = (recent[-1][1] - recent[0][1]) / (recent[-1][0] - recent[0][0])
+        line += f", {recent_rate:.2f} docs/s over the last minute"
+    counts = checkpoint.counts
+    print(f"📊 {counts['processed']} processed ({counts['extracted']} extracted, {counts['skipped']} current, "
+          f"{counts['failed']} failed) - {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract stored KYC documents")
+    parser.add_argument("--source", choices=["db", "s3"], default="db",
+                        help="Page kyc_documents rows (default) or the uploads/kyc/ S3 prefix")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent extractions")
+    parser.add_argument("--rate", type=float, default=5, help="Maximum documents per second (0 = unlimited)")
+    parser.add_argument("--page-size", type=int, default=200, help="Documents fetched per page")
+    parser.add_argument("--backend", default=None, help="Extractor backend (default: EXTRACTOR_BACKEND)")
+    parser.add_argument("--doc-type", default=None, help="Only documents of this doc_type")
+    parser.add_argument("--case-id", type=int, default=None, help="Only documents of this case")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract even when the stored result matches the file and extractor version")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Save progress every N documents")
+    parser.add_argument("--reset", action="store_true", help="Ignore and overwrite an existing checkpoint")
+    args = parser.parse_args()
+    try:
+        check_backend(args.backend)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # One extractor thread per job worker - each worker waits on its own extraction
+    configure_executor(args.workers)
+
+    checkpoint = Checkpoint(args.checkpoint, args.source)
+    if not args.reset:
+        checkpoint.load()
+    if checkpoint.position is not None:
+        print(f"↩️  Resuming after {checkpoint.position} ({checkpoint.counts['processed']} already processed)")
+
+    iterate = iter_db_documents if args.source == "db" else iter_s3_documents
+    documents = iterate(checkpoint.position, args.page_size, args.doc_type, args.case_id)
+    limiter = RateLimiter(args.rate)
+    max_in_flight = args.workers * 2
+
+    # Submission order, so the checkpoint only moves past documents that have all finished
+    order = deque()
+    finished = set()
+    in_flight = {}
+    started = time.monotonic()
+    started_count = checkpoint.counts["processed"]
+    recent = deque(maxlen=12)
+    last_report = started
+    since_save = 0
+
+    def settle(future):
+        nonlocal since_save
+        position, doc_id = in_flight.pop(future)
+        try:
+            outcome = future.result()
+        except Exception as e:
+            outcome = "failed"
+            checkpoint.failed.append({"document_id": doc_id, "error": str(e)[:300]})
+            print(f"❌ Document {doc_id} failed: {e}")
+        checkpoint.counts[outcome] += 1
+        checkpoint.counts["processed"] += 1
+        finished.add(position)
+        while order and order[0] in finished:
+            finished.discard(order[0])
+            checkpoint.position = order.popleft()
+        since_save += 1
+        if since_save >= args.checkpoint_every:
+            checkpoint.save()
+            since_save = 0
+
+    print(f"🚀 Reprocessing from {args.source} with {args.workers} workers at "
+          f"{'unlimited' if args.rate <= 0 else f'{args.rate:g}'} docs/s")
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="reprocess")
+    try:
+        for position, doc_id in documents:
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    settle(future)
+            limiter.acquire()
+            order.append(position)
+            in_flight[pool.submit(reprocess_document, doc_id, args.backend, args.force)] = (position, doc_id)
+
+            now = time.monotonic()
+            if now - last_report >= REPORT_EVERY_SECONDS:
+                recent.append((now, checkpoint.counts["processed"]))
+                report(checkpoint, started, started_count, recent)
+                last_report = now
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                settle(future)
+    except KeyboardInterrupt:
+        # Queued documents are dropped and running ones are not counted - all are retried on resume
+        print("\n⏸️  Interrupted - saving progress")
+        pool.shutdown(wait=False, cancel_futures=True)
+        checkpoint.save()
+        raise SystemExit(130)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    checkpoint.save()
+    report(checkpoint, started, started_count, recent)
+    print(f"✅ Done - checkpoint at {args.checkpoint}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Resumable chunked uploads (tus 1.0 core protocol with the termination extension).
+A client creates a session with the total size, sends chunks with PATCH at the current
+offset and asks for the offset with HEAD after a dropped connection, so a failed upload
+resumes instead of starting over. Chunks are stored as S3 multipart parts in AWS and
+appended to a partial file locally; the KycDocument is written once the last byte
+arrives. Sessions that stop receiving chunks are aborted by a background collector.
+"""
+
+import asyncio
+import base64
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from case_version import touch_case
+from config import get_settings
+from database import get_session_local
+from derivatives import invalidate_derivatives, is_renderable
+from metrics import metrics
+from models import KycDocument, UploadSession
+from storage import storage
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination,expiration"
+# S3 rejects non-final multipart parts smaller than 5MB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+# doc_type becomes part of the stored path and S3 key - only the types the app uploads
+DOC_TYPES = ("aadhar_front", "aadhar_back", "pancard", "passport", "photo", "selfie", "video")
+
+
+def require_tus_resumable(tus_resumable: Optional[str] = Header(None)):
+    """Every tus request but OPTIONS names its protocol version - 412 when it is missing or not ours"""
+    if tus_resumable != TUS_VERSION:
+        raise HTTPException(
+            status_code=412,
+            detail=f"Tus-Resumable {TUS_VERSION} is required",
+            headers={"Tus-Resumable": TUS_VERSION, "Tus-Version": TUS_VERSION}
+        )
+
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode a tus Upload-Metadata header - comma-separated "key base64value" pairs"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, encoded = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(encoded).decode("utf-8") if encoded else ""
+        except Exception:
+            raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for '{key}'")
+    return metadata
+
+
+def tus_headers(session: Optional[UploadSession] = None) -> Dict[str, str]:
+    """Protocol headers for a response, with the session's offset and expiry"""
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    if session is not None:
+        headers["Upload-Offset"] = str(session.offset)
+        headers["Upload-Length"] = str(session.length)
+        if session.status == "active" and session.expires_at:
+            headers["Upload-Expires"] = format_datetime(session.expires_at.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+class LocalUploadBackend:
+    """Chunks are appended to uploads/partial/<id>.part and moved into place on completion"""
+    name = "local"
+
+    def partial_path(self, session: UploadSession) -> str:
+        return os.path.join("uploads", "partial", f"{session.id}.part")
+
+    def create(self, session: UploadSession):
+        os.makedirs(os.path.join("uploads", "partial"), exist_ok=True)
+        session.file_path = os.path.join("uploads", f"{session.kyc_case_id}_{session.doc_type}_{session.filename}")
+        open(self.partial_path(session), "wb").close()
+
+    def append(self, session: UploadSession, chunk: bytes):
+        path = self.partial_path(session)
+        with open(path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < session.offset:
+                raise HTTPException(status_code=409, detail="Partial upload is missing data - create a new upload")
+            # Bytes past the committed offset come from a request that failed before commit
+            f.truncate(session.offset)
+            f.seek(session.offset)
+            f.write(chunk)
+
+    def complete(self, session: UploadSession):
+        os.replace(self.partial_path(session), session.file_path)
+
+    def abort(self, session: UploadSession):
+        try:
+            os.remove(self.partial_path(session))
+        except FileNotFoundError:
+            pass
+
+
+class S3UploadBackend:
+    """
+    Chunks become multipart parts of the final object. Chunks smaller than the S3 minimum
+    part size are buffered in a pending object until enough bytes arrive for a part.
+    """
+    name = "s3"
+
+    def pending_key(self, session: UploadSession) -> str:
+        return f"uploads/partial/{session.id}.pending"
+
+    def create(self, session: UploadSession):
+        key = f"uploads/kyc/{session.kyc_case_id}/{session.doc_type}/{session.filename}"
+        extra = {"ContentType": session.content_type} if session.content_type else {}
+        response = storage.s3_client.create_multipart_upload(Bucket=storage.bucket_name, Key=key, **extra)
+        session.s3_upload_id = response["UploadId"]
+        session.file_path = f"s3://{storage.bucket_name}/{key}"
+
+    def _key(self, session: UploadSession) -> str:
+        return session.file_path.replace("s3://", "").split("/", 1)[1]
+
+    def append(self, session: UploadSession, chunk: bytes):
+        data = chunk
+        if session.pending_bytes:
+            # Only the committed prefix - a failed request may have written more
+            response = storage.s3_client.get_object(
+                Bucket=storage.bucket_name,
+                Key=self.pending_key(session),
+                Range=f"bytes=0-{session.pending_bytes - 1}"
+            )
+            data = response["Body"].read() + chunk
+
+        is_final = session.offset + len(chunk) == session.length
+        if len(data) >= S3_MIN_PART_SIZE or is_final:
+            # Part numbers come from committed state, so a retried chunk overwrites its own part
+            part_number = len(session.parts or []) + 1
+            response = storage.s3_client.upload_part(
+                Bucket=storage.bucket_name,
+                Key=self._key(session),
+                UploadId=session.s3_upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+            session.parts = (session.parts or []) + [{"PartNumber": part_number, "ETag": response["ETag"]}]
+            session.pending_bytes = 0
+        else:
+            storage.s3_client.put_object(Bucket=storage.bucket_name, Key=self.pending_key(session), Body=data)
+            session.pending_bytes = len(data)
+
+    def complete(self, session: UploadSession):
+        storage.s3_client.complete_multipart_upload(
+            Bucket=storage.bucket_name,
+            Key=self._key(session),
+            UploadId=session.s3_upload_id,
+            MultipartUpload={"Parts": session.parts}
+        )
+        storage.url_cache.invalidate(self._key(session))
+        self._delete_pending(session)
+
+    def abort(self, session: UploadSession):
+        try:
+            storage.s3_client.abort_multipart_upload(
+                Bucket=storage.bucket_name, Key=self._key(session), UploadId=session.s3_upload_id
+            )
+        except Exception as e:
+            print(f"⚠️  DEBUG: Aborting multipart upload {session.s3_upload_id} failed: {e}")
+        self._delete_pending(session)
+
+    def _delete_pending(self, session: UploadSession):
+        try:
+            storage.s3_client.delete_object(Bucket=storage.bucket_name, Key=self.pending_key(session))
+        except Exception as e:
+            print(f"⚠️  DEBUG: Deleting pending chunk of upload {session.id} failed: {e}")
+
+
+UPLOAD_BACKENDS = {"local": LocalUploadBackend(), "s3": S3UploadBackend()}
+
+
+def get_upload_backend(session: UploadSession):
+    return UPLOAD_BACKENDS[session.backend]
+
+
+def _expiry() -> datetime:
+    return datetime.utcnow() + timedelta(hours=get_settings().UPLOAD_SESSION_TTL_HOURS)
+
+
+def create_upload_session(db: Session, kyc_case_id: int, doc_type: str, filename: str,
+                          content_type: Optional[str], length: int) -> UploadSession:
+    """Start a resumable upload (commits)"""
+    if doc_type not in DOC_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown doc_type '{doc_type}'. Use one of: {', '.join(DOC_TYPES)}")
+    filename = os.path.basename(filename)
+    if filename in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        kyc_case_id=kyc_case_id,
+        doc_type=doc_type,
+        filename=filename,
+        content_type=content_type,
+        length=length,
+        offset=0,
+        parts=[],
+        pending_bytes=0,
+        backend="s3" if get_settings().ENV == "aws" else "local",
+        status="active",
+        expires_at=_expiry()
+    )
+    get_upload_backend(session).create(session)
+    db.add(session)
+    db.commit()
+    metrics.increment("uploads.resumable.created")
+    print(f"📤 DEBUG: Created {session.backend} upload session {session.id} for {session.length} bytes")
+    return session
+
+
+def get_upload_session(db: Session, upload_id: str, for_update: bool = False) -> UploadSession:
+    """Active or completed session, or 404 / 410"""
+    query = db.query(UploadSession).filter(UploadSession.id == upload_id)
+    if for_update:
+        # Serializes PATCHes of one upload across workers (a no-op on SQLite)
+        query = query.with_for_update()
+    session = query.first()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.status in ("aborted", "expired"):
+        raise HTTPException(status_code=410, detail=f"Upload {session.status}")
+    if session.status == "active" and session.expires_at and session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="Upload expired")
+    return session
+
+
+def append_chunk(db: Session, upload_id: str, offset: int, chunk: bytes) -> UploadSession:
+    """
+    Store one chunk at the session's offset (commits).
+    A mismatched offset is a 409 - the client must HEAD for the offset and resume from there.
+    """
+    session = get_upload_session(db, upload_id, for_update=True)
+    if session.status == "completed":
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    if offset != session.offset:
+        metrics.increment("uploads.resumable.offset_conflicts")
+        raise HTTPException(status_code=409, detail=f"Upload-Offset {offset} does not match current offset {session.offset}")
+    if session.offset + len(chunk) > session.length:
+        raise HTTPException(status_code=400, detail="Chunk exceeds Upload-Length")
+    if not chunk:
+        return session
+
+    get_upload_backend(session).append(session, chunk)
+    session.offset += len(chunk)
+    session.expires_at = _expiry()
+    metrics.increment("uploads.resumable.bytes", len(chunk))
+
+    if session.offset == session.length:
+        finalize_upload(db, session)
+    db.commit()
+    return session
+
+
+def finalize_upload(db: Session, session: UploadSession) -> KycDocument:
+    """Assemble the file and create or update the case's KycDocument (caller commits)"""
+    get_upload_backend(session).complete(session)
+    if is_renderable(session.file_path):
+        # The file may replace an earlier upload at the same location
+        invalidate_derivatives(session.file_path)
+    doc = db.query(KycDocument).filter(
+        KycDocument.kyc_case_id == session.kyc_case_id,
+        KycDocument.doc_type == session.doc_type
+    ).first()
+    if doc is None:
+        doc = KycDocument(kyc_case_id=session.kyc_case_id, doc_type=session.doc_type)
+        db.add(doc)
+    doc.file_path = session.file_path
+    doc.uploaded_at = datetime.utcnow()
+    touch_case(db, session.kyc_case_id)
+    db.flush()
+    session.kyc_document_id = doc.id
+    session.status = "completed"
+    metrics.increment("uploads.resumable.completed")
+    print(f"✅ DEBUG: Upload {session.id} completed - document {doc.id} at {doc.file_path}")
+    return doc
+
+
+def abort_upload(db: Session, session: UploadSession, status: str = "aborted"):
+    """Release stored chunks and close the session (commits)"""
+    get_upload_backend(session).abort(session)
+    session.status = status
+    db.commit()
+    metrics.increment(f"uploads.resumable.{status}")
+
+
+def collect_expired_uploads(db: Session) -> int:
+    """Abort active sessions past their expiry; returns how many were collected"""
+    expired = db.query(UploadSession).filter(
+        UploadSession.status == "active",
+        UploadSession.expires_at < datetime.utcnow()
+    ).all()
+    for session in expired:
+        try:
+            abort_upload(db, session, status="expired")
+        except Exception as e:
+            db.rollback()
+            print(f"❌ DEBUG: Collecting upload {session.id} failed: {e}")
+    return len(expired)
+
+
+class UploadGarbageCollector:
+    """Periodically aborts abandoned upload sessions and frees their chunks"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task = None
+
+    def collect(self) -> int:
+        db = get_session_local()()
+        try:
+            return collect_expired_uploads(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                collected = await run_in_threadpool(self.collect)
+                if collected:
+                    print(f"🧹 Collected {collected} expired upload sessions")
+            except Exception as e:
+                print(f"❌ Upload garbage collection failed: {e}")
+
+    def start(self):
+        """Start collecting in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background collector"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_upload_gc = None
+
+
+def get_upload_gc() -> UploadGarbageCollector:
+    """Get or create the upload garbage collector"""
+    global _upload_gc
+    if _upload_gc is None:
+        _upload_gc = UploadGarbageCollector(get_settings().UPLOAD_GC_INTERVAL_SECONDS)
+    return _upload_gc
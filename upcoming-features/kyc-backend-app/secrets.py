@@ -1,8 +1,9 @@
-import boto3
 import json
 import os
-from botocore.exceptions import ClientError, NoCredentialsError
-from typing import Dict, Optional
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
 
 
 def get_secret() -> Dict[str, str]:
@@ -17,6 +18,10 @@ def get_secret() -> Dict[str, str]:
         print("⚠️  AWS credentials not found. Using direct PostgreSQL connection.")
         return get_direct_credentials()
 
+    # boto3 is imported here so loading this module stays cheap at worker start-up
+    import boto3
+    from botocore.exceptions import ClientError, NoCredentialsError
+
     # Create a Secrets Manager client
     try:
         session = boto3.session.Session()
@@ -62,6 +67,96 @@ def get_direct_credentials() -> Dict[str, str]:
     }
 
 
+class SecretsCache:
+    """
+    Cache the database secret with a TTL.
+    Expiry is jittered per process so workers that started together do not
+    all call Secrets Manager at the same moment.
+    """
+    REFRESH_MARGIN_SECONDS = 60
+    REFRESH_MARGIN_FRACTION = 0.1
+
+    def __init__(self, ttl_seconds: float, loader: Callable[[], Dict[str, str]] = None):
+        self.ttl_seconds = ttl_seconds
+        self.loader = loader or get_secret
+        self._secret: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _next_expiry(self) -> float:
+        return time.monotonic() + self.ttl_seconds * random.uniform(0.8, 1.0)
+
+    def get(self) -> Dict[str, str]:
+        """Get the cached secret, loading it if missing or expired"""
+        if self._secret is not None and time.monotonic() < self._expires_at:
+            return self._secret
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._secret is None or time.monotonic() >= self._expires_at:
+                self._secret = self.loader()
+                self._expires_at = self._next_expiry()
+            return self._secret
+
+    def refresh(self, previous: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Reload the secret now.
+        When previous is given and the cache already holds a different secret,
+        another thread refreshed it first and that value is returned instead.
+        """
+        with self._lock:
+            if previous is not None and self._secret is not None and self._secret != previous:
+                return self._secret
+            self._secret = self.loader()
+            self._expires_at = self._next_expiry()
+            return self._secret
+
+    def start_background_refresh(self):
+        """Refresh the secret in a daemon thread shortly before it expires"""
+        if self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="secrets-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_margin(self) -> float:
+        """How long before expiry the background refresh runs"""
+        return min(self.REFRESH_MARGIN_SECONDS, self.ttl_seconds * self.REFRESH_MARGIN_FRACTION)
+
+    def _refresh_loop(self):
+        while True:
+            # Refresh ahead of expiry, so requests keep being served from the cache
+            time.sleep(max(self._expires_at - self._refresh_margin() - time.monotonic(), 0))
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  Background secret refresh failed: {e}")
+                time.sleep(30)
+
+
+secrets_cache = SecretsCache(ttl_seconds=float(os.getenv('SECRETS_TTL_SECONDS', '900')))
+
+
+def build_database_url(secret: Dict[str, str]) -> str:
+    """
+    Construct a PostgreSQL URL from secret fields
+    """
+    username = secret.get('username', 'kycapp')
+    password = secret.get('password', '')
+    host = secret.get('host', 'database-1-instance-1.c3iikqyyi0uu.us-east-2.rds.amazonaws.com')
+    port = secret.get('port', '5432')
+    dbname = secret.get('dbname', 'kycdb')
+    return f"postgresql://{username}:{password}@{host}:{port}/{dbname}"
+
+
+def get_cached_database_url() -> str:
+    """
+    Construct DATABASE_URL from the cached secret
+    """
+    return build_database_url(secrets_cache.get())
+
+
 def get_database_url() -> str:
     """
     Construct DATABASE_URL - always use AWS PostgreSQL
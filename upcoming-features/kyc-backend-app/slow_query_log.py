@@ -0,0 +1,124 @@
+"""
+Slow query recorder.
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their duration and the
+types of their bound parameters - the values hold personal data and password hashes and
+are never stored or printed - and kept in a bounded ring buffer. On PostgreSQL the query
+plan is captured with EXPLAIN on a separate connection so the request's transaction is
+never touched.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import event
+
+from config import get_settings
+from metrics import metrics
+
+MAX_PARAMETERS_LENGTH = 500
+
+
+def describe_parameters(parameters, executemany: bool = False) -> str:
+    """Parameter types without their values, e.g. (str, int) or 25 rows of (str, int)"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else ()
+        return f"{len(parameters)} rows of {describe_parameters(first)}"
+    if isinstance(parameters, dict):
+        described = ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items())
+    elif isinstance(parameters, (list, tuple)):
+        described = ", ".join(type(value).__name__ for value in parameters)
+    else:
+        described = "" if parameters is None else type(parameters).__name__
+    return f"({described})"[:MAX_PARAMETERS_LENGTH]
+
+
+EXPLAINABLE_PREFIXES = ("select", "update", "delete", "insert", "with")
+
+
+class SlowQueryLog:
+    """Ring buffer of the most recent slow statements"""
+
+    def __init__(self, threshold_ms: float, max_entries: int):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        # A single worker keeps EXPLAIN traffic to at most one extra connection
+        self._explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def install(self, engine):
+        """Register cursor events on the engine"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start_times = conn.info.get("slow_query_start_time")
+            if not start_times:
+                return
+            duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+            if duration_ms < self.threshold_ms or conn.info.get("slow_query_explain"):
+                return
+            self.record(engine, statement, parameters, duration_ms, executemany)
+
+    def record(self, engine, statement: str, parameters, duration_ms: float, executemany: bool = False):
+        """Store a slow statement and schedule plan capture"""
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "statement": statement,
+            "parameters": describe_parameters(parameters, executemany),
+            "plan": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+        metrics.increment("db.slow_queries")
+        print(f"🐢 SLOW QUERY ({entry['duration_ms']}ms): {statement} -- params: {entry['parameters']}")
+
+        if (engine.dialect.name == "postgresql" and not executemany
+                and statement.lstrip().lower().startswith(EXPLAINABLE_PREFIXES)):
+            self._explain_executor.submit(self._capture_plan, engine, entry, statement, parameters)
+
+    def _capture_plan(self, engine, entry: dict, statement: str, parameters):
+        """Run EXPLAIN (without ANALYZE, so nothing is executed) for a slow statement"""
+        try:
+            with engine.connect() as conn:
+                conn.info["slow_query_explain"] = True
+                try:
+                    rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters or ()).fetchall()
+                finally:
+                    conn.info.pop("slow_query_explain", None)
+                    conn.rollback()
+            entry["plan"] = "\n".join(row[0] for row in rows)
+        except Exception as e:
+            entry["plan"] = f"EXPLAIN failed: {e}"
+
+    def entries(self) -> List[dict]:
+        """Return recorded slow statements, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        """Drop all recorded statements"""
+        with self._lock:
+            self._entries.clear()
+
+
+_slow_query_log = None
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Get or create the slow query log"""
+    global _slow_query_log
+    if _slow_query_log is None:
+        settings = get_settings()
+        _slow_query_log = SlowQueryLog(
+            threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+            max_entries=settings.SLOW_QUERY_LOG_SIZE
+        )
+    return _slow_query_log
@@ -1,25 +1,115 @@
-import boto3
-from botocore.exceptions import NoCredentialsError
 from fastapi import UploadFile, HTTPException
 from config import get_settings
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from metrics import metrics
 
 settings = get_settings()
 
+UPLOAD_DIR = "uploads"
+
+
+def path_within_uploads(path: str) -> Optional[str]:
+    """
+    path relative to uploads/ when it resolves (symlinks included) inside it, else None -
+    a caller-supplied ../ must not reach files outside the upload directory
+    """
+    root = os.path.realpath(UPLOAD_DIR)
+    resolved = os.path.realpath(path)
+    if resolved == root or os.path.commonpath([root, resolved]) != root:
+        return None
+    return os.path.relpath(resolved, root)
+
+
+def is_safe_key(key: str) -> bool:
+    """Whether an S3 key is non-empty and has no '..' segment"""
+    return bool(key) and ".." not in key.split("/")
+
+class PresignedUrlCache:
+    """
+    LRU cache of presigned URLs keyed by S3 key.
+    A URL is reissued once less than refresh_margin_seconds of its lifetime remain, so
+    every URL handed out is still valid for at least that long.
+    """
+
+    def __init__(self, max_entries: int, expires_seconds: int, refresh_margin_seconds: int):
+        self.max_entries = max_entries
+        self.expires_seconds = expires_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._entries = OrderedDict()  # s3_key -> (url, monotonic expiry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, s3_key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(s3_key)
+            if entry is not None and time.monotonic() < entry[1] - self.refresh_margin_seconds:
+                self._entries.move_to_end(s3_key)
+                self.hits += 1
+                metrics.increment("storage.presign.hits")
+                return entry[0]
+            self.misses += 1
+            metrics.increment("storage.presign.misses")
+            return None
+
+    def put(self, s3_key: str, url: str, signed_at: float):
+        with self._lock:
+            self._entries[s3_key] = (url, signed_at + self.expires_seconds)
+            self._entries.move_to_end(s3_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, s3_key: str):
+        with self._lock:
+            self._entries.pop(s3_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
 class S3Storage:
     def __init__(self):
-        # Initialize S3 client with session token for temporary credentials
-        # Use us-west-2 region specifically for S3 operations
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name='us-west-2'  # S3 bucket is in us-west-2
-        )
+        # The S3 client is created on first use - importing boto3 and building
+        # the client dominates worker start-up time otherwise
+        self._s3_client = None
+        self._client_lock = threading.Lock()
         # Use the specific bucket name
         self.bucket_name = "dbdtcckycbucket"
+        self.url_cache = PresignedUrlCache(
+            max_entries=settings.PRESIGNED_URL_CACHE_SIZE,
+            expires_seconds=settings.PRESIGNED_URL_EXPIRES_SECONDS,
+            refresh_margin_seconds=settings.PRESIGNED_URL_REFRESH_MARGIN_SECONDS
+        )
+
+    @property
+    def s3_client(self):
+        """Get or create the S3 client"""
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    import boto3
+                    # Initialize S3 client with session token for temporary credentials
+                    # Use us-west-2 region specifically for S3 operations
+                    self._s3_client = boto3.client(
+                        's3',
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                        aws_session_token=settings.AWS_SESSION_TOKEN,
+                        region_name='us-west-2'  # S3 bucket is in us-west-2
+                    )
+        return self._s3_client
 
     async def upload_file(self, file: UploadFile, kyc_case_id: int, doc_type: str) -> str:
         """Upload a file to S3 and return the S3 URL"""
@@ -55,10 +145,11 @@ class S3Storage:
             print(f"🔗 DEBUG: Generated S3 URL: {s3_url}")
             return s3_url
             
-        except NoCredentialsError as e:
-            print(f"❌ DEBUG: AWS credentials not found: {e}")
-            raise HTTPException(status_code=500, detail="AWS credentials not found")
         except Exception as e:
+            from botocore.exceptions import NoCredentialsError
+            if isinstance(e, NoCredentialsError):
+                print(f"❌ DEBUG: AWS credentials not found: {e}")
+                raise HTTPException(status_code=500, detail="AWS credentials not found")
             print(f"❌ DEBUG: S3 upload failed: {e}")
             print(f"❌ DEBUG: Exception type: {type(e).__name__}")
             import traceback
@@ -98,8 +189,37 @@ class S3Storage:
             print(f"❌ DEBUG: Full traceback: {traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"Local file save failed: {str(e)}")
 
+    def upload_bytes(self, content: bytes, kyc_case_id: int, doc_type: str, filename: str,
+                     content_type: Optional[str] = None) -> str:
+        """Store already-read file content and return its S3 URL or local path"""
+        if settings.ENV == "local":
+            upload_dir = "uploads"
+            os.makedirs(upload_dir, exist_ok=True)
+            file_path = os.path.join(upload_dir, f"{kyc_case_id}_{doc_type}_{filename}")
+            with open(file_path, "wb") as buffer:
+                buffer.write(content)
+            print(f"✅ DEBUG: File saved locally: {file_path} ({len(content)} bytes)")
+            return file_path
+
+        s3_key = f"uploads/kyc/{kyc_case_id}/{doc_type}/{filename}"
+        extra = {"ContentType": content_type} if content_type else {}
+        try:
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=content, **extra)
+            # A fresh URL for replaced content keeps browsers from showing their cached copy
+            self.url_cache.invalidate(s3_key)
+        except Exception as e:
+            from botocore.exceptions import NoCredentialsError
+            if isinstance(e, NoCredentialsError):
+                print(f"❌ DEBUG: AWS credentials not found: {e}")
+                raise HTTPException(status_code=500, detail="AWS credentials not found")
+            print(f"❌ DEBUG: S3 upload failed: {e}")
+            raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+        s3_url = f"s3://{self.bucket_name}/{s3_key}"
+        print(f"✅ DEBUG: Uploaded {len(content)} bytes to {s3_url}")
+        return s3_url
+
     def get_file_url(self, s3_key: str) -> Optional[str]:
-        """Generate a pre-signed URL for file download"""
+        """Get a pre-signed URL for file download - cached until it nears expiry"""
         if settings.ENV == "local":
             return None
             
@@ -107,19 +227,86 @@ class S3Storage:
             # If the s3_key doesn't start with uploads/, add it
             if not s3_key.startswith("uploads/"):
                 s3_key = f"uploads/{s3_key}"
-                
+
+            url = self.url_cache.get(s3_key)
+            if url is not None:
+                return url
+
+            signed_at = time.monotonic()
             url = self.s3_client.generate_presigned_url(
                 'get_object',
                 Params={
                     'Bucket': self.bucket_name,
                     'Key': s3_key
                 },
-                ExpiresIn=3600  # URL expires in 1 hour
+                ExpiresIn=settings.PRESIGNED_URL_EXPIRES_SECONDS
             )
+            self.url_cache.put(s3_key, url, signed_at)
             return url
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to generate download URL: {str(e)}")
 
+    def is_own_s3_url(self, s3_url: str) -> bool:
+        """Whether an s3:// URL names a safe key in this app's bucket - not any bucket the role can read"""
+        bucket, _, key = s3_url[len("s3://"):].partition("/")
+        return bucket == self.bucket_name and is_safe_key(key)
+
+    def get_file_urls(self, s3_keys) -> Dict[str, Optional[str]]:
+        """Pre-signed URLs for many keys in one call - signing is local, so this is one pass over the cache"""
+        return {s3_key: self.get_file_url(s3_key) for s3_key in s3_keys}
+
+    def read_file(self, file_path: str) -> bytes:
+        """Read a stored file - an s3:// URL or a local path"""
+        if file_path.startswith("s3://"):
+            bucket, key = file_path.replace("s3://", "").split("/", 1)
+            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            return response['Body'].read()
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def download_to_path(self, file_path: str, destination: str):
+        """Stream a stored s3:// file to a local path without holding it in memory"""
+        bucket, key = file_path.replace("s3://", "").split("/", 1)
+        self.s3_client.download_file(bucket, key, destination)
+
+    def path_exists(self, file_path: str) -> bool:
+        """Whether a stored file exists - an s3:// URL or a local path"""
+        if file_path.startswith("s3://"):
+            bucket, key = file_path.replace("s3://", "").split("/", 1)
+            try:
+                self.s3_client.head_object(Bucket=bucket, Key=key)
+                return True
+            except Exception as e:
+                from botocore.exceptions import ClientError
+                if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return False
+                raise
+        return os.path.exists(file_path)
+
+    def write_path(self, file_path: str, content: bytes, content_type: Optional[str] = None):
+        """Write content to an s3:// URL or a local path"""
+        if file_path.startswith("s3://"):
+            bucket, key = file_path.replace("s3://", "").split("/", 1)
+            extra = {"ContentType": content_type} if content_type else {}
+            self.s3_client.put_object(Bucket=bucket, Key=key, Body=content, **extra)
+            self.url_cache.invalidate(key)
+            return
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+    def delete_path(self, file_path: str):
+        """Delete a stored file if it exists - an s3:// URL or a local path"""
+        if file_path.startswith("s3://"):
+            bucket, key = file_path.replace("s3://", "").split("/", 1)
+            self.s3_client.delete_object(Bucket=bucket, Key=key)
+            self.url_cache.invalidate(key)
+            return
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
     def test_connection(self):
         """Test S3 connection"""
         try:
@@ -0,0 +1,85 @@
+"""
+Admission control of admission.py - queueing, 429 with Retry-After, shared budgets.
+
+Run with: python -m pytest test_admission.py
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import admission
+from admission import AdmissionLimiter, admit
+
+
+def limiter(limit: int = 1, max_queue: int = 1, queue_timeout: float = 1.0) -> AdmissionLimiter:
+    return AdmissionLimiter("test", limit=limit, min_limit=1, max_limit=limit, max_queue=max_queue,
+                            queue_timeout=queue_timeout, tolerance=2.0)
+
+
+def test_queued_request_gets_the_released_slot():
+    async def scenario():
+        test_limiter = limiter()
+        await test_limiter.acquire()
+        waiter = asyncio.ensure_future(test_limiter.acquire())
+        await asyncio.sleep(0)
+        assert test_limiter.stats()["queued"] == 1
+        test_limiter.release(0.01)
+        await waiter
+        return test_limiter.stats()
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 1 and stats["queued"] == 0
+
+
+def test_full_queue_is_refused_with_retry_after():
+    async def scenario():
+        test_limiter = limiter(max_queue=1)
+        await test_limiter.acquire()
+        waiter = asyncio.ensure_future(test_limiter.acquire())
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HTTPException) as raised:
+                await test_limiter.acquire()
+            return raised.value
+        finally:
+            waiter.cancel()
+    refused = asyncio.run(scenario())
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+
+
+def test_queue_timeout_is_refused_and_leaves_the_queue():
+    async def scenario():
+        test_limiter = limiter(queue_timeout=0.05)
+        await test_limiter.acquire()
+        with pytest.raises(HTTPException) as raised:
+            await test_limiter.acquire()
+        return raised.value, test_limiter.stats()
+    refused, stats = asyncio.run(scenario())
+    assert refused.status_code == 429 and "Retry-After" in refused.headers
+    assert stats["queued"] == 0 and stats["in_flight"] == 1
+
+
+def test_retry_after_grows_with_the_queue():
+    test_limiter = limiter(limit=2, max_queue=10)
+    test_limiter.latency = 3.0
+    assert test_limiter.retry_after() == 2
+    test_limiter._waiters.extend([None] * 5)
+    assert test_limiter.retry_after() == 9
+
+
+def test_upload_refused_by_the_db_group_gives_back_its_upload_slot(monkeypatch):
+    upload = limiter(limit=2)
+    db = limiter(limit=1, queue_timeout=0.05)
+    monkeypatch.setattr(admission, "_limiters", {"upload": upload, "db": db})
+    monkeypatch.setattr(admission.get_settings(), "ADMISSION_ENABLED", True)
+
+    async def scenario():
+        await db.acquire()
+        with pytest.raises(HTTPException) as raised:
+            await admit("upload")().__anext__()
+        return raised.value
+    refused = asyncio.run(scenario())
+    assert refused.status_code == 429
+    assert upload.in_flight == 0 and db.in_flight == 1
@@ -0,0 +1,76 @@
+"""
+Case versions and conditional GETs of case_version.py, /kyc/progress and /kyc/screen-data.
+
+Run with: python -m pytest test_case_version.py
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from case_version import case_etag, not_modified, touch_case
+from database import get_session_local, init_db
+from models import KycCase, KycDocument
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = get_session_local()()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def case_id(db):
+    case = KycCase(status="in_progress")
+    db.add(case)
+    db.commit()
+    return case.id
+
+
+def test_case_etag_changes_with_the_case(db, case_id):
+    assert case_etag(db, case_id + 1000) is None
+    first = case_etag(db, case_id)
+    assert first.startswith('W/"') and first == case_etag(db, case_id)
+
+    touch_case(db, case_id)
+    db.commit()
+    touched = case_etag(db, case_id)
+    assert touched != first
+
+    # A new document changes the version even without touching the case
+    db.add(KycDocument(kyc_case_id=case_id, doc_type="pancard", file_path="uploads/pan.pdf"))
+    db.commit()
+    assert case_etag(db, case_id) != touched
+
+
+def test_not_modified_compares_weakly(db, case_id):
+    etag = case_etag(db, case_id)
+    assert not_modified(etag, etag, "test")
+    assert not_modified(etag[2:], etag, "test")
+    assert not not_modified('W/"other"', etag, "test")
+    assert not not_modified(None, etag, "test")
+    assert not not_modified(etag, None, "test")
+
+
+@pytest.mark.parametrize("endpoint", ["progress", "screen-data"])
+def test_poll_with_current_etag_is_answered_304(db, case_id, endpoint):
+    client = TestClient(main.app)
+    path = f"/kyc/{endpoint}/{case_id}"
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    unchanged = client.get(path, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+
+    touch_case(db, case_id)
+    db.commit()
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
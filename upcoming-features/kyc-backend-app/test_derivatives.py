@@ -0,0 +1,27 @@
+"""
+Derivative locations of derivatives.py.
+
+Run with: python -m pytest test_derivatives.py
+"""
+
+import asyncio
+
+from derivatives import derivative_path, get_or_create_derivative
+
+
+def test_derivative_path_mirrors_the_original(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    assert derivative_path("uploads/1_pancard_pan.pdf", "preview") == "uploads/derivatives/preview/1_pancard_pan.pdf.jpg"
+    assert derivative_path("s3://bucket/uploads/kyc/1/pancard/pan.pdf", "thumb") == \
+        "s3://bucket/uploads/derivatives/thumb/kyc/1/pancard/pan.pdf.jpg"
+
+
+def test_no_derivative_outside_uploads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "secret.png").write_bytes(b"not an image")
+    for path in ["uploads/../secret.png", str(tmp_path / "secret.png"), "s3://bucket/uploads/../secret.png"]:
+        assert derivative_path(path, "preview") is None
+        assert asyncio.run(get_or_create_derivative(path, "preview")) is None
+    assert not (tmp_path / "uploads" / "derivatives").exists()
@@ -0,0 +1,83 @@
+"""
+Pool and timeout behaviour of extractors.py.
+
+Run with: python -m pytest test_extractors.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import extractors
+from extractors import Extraction, Extractor, check_backend, configure_executor, extract_document, extract_documents
+
+
+class SleepingExtractor(Extractor):
+    """Takes `seconds` per document, with a timeout of half a second"""
+    name = "sleeping"
+    version = "1"
+    timeout_seconds = 0.5
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def extract(self, file_path, context):
+        time.sleep(self.seconds)
+        return Extraction({"file": file_path}, self.name, self.version)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A fresh two-thread extraction pool, shut down afterwards"""
+    monkeypatch.setattr(extractors, "_executor", None)
+    monkeypatch.setattr(extractors, "_executor_workers", None)
+    configure_executor(2)
+    yield
+    extractors.get_executor().shutdown(wait=True)
+
+
+def test_queued_extractions_do_not_time_out(pool):
+    # Eight documents on two threads queue for about 1s - longer than the timeout - but each runs 0.2s
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        results = list(callers.map(
+            lambda index: extract_document(SleepingExtractor(0.2), f"doc{index}", {}), range(8)
+        ))
+    assert [result.fields["file"] for result in results] == [f"doc{index}" for index in range(8)]
+
+
+def test_running_extraction_times_out(pool):
+    with pytest.raises(TimeoutError):
+        extract_document(SleepingExtractor(1), "slow", {})
+
+
+def test_pool_size_is_fixed_once_running(pool):
+    extractors.get_executor()
+    with pytest.raises(RuntimeError):
+        configure_executor(4)
+
+
+class Document:
+    def __init__(self, doc_id: int, doc_type: str):
+        self.id = doc_id
+        self.doc_type = doc_type
+        self.file_path = f"uploads/{doc_id}_{doc_type}.jpg"
+
+
+def test_case_documents_are_extracted_concurrently(pool, monkeypatch):
+    monkeypatch.setitem(extractors._registry, "sleeping", {
+        "pancard": SleepingExtractor(0.3), "passport": SleepingExtractor(0.3), "aadhar_front": SleepingExtractor(1)
+    })
+    monkeypatch.setattr(extractors.get_settings(), "EXTRACTOR_BACKEND", "sleeping")
+    documents = [Document(1, "pancard"), Document(2, "passport"), Document(3, "video"), Document(4, "aadhar_front")]
+    started = time.perf_counter()
+    results = extract_documents(documents, {})
+    # aadhar_front timed out and is left out; one after the other the three would take 1.1s
+    assert sorted(results) == [1, 2]
+    assert time.perf_counter() - started < 1.0
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        check_backend("textrct")
+    assert check_backend("mock") == "mock"
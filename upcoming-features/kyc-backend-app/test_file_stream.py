@@ -0,0 +1,136 @@
+"""
+Range, ETag and path checks of /files/stream and file_stream.py.
+
+Run with: python -m pytest test_file_stream.py
+"""
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from file_stream import etag_matches, parse_range, stream_local_file, stream_s3_object
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0", "bytes=50-10"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as raised:
+        parse_range(header, 1000)
+    assert raised.value.status_code == 416
+    assert raised.value.headers["Content-Range"] == "bytes */1000"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ('"xyz"', False),
+    ("*", True),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """A local uploads/ directory with one document, and a secret file next to it"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.get_settings(), "ENV", "local")
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "doc.txt").write_bytes(b"0123456789")
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    return tmp_path
+
+
+@pytest.fixture
+def client(uploads):
+    return TestClient(main.app)
+
+
+def test_stream_range_and_not_modified(client):
+    response = client.get("/files/stream/doc.txt", headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.content == b"2345"
+    assert response.headers["Content-Range"] == "bytes 2-5/10"
+
+    etag = response.headers["ETag"]
+    response = client.get("/files/stream/doc.txt", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_stale_if_range_sends_whole_file(client):
+    response = client.get("/files/stream/doc.txt", headers={"Range": "bytes=2-5", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+
+
+@pytest.mark.parametrize("path", ["..%2Fsecret.txt", "%2E%2E/secret.txt", "..%2F..%2Fetc%2Fpasswd"])
+def test_stream_rejects_traversal(client, path):
+    response = client.get(f"/files/stream/{path}")
+    assert response.status_code == 404
+    assert b"secret" not in response.content
+
+
+def test_resolve_rejects_absolute_and_symlinked_paths(uploads):
+    (uploads / "uploads" / "link.txt").symlink_to(uploads / "secret.txt")
+    for path in [str(uploads / "secret.txt"), "link.txt"]:
+        with pytest.raises(HTTPException) as raised:
+            main.resolve_file_source(path)
+        assert raised.value.status_code == 404
+
+
+def test_resolve_rejects_foreign_buckets_and_parent_keys(monkeypatch):
+    bucket = main.storage.bucket_name
+    assert main.resolve_file_source(f"s3://{bucket}/uploads/kyc/1/pan.pdf") == f"s3://{bucket}/uploads/kyc/1/pan.pdf"
+    for path in ["s3://other-bucket/uploads/kyc/1/pan.pdf", f"s3://{bucket}/uploads/../private/key"]:
+        with pytest.raises(HTTPException) as raised:
+            main.resolve_file_source(path)
+        assert raised.value.status_code == 404
+
+    monkeypatch.setattr(main.get_settings(), "ENV", "aws")
+    with pytest.raises(HTTPException):
+        main.resolve_file_source("kyc/../../private/key")
+
+
+def test_accel_redirect_uses_checked_path(uploads, monkeypatch):
+    monkeypatch.setattr(main.get_settings(), "FILE_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+    response = stream_local_file("uploads/doc.txt", None, None, None)
+    assert response.headers["X-Accel-Redirect"] == "/protected-uploads/doc.txt"
+    with pytest.raises(HTTPException) as raised:
+        stream_local_file("uploads/../secret.txt", None, None, None)
+    assert raised.value.status_code == 404
+
+
+class UnsatisfiableS3:
+    """S3 client stub whose ranged get answers InvalidRange like S3 does"""
+
+    def get_object(self, **params):
+        from botocore.exceptions import ClientError
+        raise ClientError({
+            "Error": {"Code": "InvalidRange", "ActualObjectSize": "1000"},
+            "ResponseMetadata": {"HTTPStatusCode": 416},
+        }, "GetObject")
+
+
+def test_s3_unsatisfiable_range_reports_size(monkeypatch):
+    monkeypatch.setattr(main.storage, "_s3_client", UnsatisfiableS3())
+    with pytest.raises(HTTPException) as raised:
+        stream_s3_object(f"s3://{main.storage.bucket_name}/uploads/video.webm", "bytes=5000-", None, None)
+    assert raised.value.status_code == 416
+    assert raised.value.headers["Content-Range"] == "bytes */1000"
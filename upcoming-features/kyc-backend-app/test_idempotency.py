@@ -0,0 +1,143 @@
+"""
+Idempotency-Key handling of idempotency.py and POST /kyc/upload.
+
+Run with: python -m pytest test_idempotency.py
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from database import get_session_local, init_db
+from idempotency import run_idempotent
+from models import KycCase
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+
+def run(*requests):
+    """Run idempotent requests concurrently, each on its own session like real requests"""
+    async def all_requests():
+        sessions = [get_session_local()() for _ in requests]
+        try:
+            return await asyncio.gather(
+                *(run_idempotent(db, *request) for db, request in zip(sessions, requests)),
+                return_exceptions=True
+            )
+        finally:
+            for db in sessions:
+                db.close()
+    return asyncio.run(all_requests())
+
+
+def counting_work(calls: list, seconds: float = 0, body: dict = None):
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(seconds)
+        return body or {"call": len(calls)}
+    return work
+
+
+def test_retry_replays_the_first_response():
+    calls = []
+    first, = run(("test/replay", "key-1", "fp", counting_work(calls)))
+    second, = run(("test/replay", "key-1", "fp", counting_work(calls)))
+    assert first == {"call": 1}
+    assert second.status_code == 200
+    assert second.headers["Idempotency-Replayed"] == "true"
+    assert second.body == b'{"call":1}'
+    assert len(calls) == 1
+
+
+def test_key_reused_for_another_request_is_refused():
+    calls = []
+    run(("test/conflict", "key-1", "fp-a", counting_work(calls)))
+    conflict, = run(("test/conflict", "key-1", "fp-b", counting_work(calls)))
+    assert isinstance(conflict, HTTPException) and conflict.status_code == 422
+    assert len(calls) == 1
+
+
+def test_concurrent_retry_waits_for_the_first():
+    calls = []
+    first, second = run(
+        ("test/concurrent", "key-1", "fp", counting_work(calls, seconds=0.3)),
+        ("test/concurrent", "key-1", "fp", counting_work(calls, seconds=0.3)),
+    )
+    assert len(calls) == 1
+    responses = [first, second]
+    replayed = [r for r in responses if not isinstance(r, dict)]
+    assert len(replayed) == 1 and replayed[0].headers["Idempotency-Replayed"] == "true"
+
+
+def test_failed_request_releases_its_key():
+    async def fail():
+        raise RuntimeError("boom")
+    failed, = run(("test/release", "key-1", "fp", fail))
+    assert isinstance(failed, RuntimeError)
+    calls = []
+    retried, = run(("test/release", "key-1", "fp", counting_work(calls)))
+    assert retried == {"call": 1}
+
+
+def test_stale_lock_takeover_on_the_same_worker(monkeypatch):
+    # Every in-progress key is stale at once, so the second request takes over the first one's key
+    monkeypatch.setattr(main.get_settings(), "IDEMPOTENCY_LOCK_SECONDS", -1)
+
+    async def delayed(request, seconds):
+        await asyncio.sleep(seconds)
+        return await request
+
+    async def both():
+        first_db, second_db = get_session_local()(), get_session_local()()
+        try:
+            return await asyncio.gather(
+                run_idempotent(first_db, "test/stale", "key-1", "fp", counting_work([], 0.2, {"who": "first"})),
+                delayed(run_idempotent(second_db, "test/stale", "key-1", "fp",
+                                       counting_work([], 0.4, {"who": "second"})), 0.05),
+                return_exceptions=True
+            )
+        finally:
+            first_db.close()
+            second_db.close()
+
+    first, second = asyncio.run(both())
+    assert first == {"who": "first"}
+    assert second == {"who": "second"}
+
+
+@pytest.fixture
+def upload_case(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.get_settings(), "ENV", "local")
+    db = get_session_local()()
+    try:
+        case = KycCase(status="in_progress")
+        db.add(case)
+        db.commit()
+        return case.id
+    finally:
+        db.close()
+
+
+def test_upload_key_with_different_content_is_refused(upload_case):
+    client = TestClient(main.app)
+
+    def upload(content: bytes):
+        return client.post(
+            "/kyc/upload",
+            data={"kyc_case_id": str(upload_case), "doc_type": "pancard"},
+            files={"file": ("pan.pdf", content, "application/pdf")},
+            headers={"Idempotency-Key": f"upload-{upload_case}"}
+        )
+
+    assert upload(b"%PDF-first").status_code == 200
+    replayed = upload(b"%PDF-first")
+    assert replayed.headers.get("Idempotency-Replayed") == "true"
+    # Same name and size, other bytes
+    assert upload(b"%PDF-other").status_code == 422
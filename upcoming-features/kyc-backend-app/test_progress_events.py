@@ -0,0 +1,108 @@
+"""
+Commit-bound publishing and streaming of progress_events.py (local backend).
+
+Run with: python -m pytest test_progress_events.py
+"""
+
+import asyncio
+
+import pytest
+
+import progress_events
+from case_version import touch_case
+from database import get_session_local, init_db
+from models import KycCase
+from progress_events import LocalProgressBroker, stream_progress
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    fresh = LocalProgressBroker()
+    monkeypatch.setattr(progress_events, "_broker", fresh)
+    return fresh
+
+
+@pytest.fixture
+def case_id():
+    init_db()
+    db = get_session_local()()
+    try:
+        case = KycCase(status="in_progress")
+        db.add(case)
+        db.commit()
+        return case.id
+    finally:
+        db.close()
+
+
+def change_case(case_id: int, commit: bool):
+    db = get_session_local()()
+    try:
+        touch_case(db, case_id)
+        if commit:
+            db.commit()
+        else:
+            db.rollback()
+    finally:
+        db.close()
+
+
+async def notified(changed: asyncio.Event) -> bool:
+    try:
+        await asyncio.wait_for(changed.wait(), 0.2)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def test_change_is_published_on_commit(broker, case_id):
+    async def scenario():
+        changed = broker.subscribe(case_id)
+        other = broker.subscribe(case_id + 1000)
+        await asyncio.to_thread(change_case, case_id, True)
+        return await notified(changed), await notified(other)
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_change_is_dropped_on_rollback(broker, case_id):
+    async def scenario():
+        changed = broker.subscribe(case_id)
+        await asyncio.to_thread(change_case, case_id, False)
+        return await notified(changed)
+    assert asyncio.run(scenario()) is False
+
+
+def test_stream_sends_progress_again_after_a_change(broker, monkeypatch):
+    monkeypatch.setattr(progress_events.get_settings(), "PROGRESS_EVENTS_HEARTBEAT_SECONDS", 5)
+    current = {"version": "v1"}
+
+    def load(case_id, known_version):
+        version = current["version"]
+        return version, None if version == known_version else {"version": version}
+
+    async def scenario():
+        stream = stream_progress(7, load)
+        messages = [await stream.__anext__(), await stream.__anext__()]
+        current["version"] = "v2"
+        broker.publish([7])
+        messages.append(await stream.__anext__())
+        await stream.aclose()
+        return messages, broker.stats()
+
+    messages, stats = asyncio.run(scenario())
+    assert messages[0].startswith("retry:")
+    assert messages[1].startswith("id: v1\nevent: progress")
+    assert messages[2].startswith("id: v2\nevent: progress")
+    assert stats["streams"] == 0
+
+
+def test_reconnect_with_current_version_sends_nothing_until_a_change(broker, monkeypatch):
+    monkeypatch.setattr(progress_events.get_settings(), "PROGRESS_EVENTS_HEARTBEAT_SECONDS", 0.05)
+
+    async def scenario():
+        stream = stream_progress(7, lambda case_id, known: ("v1", None if known == "v1" else {}), "v1")
+        messages = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return messages
+
+    assert asyncio.run(scenario())[1] == ": keepalive\n\n"
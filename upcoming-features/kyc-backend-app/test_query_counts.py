@@ -0,0 +1,119 @@
+"""
+Query-count regression checks for the read endpoints that had N+1 queries.
+Each endpoint is called against a case or customer list of growing size; the number of
+SQL statements must stay under a fixed cap and must not grow with the data.
+
+Run with: python -m pytest test_query_counts.py
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import get_session_local, init_db
+from models import ExtractionResult, KycCase, KycDetail, KycDocument, KycStatus, User
+from query_counter import assert_max_queries, count_queries
+
+DOC_TYPES = ["aadhar_front", "aadhar_back", "pancard", "passport", "photo", "selfie"]
+
+# Statements each endpoint may run, whatever the size of the data
+MAX_QUERIES = {
+    "customers": 1,
+    "auto-details": 3,
+    "screen-data": 6,
+}
+
+
+def seed_customer(db, index: int, documents: int) -> int:
+    """A registered customer with a case, details, status and extracted documents"""
+    user = User(email=f"customer{index}@example.com", phone=f"+91{index:010d}", password_hash="x")
+    db.add(user)
+    db.flush()
+    case = KycCase(user_id=user.id, status="submitted")
+    db.add(case)
+    db.flush()
+    db.add(KycDetail(kyc_case_id=case.id, user_id=user.id, name=f"Customer {index}", email=user.email))
+    db.add(KycStatus(user_id=user.id, status="submitted", kyc_id=str(case.id)))
+    for doc_index in range(documents):
+        doc_type = DOC_TYPES[doc_index % len(DOC_TYPES)]
+        doc = KycDocument(kyc_case_id=case.id, doc_type=doc_type, file_path=f"uploads/{case.id}_{doc_index}.jpg")
+        db.add(doc)
+        db.flush()
+        db.add(ExtractionResult(
+            kyc_document_id=doc.id, kyc_case_id=case.id, doc_type=doc_type,
+            fields={"name": f"Customer {index}"}, extractor="mock", extractor_version="1"
+        ))
+    db.commit()
+    return case.id
+
+
+def seed_unregistered_case(db, documents: int) -> int:
+    """A case without KycDetail - auto-details and screen-data merge its extractions"""
+    case = KycCase(status="in_progress")
+    db.add(case)
+    db.flush()
+    for doc_index in range(documents):
+        doc_type = DOC_TYPES[doc_index % len(DOC_TYPES)]
+        doc = KycDocument(kyc_case_id=case.id, doc_type=doc_type, file_path=f"uploads/{case.id}_{doc_index}.jpg")
+        db.add(doc)
+        db.flush()
+        db.add(ExtractionResult(
+            kyc_document_id=doc.id, kyc_case_id=case.id, doc_type=doc_type,
+            fields={"address": f"Address {doc_index}"}, extractor="mock", extractor_version="1"
+        ))
+    db.commit()
+    return case.id
+
+
+@pytest.fixture(scope="module")
+def client():
+    main.get_settings().ENV = "local"
+    init_db()
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def cases(client):
+    db = get_session_local()()
+    try:
+        small = seed_unregistered_case(db, documents=1)
+        large = seed_unregistered_case(db, documents=12)
+        registered = seed_customer(db, 0, documents=6)
+        return {"small": small, "large": large, "registered": registered}
+    finally:
+        db.close()
+
+
+def queries_for(client, path: str) -> int:
+    with count_queries() as stats:
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+    return stats.count
+
+
+def test_customers_query_count_does_not_grow(client, cases):
+    few = queries_for(client, "/customers")
+    db = get_session_local()()
+    try:
+        for index in range(1, 30):
+            seed_customer(db, index, documents=2)
+    finally:
+        db.close()
+    with assert_max_queries(MAX_QUERIES["customers"]):
+        many = queries_for(client, "/customers")
+    assert many == few
+
+
+@pytest.mark.parametrize("endpoint", ["auto-details", "screen-data"])
+def test_case_query_count_does_not_grow(client, cases, endpoint):
+    small = queries_for(client, f"/kyc/{endpoint}/{cases['small']}")
+    with assert_max_queries(MAX_QUERIES[endpoint]):
+        large = queries_for(client, f"/kyc/{endpoint}/{cases['large']}")
+    assert large == small
+
+
+@pytest.mark.parametrize("endpoint", ["auto-details", "screen-data"])
+def test_registered_case_query_count_is_capped(client, cases, endpoint):
+    with assert_max_queries(MAX_QUERIES[endpoint]):
+        queries_for(client, f"/kyc/{endpoint}/{cases['registered']}")
@@ -0,0 +1,131 @@
+"""
+tus resumable uploads of resumable.py and /kyc/uploads.
+
+Run with: python -m pytest test_resumable.py
+"""
+
+import base64
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import resumable
+from database import get_session_local, init_db
+from models import KycCase, KycDocument
+
+TUS = {"Tus-Resumable": "1.0.0"}
+
+
+def metadata(**values) -> str:
+    return ",".join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items())
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.get_settings(), "ENV", "local")
+    init_db()
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def case_id(client):
+    db = get_session_local()()
+    try:
+        case = KycCase(status="in_progress")
+        db.add(case)
+        db.commit()
+        return case.id
+    finally:
+        db.close()
+
+
+def create(client, case_id, length: int, doc_type: str = "pancard", headers=TUS):
+    return client.post("/kyc/uploads", headers={
+        **headers,
+        "Upload-Length": str(length),
+        "Upload-Metadata": metadata(kyc_case_id=str(case_id), doc_type=doc_type, filename="pan.pdf"),
+    })
+
+
+def patch(client, location: str, offset: int, chunk: bytes):
+    return client.patch(location, content=chunk, headers={
+        **TUS, "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"
+    })
+
+
+def test_upload_resumes_at_the_stored_offset(client, case_id):
+    created = create(client, case_id, 10)
+    assert created.status_code == 201
+    location = created.headers["Location"]
+
+    assert patch(client, location, 0, b"01234").headers["Upload-Offset"] == "5"
+    # A retried or out-of-order chunk is refused; the client asks for the offset and resumes
+    conflict = patch(client, location, 3, b"34567")
+    assert conflict.status_code == 409
+    assert client.head(location, headers=TUS).headers["Upload-Offset"] == "5"
+
+    done = patch(client, location, 5, b"56789")
+    assert done.status_code == 204
+    assert done.headers["Upload-Offset"] == "10"
+    db = get_session_local()()
+    try:
+        doc = db.query(KycDocument).filter(KycDocument.id == int(done.headers["X-Kyc-Document-Id"])).one()
+        with open(doc.file_path, "rb") as f:
+            assert f.read() == b"0123456789"
+    finally:
+        db.close()
+    assert patch(client, location, 10, b"").status_code == 409
+
+
+def test_tus_version_is_required(client, case_id):
+    assert create(client, case_id, 10, headers={}).status_code == 412
+    refused = create(client, case_id, 10, headers={"Tus-Resumable": "0.2.2"})
+    assert refused.status_code == 412
+    assert refused.headers["Tus-Version"] == "1.0.0"
+
+
+@pytest.mark.parametrize("doc_type", ["../../etc", "pancard/../x", "resume"])
+def test_unknown_doc_type_is_refused(client, case_id, doc_type):
+    assert create(client, case_id, 10, doc_type=doc_type).status_code == 400
+
+
+class FakeS3:
+    """Records multipart calls; the pending object is kept in memory"""
+
+    def __init__(self):
+        self.parts = []
+        self.pending = b""
+
+    def put_object(self, Bucket, Key, Body):
+        self.pending = Body
+
+    def get_object(self, Bucket, Key, Range):
+        end = int(Range.split("-")[1])
+        return {"Body": SimpleNamespace(read=lambda: self.pending[:end + 1])}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts.append((PartNumber, Body))
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+
+def test_s3_small_chunks_are_merged_into_the_final_part(monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(main.storage, "_s3_client", s3)
+    monkeypatch.setattr(resumable, "S3_MIN_PART_SIZE", 8)
+    backend = resumable.S3UploadBackend()
+    session = SimpleNamespace(
+        id="abc", length=14, offset=0, parts=[], pending_bytes=0,
+        s3_upload_id="upload-1", file_path="s3://bucket/uploads/kyc/1/pancard/pan.pdf"
+    )
+
+    for chunk in [b"0123", b"4567", b"89", b"abcd"]:
+        backend.append(session, chunk)
+        session.offset += len(chunk)
+
+    # 0123 is buffered, 01234567 fills a part, 89 is buffered and merged with the final chunk
+    assert s3.parts == [(1, b"01234567"), (2, b"89abcd")]
+    assert session.parts == [{"PartNumber": 1, "ETag": '"etag-1"'}, {"PartNumber": 2, "ETag": '"etag-2"'}]
+    assert session.pending_bytes == 0
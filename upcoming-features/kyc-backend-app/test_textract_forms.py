@@ -0,0 +1,74 @@
+"""
+Key/value pairing and field mapping of textract_forms.py, on the fixtures in fixtures/textract/.
+
+Run with: python -m pytest test_textract_forms.py
+"""
+
+import json
+import os
+
+import pytest
+
+from textract_forms import extract_key_values, normalize_key, parse_form, parse_responses
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "textract")
+
+
+def load_blocks(doc_type: str) -> list:
+    with open(os.path.join(FIXTURE_DIR, f"{doc_type}_analyze_document.json")) as f:
+        return json.load(f)["Blocks"]
+
+
+def test_every_key_is_paired_with_its_value():
+    pairs = extract_key_values(load_blocks("pancard"))
+    assert [(pair["key"], pair["value"]) for pair in pairs] == [
+        ("Name", "RAHUL SHARMA"),
+        ("Father's Name", "SURESH SHARMA"),
+        ("Date of Birth", "23/05/1988"),
+        ("Permanent Account Number", "FMPPK1234L"),
+    ]
+    assert all(pair["page"] == 1 and 0 < pair["confidence"] <= 1 for pair in pairs)
+
+
+def test_selection_elements_are_read_as_their_status():
+    pairs = {pair["key"]: pair["value"] for pair in extract_key_values(load_blocks("passport"))}
+    assert pairs["ECR"] == "NOT_SELECTED"
+    assert pairs["Given Name(s)"] == "RAHUL"
+
+
+def test_pair_takes_the_lower_confidence_and_skips_missing_values():
+    blocks = [
+        {"Id": "k", "BlockType": "KEY_VALUE_SET", "EntityTypes": ["KEY"], "Confidence": 90.0,
+         "Relationships": [{"Type": "CHILD", "Ids": ["w1"]}, {"Type": "VALUE", "Ids": ["v", "gone"]}]},
+        {"Id": "v", "BlockType": "KEY_VALUE_SET", "EntityTypes": ["VALUE"], "Confidence": 40.0,
+         "Relationships": [{"Type": "CHILD", "Ids": ["w2", "gone"]}]},
+        {"Id": "w1", "BlockType": "WORD", "Text": "Name"},
+        {"Id": "w2", "BlockType": "WORD", "Text": "Asha"},
+    ]
+    assert extract_key_values(blocks) == [{"key": "Name", "value": "Asha", "confidence": 0.4, "page": 1}]
+
+
+@pytest.mark.parametrize("doc_type, fields", [
+    ("aadhar_front", {"name": "Rahul Sharma", "dob": "1988-05-23", "gender": "Male",
+                      "aadhar_number": "234567890123"}),
+    ("pancard", {"name": "Rahul Sharma", "father_name": "Suresh Sharma", "dob": "1988-05-23",
+                 "pan_number": "FMPPK1234L"}),
+    ("passport", {"passport_number": "M1234567", "surname": "Sharma", "given_names": "Rahul",
+                  "name": "Rahul Sharma", "nationality": "INDIAN", "gender": "Male", "dob": "1988-05-23",
+                  "address": "22, Lotus Apartments, Andheri West, Mumbai, 400053"}),
+])
+def test_fixture_maps_onto_typed_fields(doc_type, fields):
+    parsed = parse_form(load_blocks(doc_type), doc_type)
+    assert parsed["fields"] == fields
+    assert parsed["confidence"] == pytest.approx(0.94)
+
+
+def test_paginated_responses_are_parsed_together():
+    blocks = load_blocks("pancard")
+    responses = [{"Blocks": blocks[:len(blocks) // 2]}, {"Blocks": blocks[len(blocks) // 2:]}]
+    assert parse_responses(responses, "pancard") == parse_form(blocks, "pancard")
+
+
+def test_normalize_key():
+    assert normalize_key("Father's Name :") == "fathers name"
+    assert normalize_key("Given Name(s)") == "given name s"
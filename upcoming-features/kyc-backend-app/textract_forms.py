@@ -0,0 +1,196 @@
+"""
+Textract AnalyzeDocument (FORMS) parser.
+Blocks are indexed by Id once, so KEY -> VALUE -> WORD / SELECTION_ELEMENT relationships
+resolve in time linear in the number of blocks, even on dense multi-page responses.
+Key/value pairs are then mapped onto typed KycDetail fields per document layout.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Form labels per layout -> KycDetail field. Labels are compared after normalize_key().
+FIELD_MAPS = {
+    "aadhar_front": {
+        "name": "name",
+        "dob": "dob",
+        "date of birth": "dob",
+        "year of birth": "dob",
+        "gender": "gender",
+        "sex": "gender",
+        "aadhaar no": "aadhar_number",
+        "aadhaar number": "aadhar_number",
+        "aadhar no": "aadhar_number",
+        "aadhar number": "aadhar_number",
+        "vid": "vid",
+    },
+    "aadhar_back": {
+        "address": "address",
+        "pin code": "pincode",
+        "pincode": "pincode",
+    },
+    "pancard": {
+        "name": "name",
+        "fathers name": "father_name",
+        "father name": "father_name",
+        "date of birth": "dob",
+        "permanent account number": "pan_number",
+        "permanent account number card": "pan_number",
+        "pan": "pan_number",
+    },
+    "passport": {
+        "passport no": "passport_number",
+        "passport number": "passport_number",
+        "surname": "surname",
+        "given names": "given_names",
+        "given name s": "given_names",
+        "given name": "given_names",
+        "name": "name",
+        "nationality": "nationality",
+        "sex": "gender",
+        "date of birth": "dob",
+        "address": "address",
+        "name of father legal guardian": "father_name",
+        "name of father": "father_name",
+    },
+}
+
+DATE_FIELDS = {"dob"}
+NAME_FIELDS = {"name", "father_name", "surname", "given_names"}
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%d %b %Y", "%d %B %Y")
+
+
+def normalize_key(text: str) -> str:
+    """Lower-case a form label and strip punctuation, e.g. "Father's Name :" -> "fathers name" """
+    text = text.lower().replace("'", "").replace("’", "")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+def index_blocks(blocks: Iterable[dict]) -> Dict[str, dict]:
+    """Id -> block, built once per response"""
+    return {block["Id"]: block for block in blocks}
+
+
+def related_ids(block: dict, relationship_type: str) -> List[str]:
+    """Ids of a block's relationships of one type"""
+    ids = []
+    for relationship in block.get("Relationships", ()):
+        if relationship["Type"] == relationship_type:
+            ids.extend(relationship["Ids"])
+    return ids
+
+
+def block_text(block: dict, index: Dict[str, dict]) -> str:
+    """Text of a KEY or VALUE block from its WORD and SELECTION_ELEMENT children"""
+    parts = []
+    for child_id in related_ids(block, "CHILD"):
+        child = index.get(child_id)
+        if child is None:
+            continue
+        if child["BlockType"] == "WORD":
+            parts.append(child["Text"])
+        elif child["BlockType"] == "SELECTION_ELEMENT":
+            parts.append(child["SelectionStatus"])
+    return " ".join(parts)
+
+
+def extract_key_values(blocks: List[dict], index: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """
+    Pair every KEY with its VALUE.
+    Returns dicts with key, value, confidence (0-1, the lower of key and value) and page.
+    """
+    index = index if index is not None else index_blocks(blocks)
+    pairs = []
+    for block in blocks:
+        if block["BlockType"] != "KEY_VALUE_SET" or "KEY" not in block.get("EntityTypes", ()):
+            continue
+        value_texts = []
+        confidence = block.get("Confidence", 100.0)
+        for value_id in related_ids(block, "VALUE"):
+            value_block = index.get(value_id)
+            if value_block is None:
+                continue
+            value_texts.append(block_text(value_block, index))
+            confidence = min(confidence, value_block.get("Confidence", 100.0))
+        pairs.append({
+            "key": block_text(block, index),
+            "value": " ".join(t for t in value_texts if t),
+            "confidence": confidence / 100,
+            "page": block.get("Page", 1),
+        })
+    return pairs
+
+
+def _normalize_date(value: str) -> str:
+    cleaned = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return cleaned
+
+
+def _normalize_value(field: str, value: str) -> str:
+    value = value.strip()
+    if field in DATE_FIELDS:
+        return _normalize_date(value)
+    if field == "gender":
+        lowered = value.lower()
+        if lowered.startswith("f"):
+            return "Female"
+        if lowered.startswith("m"):
+            return "Male"
+    if field in NAME_FIELDS:
+        return " ".join(value.split()).title()
+    if field == "aadhar_number":
+        return re.sub(r"\D", "", value)
+    if field in ("pan_number", "passport_number"):
+        return value.replace(" ", "").upper()
+    return value
+
+
+def map_fields(pairs: List[dict], doc_type: str) -> Dict[str, object]:
+    """
+    Map key/value pairs onto the typed fields of a layout.
+    The most confident occurrence of a field wins (the first on ties); "confidence"
+    holds the lowest confidence among the mapped fields.
+    """
+    field_map = FIELD_MAPS[doc_type]
+    best: Dict[str, dict] = {}
+    for pair in pairs:
+        field = field_map.get(normalize_key(pair["key"]))
+        if field is None or not pair["value"]:
+            continue
+        if field not in best or pair["confidence"] > best[field]["confidence"]:
+            best[field] = pair
+
+    fields = {field: _normalize_value(field, pair["value"]) for field, pair in best.items()}
+
+    # Layout-specific combinations onto KycDetail columns
+    if doc_type == "aadhar_back" and "pincode" in fields:
+        pincode = fields.pop("pincode")
+        address = fields.get("address", "")
+        if pincode not in address:
+            fields["address"] = f"{address}, {pincode}" if address else pincode
+    if doc_type == "passport" and "name" not in fields and ("given_names" in fields or "surname" in fields):
+        fields["name"] = " ".join(
+            part for part in (fields.get("given_names"), fields.get("surname")) if part
+        )
+
+    confidence = min((pair["confidence"] for pair in best.values()), default=None)
+    return {"fields": fields, "confidence": confidence}
+
+
+def parse_form(blocks: List[dict], doc_type: str) -> Dict[str, object]:
+    """Typed field map for one AnalyzeDocument response"""
+    return map_fields(extract_key_values(blocks), doc_type)
+
+
+def parse_responses(responses: Iterable[dict], doc_type: str) -> Dict[str, object]:
+    """Typed field map for paginated responses (e.g. GetDocumentAnalysis pages)"""
+    blocks = []
+    for response in responses:
+        blocks.extend(response.get("Blocks", ()))
+    return parse_form(blocks, doc_type)